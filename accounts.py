@@ -0,0 +1,366 @@
+"""Per-account trade store that ingests delta exports incrementally.
+
+    python accounts.py ACC-1042 exports/2024-08-01_15.csv exports/2024-08-16_31.csv
+
+Every upload is deduplicated by ticket against what the account already
+has and appended as a new partition. Daily PnL and frequency, cumulative
+lots, concurrency and the Martingale detectors are then advanced from the
+delta plus a small boundary frame: the positions still open at the
+account's last trade, the trades of its last day and the last trade of
+each symbol. A delta with trades at or before the account's last trade
+falls back to rebuilding the aggregates from the whole history.
+
+Partitions are written in blocks of BLOCK_ROWS trades, each indexed by
+its trade-date range and the symbols in it, so `AccountStore.query` can
+pull a date window or a few symbols out of years of history by reading
+only the blocks that hold them.
+"""
+import argparse
+import dataclasses
+import json
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from analytics import concurrency_profile, loss_reversal_pairs, martingale_clusters
+from cache import CACHE_DIR, read_frame, write_frame
+from ingest import manipulation_data_frame, read_trades, sort_trades, time_ordered
+from reports import martingale_candidates
+
+
+ACCOUNTS_DIR = Path(os.environ.get('PAYOUTS_ACCOUNTS_DIR', CACHE_DIR / 'accounts'))
+# Bump whenever the stored partitions or aggregates change shape
+STORE_VERSION = 2
+BLOCK_ROWS = 65_536
+REVERSAL_WINDOW_SECONDS = 60
+
+
+@dataclasses.dataclass
+class AccountState:
+    version: int = STORE_VERSION
+    trades: int = 0
+    partitions: int = 0
+    last_ticket: str | None = None
+    first_trade: str | None = None  # ISO timestamps, so state.json stays readable
+    last_trade: str | None = None
+    last_close: str | None = None
+    total_lots: float = 0.0
+    simultaneous_trades: int = 0
+    max_simultaneous: int = 0
+
+
+@dataclasses.dataclass
+class IngestResult:
+    account: str
+    received: int
+    new: int
+    duplicates: int
+    late: int  # new trades not after the account's last trade
+    rebuilt: bool
+
+
+@dataclasses.dataclass
+class AccountAggregates:
+    state: AccountState
+    daily: pd.DataFrame  # pnl_liq, Frequency and lots per TradeDay
+    martingale_clusters: pd.DataFrame
+    loss_reversal_pairs: pd.DataFrame
+    martingale_candidates: pd.DataFrame
+
+
+def _day(values):
+    # TradeDay of a trade-date column, as manipulation_data_frame defines it
+    return values.dt.tz_localize(None).dt.normalize()
+
+
+def _daily(trades):
+    return trades.groupby('TradeDay').agg(pnl_liq=('pnl_liq', 'sum'), Frequency=('pnl_liq', 'count'),
+                                          lots=('lots', 'sum'))
+
+
+def _ticket_number(ticket):
+    try:
+        return int(ticket)
+    except (TypeError, ValueError):
+        return None
+
+
+class AccountStore:
+    """Trades and running aggregates of many accounts under `root`, one directory each."""
+
+    def __init__(self, root=ACCOUNTS_DIR):
+        self.root = Path(root)
+
+    def _dir(self, account):
+        if not re.fullmatch(r'[\w.-]+', account):
+            raise ValueError(f'invalid account name: {account!r}')
+        return self.root / account
+
+    def accounts(self):
+        return sorted(p.name for p in self.root.glob('*') if (p / 'state.json').exists())
+
+    def state(self, account):
+        path = self._dir(account) / 'state.json'
+        if not path.exists():
+            return None
+        state = AccountState(**json.loads(path.read_text()))
+        if state.version != STORE_VERSION:
+            raise ValueError(f'{account} was stored by version {state.version} of the account store; re-ingest it')
+        return state
+
+    def _save_state(self, account, state):
+        path = self._dir(account) / 'state.json'
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(dataclasses.asdict(state), indent=2))
+        os.replace(tmp, path)
+
+    def trades(self, account):
+        """Whole history of the account in canonical trade-date order."""
+        state = self.state(account)
+        if state is None:
+            raise KeyError(account)
+        return self._history(self._dir(account), state.partitions)
+
+    def _history(self, directory, partitions):
+        parts = [read_frame(directory / f'trades-{i:05d}.arrow') for i in range(partitions)]
+        return time_ordered(pd.concat(parts, ignore_index=True), 'trade-date').reset_index(drop=True)
+
+    def aggregates(self, account):
+        directory = self._dir(account)
+        state = self.state(account)
+        if state is None:
+            raise KeyError(account)
+        frames = {name: read_frame(directory / f'{name}.arrow')
+                  for name in ('daily', 'martingale_clusters', 'loss_reversal_pairs', 'martingale_candidates')}
+        return AccountAggregates(state, **frames)
+
+    def symbols(self, account):
+        state = self.state(account)
+        if state is None:
+            raise KeyError(account)
+        directory = self._dir(account)
+        return sorted({symbol for i in range(state.partitions)
+                       for symbol in json.loads((directory / f'symbols-{i:05d}.json').read_text())})
+
+    def query(self, account, start=None, end=None, symbols=None):
+        """Trades with `start <= trade-date <= end` (tz-aware) and, if given, a symbol in `symbols`.
+
+        Blocks are skipped using their date range and symbols, and only the
+        matching rows of the rest are converted to pandas. Trades without a
+        parseable date only come back when no range is given.
+        """
+        state = self.state(account)
+        if state is None:
+            raise KeyError(account)
+        directory = self._dir(account)
+        lo = None if start is None else pd.Timestamp(start).as_unit('ns').value
+        hi = None if end is None else pd.Timestamp(end).as_unit('ns').value
+        wanted = None if not symbols else pa.array(list(symbols), type=pa.string())
+
+        frames = []
+        for i in range(state.partitions):
+            zones = np.load(directory / f'zones-{i:05d}.npy')
+            keep = np.ones(len(zones), dtype=bool)
+            if lo is not None:
+                keep &= zones[:, 1] >= lo
+            if hi is not None:
+                keep &= zones[:, 0] <= hi
+            if wanted is not None:
+                index = json.loads((directory / f'symbols-{i:05d}.json').read_text())
+                has_symbol = np.zeros(len(zones), dtype=bool)
+                for symbol in symbols:
+                    has_symbol[index.get(symbol, [])] = True
+                keep &= has_symbol
+            with pa.memory_map(str(directory / f'trades-{i:05d}.arrow')) as source:
+                reader = pa.ipc.open_file(source)
+                batches = []
+                for block in np.flatnonzero(keep):
+                    batch = reader.get_batch(int(block))
+                    if lo is not None or hi is not None:
+                        # blocks are in trade-date order, NaT last
+                        dates = batch.column('trade-date')
+                        ns = dates.to_numpy(zero_copy_only=False).view('int64')[:len(dates) - dates.null_count]
+                        first = 0 if lo is None else int(np.searchsorted(ns, lo, side='left'))
+                        last = len(ns) if hi is None else int(np.searchsorted(ns, hi, side='right'))
+                        batch = batch.slice(first, max(last - first, 0))
+                    if wanted is not None:
+                        batch = batch.filter(pc.is_in(batch.column('symbol'), value_set=wanted))
+                    batches.append(batch)
+                frames.append(pa.Table.from_batches(batches, schema=reader.schema).to_pandas())
+        return time_ordered(pd.concat(frames, ignore_index=True), 'trade-date').reset_index(drop=True)
+
+    def _index_partition(self, directory, part):
+        # trade-date range and symbols of every block, for query
+        zones, symbols = [], {}
+        with pa.memory_map(str(directory / f'trades-{part:05d}.arrow')) as source:
+            reader = pa.ipc.open_file(source)
+            for block in range(reader.num_record_batches):
+                batch = reader.get_batch(block)
+                bounds = pc.min_max(batch.column('trade-date').cast(pa.int64()))
+                zones.append((bounds['min'].as_py(), bounds['max'].as_py()))
+                for symbol in pc.unique(batch.column('symbol')).drop_null().to_pylist():
+                    symbols.setdefault(symbol, []).append(block)
+        # a block without dates never matches a range
+        empty = (np.iinfo(np.int64).max, np.iinfo(np.int64).min)
+        zones = np.array([empty if low is None else (low, high) for low, high in zones], dtype=np.int64)
+        np.save(directory / f'zones-{part:05d}.npy', zones.reshape(-1, 2))
+        (directory / f'symbols-{part:05d}.json').write_text(json.dumps(symbols))
+
+    def _known(self, directory, state, tickets):
+        # tickets above the last ingested one are new; the rest are looked up in each partition's sorted index
+        known = np.zeros(len(tickets), dtype=bool)
+        if state is None:
+            return known
+        last = _ticket_number(state.last_ticket)
+        numbers = pd.to_numeric(pd.Series(tickets), errors='coerce').to_numpy()
+        lookup = ~(numbers > last) if last is not None else np.ones(len(tickets), dtype=bool)
+        candidates = tickets[lookup]
+        if not len(candidates):
+            return known
+        found = np.zeros(len(candidates), dtype=bool)
+        for i in range(state.partitions):
+            index = np.load(directory / f'tickets-{i:05d}.npy', mmap_mode='r')
+            if not len(index):
+                continue
+            pos = np.minimum(np.searchsorted(index, candidates), len(index) - 1)
+            found |= index[pos] == candidates
+        known[lookup] = found
+        return known
+
+    def ingest(self, account, source):
+        """Append the trades of `source` (path or file object) that the account does not have yet."""
+        directory = self._dir(account)
+        directory.mkdir(parents=True, exist_ok=True)
+        state = self.state(account)
+
+        delta, _ = manipulation_data_frame(read_trades(source))
+        received = len(delta)
+        delta = delta.drop_duplicates('ticket')
+        tickets = delta['ticket'].to_numpy(dtype=str)
+        delta = delta[~self._known(directory, state, tickets)].reset_index(drop=True)
+        late = 0
+        if state is not None and state.last_trade is not None:
+            # a trade at the watermark itself would change the concurrency of the one already there
+            late = int((delta['trade-date'] <= pd.Timestamp(state.last_trade)).sum())
+        result = IngestResult(account, received, len(delta), received - len(delta), late,
+                              rebuilt=state is None or late > 0)
+        if delta.empty:
+            return result
+
+        state = state or AccountState()
+        part = state.partitions
+        write_frame(delta, directory / f'trades-{part:05d}.arrow', block_rows=BLOCK_ROWS)
+        self._index_partition(directory, part)
+        np.save(directory / f'tickets-{part:05d}.npy', np.unique(delta['ticket'].to_numpy(dtype=str)))
+        state.partitions += 1
+
+        if result.rebuilt:
+            self._rebuild(directory, state, self._history(directory, state.partitions))
+        else:
+            self._advance(directory, state, delta)
+        self._save_state(account, state)
+        return result
+
+    def _write_boundary(self, directory, state, trades, history=False):
+        # trades a later delta can still interact with; `trades` must contain all of them
+        # (`history` when it is the account's whole history)
+        last_open = trades['open-time'].max()
+        keep = ((trades['TradeDay'] == trades['TradeDay'].max())
+                | ~(trades['close-time'] <= last_open)
+                | (trades.groupby('symbol', observed=True).cumcount(ascending=False) == 0))
+        boundary = trades[keep].reset_index(drop=True)
+        write_frame(boundary, directory / 'boundary.arrow')
+
+        state.last_trade = trades['trade-date'].max().isoformat()
+        close = trades['close-time'].max()
+        state.last_close = close.isoformat() if pd.notna(close) else state.last_close
+        # the watermark only rises: after _advance `trades` is the boundary and the delta, so the
+        # highest ticket so far may be in an older, closed trade. Once a ticket is not a number
+        # there is no watermark (None) and _known looks every ticket up.
+        numbers = pd.to_numeric(trades['ticket'], errors='coerce')
+        previous = None if history else _ticket_number(state.last_ticket)
+        if numbers.isna().any() or (previous is None and not history):
+            state.last_ticket = None
+        else:
+            highest = int(numbers.max())
+            state.last_ticket = str(highest if previous is None else max(previous, highest))
+
+    def _rebuild(self, directory, state, trades):
+        profile = concurrency_profile(trades)
+        state.trades = len(trades)
+        first = trades['trade-date'].min()
+        state.first_trade = first.isoformat() if pd.notna(first) else None
+        state.total_lots = float(trades['lots'].sum())
+        state.simultaneous_trades = int((profile.counts > 1).sum())
+        state.max_simultaneous = int(profile.peak)
+        frames = {
+            'daily': _daily(trades),
+            'martingale_clusters': martingale_clusters(trades),
+            'loss_reversal_pairs': loss_reversal_pairs(trades, window_seconds=REVERSAL_WINDOW_SECONDS),
+            'martingale_candidates': martingale_candidates(trades),
+        }
+        for name, frame in frames.items():
+            write_frame(frame, directory / f'{name}.arrow')
+        self._write_boundary(directory, state, trades, history=True)
+
+    def _advance(self, directory, state, delta):
+        stored = {name: read_frame(directory / f'{name}.arrow')
+                  for name in ('boundary', 'daily', 'martingale_clusters', 'loss_reversal_pairs', 'martingale_candidates')}
+        boundary = stored['boundary']
+        last_open = boundary['open-time'].max()
+        context = sort_trades(pd.concat([boundary, delta], ignore_index=True))
+        new = context['ticket'].isin(delta['ticket']).to_numpy()
+
+        # open positions at the boundary are the only history a new trade can overlap
+        still_open = ~(boundary['close-time'] <= last_open)
+        profile = concurrency_profile(pd.concat([boundary[still_open], delta], ignore_index=True))
+        delta_counts = profile.counts.iloc[int(still_open.sum()):]
+        state.trades += len(delta)
+        state.total_lots += float(delta['lots'].sum())
+        state.simultaneous_trades += int((delta_counts > 1).sum())
+        state.max_simultaneous = max(state.max_simultaneous, int(profile.peak))
+
+        daily = pd.concat([stored['daily'], _daily(delta)]).groupby(level=0).sum()
+
+        # clusters and reversals never cross days: redo the boundary day (complete in the boundary frame) onwards
+        first_day = boundary['TradeDay'].max()
+        recent = context[context['TradeDay'] >= first_day]
+        clusters = stored['martingale_clusters']
+        clusters = pd.concat([clusters[_day(clusters['trade-date']) < first_day], martingale_clusters(recent)],
+                             ignore_index=True)
+        order = clusters.assign(_day=_day(clusters['trade-date']))
+        clusters = clusters.loc[order.sort_values(['symbol', '_day', 'side', 'trade-date'], kind='stable').index]
+        clusters = clusters.reset_index(drop=True)
+        reversals = stored['loss_reversal_pairs']
+        reversals = pd.concat([reversals[_day(reversals['data']) < first_day],
+                               loss_reversal_pairs(recent, window_seconds=REVERSAL_WINDOW_SECONDS)], ignore_index=True)
+        # the previous trade of each symbol is in the boundary frame
+        candidates = martingale_candidates(context)
+        candidates = pd.concat([stored['martingale_candidates'], candidates[new[candidates.index]]], ignore_index=True)
+
+        for name, frame in {'daily': daily, 'martingale_clusters': clusters, 'loss_reversal_pairs': reversals,
+                            'martingale_candidates': candidates}.items():
+            write_frame(frame, directory / f'{name}.arrow')
+        self._write_boundary(directory, state, context)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('account')
+    parser.add_argument('files', nargs='*', help='CSV/XLSX exports to ingest, oldest first')
+    parser.add_argument('--root', default=ACCOUNTS_DIR, help=f'store directory (default: {ACCOUNTS_DIR})')
+    args = parser.parse_args()
+
+    store = AccountStore(args.root)
+    for path in args.files:
+        result = store.ingest(args.account, path)
+        print(f'{path}: {result.new} new, {result.duplicates} duplicates, {result.late} late'
+              + (' (aggregates rebuilt)' if result.rebuilt else ''))
+    aggregates = store.aggregates(args.account)
+    print(json.dumps(dataclasses.asdict(aggregates.state), indent=2))
+    print(aggregates.daily.tail(10).to_string())
@@ -0,0 +1,325 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+def _epoch_ns(values):
+    # int64 nanoseconds since epoch (UTC) for any datetime-like column
+    return pd.DatetimeIndex(values).as_unit('ns').asi8
+
+
+OPEN_ENDED = np.iinfo(np.int64).max
+_NAT = np.iinfo(np.int64).min
+
+
+def interval_bounds(df, open_col, close_col):
+    opens = _epoch_ns(df[open_col])
+    closes = _epoch_ns(df[close_col])
+    # NaT close -> still open until the end of the data
+    closes = np.where(closes == np.iinfo(np.int64).min, OPEN_ENDED, closes)
+    return opens, closes
+
+
+def concurrency_steps(opens, closes):
+    """Sorted event times and the number of open positions after each event.
+
+    Closes are applied before opens on ties, so intervals are half-open.
+    """
+    times = np.concatenate([closes, opens])
+    deltas = np.concatenate([np.full(len(closes), -1), np.ones(len(opens), dtype=np.int64)])
+    order = np.lexsort((deltas, times))
+    return times[order], np.cumsum(deltas[order])
+
+
+@dataclass
+class ConcurrencyProfile:
+    counts: pd.Series
+    peak: int
+    time_at_level: pd.Series
+
+
+def concurrency_profile(df, open_col='open-time', close_col='close-time'):
+    """Sweep-line count of open positions.
+
+    `counts` is aligned to `df.index` and holds, for every trade, how many
+    positions were open at the instant it opened (itself included).
+    Intervals are half-open: a trade closing at the same timestamp another
+    one opens does not overlap it. Trades without an open-time are left out
+    and count 0.
+    """
+    opens, closes = interval_bounds(df, open_col, close_col)
+    valid = opens != _NAT
+    counts = np.zeros(len(opens), dtype=np.int64)
+    opens, closes = opens[valid], closes[valid]
+
+    sorted_opens = np.sort(opens)
+    sorted_closes = np.sort(closes)
+    counts[valid] = (np.searchsorted(sorted_opens, opens, side='right')
+                     - np.searchsorted(sorted_closes, opens, side='right')
+                     + (closes <= opens))  # zero-length trades still count themselves
+
+    times, levels = concurrency_steps(opens, closes)
+    if len(times) > 1:
+        last = times[times != OPEN_ENDED].max()
+        spans = np.diff(np.minimum(times, last)).astype(np.float64)
+        # zero-length trades can dip the level below zero for a zero-width span
+        time_at_level = np.bincount(np.maximum(levels[:-1], 0), weights=spans)
+    else:
+        time_at_level = np.zeros(1)
+    time_at_level = pd.Series(pd.to_timedelta(time_at_level, unit='ns'), name='time_at_level')
+    time_at_level.index.name = 'open_positions'
+
+    return ConcurrencyProfile(
+        counts=pd.Series(counts, index=df.index, name='simultaneous_positions'),
+        peak=int(counts.max()) if len(counts) else 0,
+        time_at_level=time_at_level,
+    )
+
+
+_NS_PER_DAY = 86_400 * 10**9
+
+
+def overlap_groups(df, open_col='open-time', close_col='close-time', ticket_col='ticket', pnl_col='pnl_liq'):
+    """Consolidated report of simultaneous positions.
+
+    A trade that opens while another position is open flags every ticket open
+    at that instant. Flags are grouped by the opening trade's symbol and
+    TradeDay and reported once per ticket, with the summed PnL of the flagged
+    tickets.
+    """
+    group_cols = ['symbol', 'TradeDay']
+    columns = ['Symbol', 'TradeDay', 'Tickets Flagged', 'Total PnL']
+    trades = df.drop_duplicates(ticket_col)
+    opens, closes = interval_bounds(trades, open_col, close_col)
+
+    counts = concurrency_profile(trades, open_col, close_col).counts.to_numpy()
+    # a trade missing its symbol or TradeDay opens no group (groupby would give it code -1)
+    flagged = np.flatnonzero((counts > 1) & trades[group_cols].notna().all(axis=1).to_numpy())
+    if not len(flagged):
+        return pd.DataFrame(columns=columns)
+
+    flagged_trades = trades.iloc[flagged]
+    event_group = flagged_trades.groupby(group_cols, sort=True, observed=True).ngroup().to_numpy()
+    event_time = opens[flagged]
+    keys = flagged_trades[group_cols].groupby(event_group).first()
+
+    # ticket -> group candidates: only groups with an event on a day the ticket was open
+    # (a trade without an open-time has no interval to fall in)
+    candidates = np.flatnonzero((opens != _NAT) & (opens <= event_time.max()) & (closes > event_time.min()))
+    first_day = opens[candidates] // _NS_PER_DAY
+    last_day = np.minimum(closes[candidates], event_time.max()) // _NS_PER_DAY
+    span = last_day - first_day + 1
+    rows = np.repeat(candidates, span)
+    offsets = np.arange(len(rows)) - np.repeat(np.cumsum(span) - span, span)
+    day_groups = pd.DataFrame({'day': event_time // _NS_PER_DAY, 'group': event_group}).drop_duplicates()
+    pairs = pd.DataFrame({'row': rows, 'day': np.repeat(first_day, span) + offsets}).merge(day_groups, on='day')
+    row = pairs['row'].to_numpy()
+    group = pairs['group'].to_numpy()
+
+    # a ticket belongs to a group if one of the group's events falls inside [open, close)
+    times = np.sort(np.concatenate([event_time, opens]))
+    width = len(times) + 1
+    event_key = event_group * width + np.searchsorted(times, event_time)
+    order = np.argsort(event_key, kind='stable')
+    event_key, event_time, sorted_group = event_key[order], event_time[order], event_group[order]
+    hit = np.searchsorted(event_key, group * width + np.searchsorted(times, opens[row]))
+    inside = hit < len(event_key)
+    hit = np.minimum(hit, len(event_key) - 1)
+    inside &= (sorted_group[hit] == group) & (event_time[hit] < closes[row])
+
+    member_group = np.concatenate([group[inside], event_group])
+    member_row = np.concatenate([row[inside], flagged])
+    member_key = np.sort(member_group * len(trades) + member_row)
+    member_key = member_key[np.r_[True, np.diff(member_key) != 0]]
+    member_group, member_row = np.divmod(member_key, len(trades))
+    order = np.lexsort((member_row, opens[member_row], member_group))
+    member_group, member_row = member_group[order], member_row[order]
+    starts = np.flatnonzero(np.r_[True, np.diff(member_group) != 0])
+
+    report = keys.rename(columns={'symbol': 'Symbol'}).reset_index(drop=True)
+    tickets = trades[ticket_col].to_numpy(dtype=object)[member_row]
+    report['Tickets Flagged'] = [list(t) for t in np.split(tickets, starts[1:])]
+    report['Total PnL'] = np.add.reduceat(trades[pnl_col].to_numpy(dtype=np.float64)[member_row], starts)
+    return report
+
+
+def martingale_clusters(df):
+    """Trades opened at the same timestamp on the same symbol, day and side.
+
+    One stable sort by (symbol, TradeDay, side, trade-date); `time_diff` and
+    `lots_diff` are taken between consecutive flagged trades of each
+    (symbol, TradeDay, side) group.
+    """
+    keys = ['symbol', 'TradeDay', 'side']
+    trades = df.sort_values(keys + ['trade-date'], kind='stable')
+    cluster_size = trades.groupby(keys + ['trade-date'], sort=False, observed=True)['ticket'].transform('size')
+    flagged = trades.loc[cluster_size > 1, ['ticket', 'trade-date', 'symbol', 'side', 'lots', 'TradeDay']]
+
+    grouped = flagged.groupby(keys, sort=False, observed=True)
+    flagged['time_diff'] = grouped['trade-date'].diff().dt.total_seconds()
+    flagged['lots_diff'] = grouped['lots'].diff()
+    return flagged[['ticket', 'trade-date', 'symbol', 'side', 'lots', 'time_diff', 'lots_diff']].reset_index(drop=True)
+
+
+def _is_loss(trades):
+    return trades['pnl_category'] == 'Loss'
+
+
+def loss_reversal_pairs(df, window_seconds=60, is_loss=_is_loss):
+    """Losing trades followed by an opposite-side trade on the same symbol and day.
+
+    `is_loss` takes the trades frame and returns a boolean mask; the next trade
+    must open within `window_seconds` of the losing one.
+    """
+    keys = ['TradeDay', 'symbol']
+    trades = df.sort_values(keys + ['trade-date'], kind='stable')
+    trades = trades.assign(_loss=is_loss(trades).to_numpy())
+    grouped = trades.groupby(keys, sort=False, observed=True)
+    prev = grouped[['ticket', 'pnl', 'lots', 'side', 'trade-date', '_loss']].shift(1)
+    gap = (trades['trade-date'] - prev['trade-date']).dt.total_seconds()
+
+    match = prev['_loss'].eq(True) & prev['side'].notna() & (trades['side'] != prev['side']) & (gap <= window_seconds)
+    current = trades[match]
+    prev = prev[match]
+    return pd.DataFrame({
+        'ticket_1': prev['ticket'],
+        'ticket_2': current['ticket'],
+        'pnl_1': prev['pnl'],
+        'pnl_2': current['pnl'],
+        'lots_1': prev['lots'],
+        'lots_2': current['lots'],
+        'pnl_acumulado_dia': grouped['pnl'].transform('sum')[match],
+        'symbol': current['symbol'],
+        'data': prev['trade-date'],
+        'tempo_diferenca': gap[match],
+        'side_1': prev['side'],
+        'side_2': current['side'],
+    }).reset_index(drop=True)
+
+
+_NS_PER_SECOND = 10**9
+
+
+def threshold_ranges(thresholds):
+    """[0, t] second ranges, the Regular Intervals page's cumulative thresholds."""
+    return [(0, t) for t in thresholds]
+
+
+def cadence_ranges(periods, tolerance):
+    """[n - tolerance, n + tolerance] second ranges for 'every n seconds' checks."""
+    return [(max(n - tolerance, 0), n + tolerance) for n in periods]
+
+
+def trade_gaps(df, by=None, time_col='trade-date'):
+    """Nanoseconds since the previous trade, in `df`'s order; -1 for the first trade.
+
+    With `by`, the previous trade is the previous one of the same group.
+    Trades with no date, or right after one, also get -1.
+    """
+    ns = _epoch_ns(df[time_col])
+    if by is None:
+        prev = np.r_[_NAT, ns[:-1]]
+    else:
+        grouped = pd.Series(ns).groupby(df[by].to_numpy(), sort=False, dropna=False)
+        prev = grouped.shift(1, fill_value=_NAT).to_numpy(dtype=np.int64)
+    valid = (ns != _NAT) & (prev != _NAT)
+    return np.where(valid, ns - prev, -1)
+
+
+def interval_distribution(df, ranges, by=None, time_col='trade-date', lots_col='lots'):
+    """Trades whose gap to the previous trade falls in each [lo, hi] second range.
+
+    Gaps are sorted once; every range of every group is then answered with
+    two binary searches and prefix sums of lots, so the cost barely depends
+    on the number of ranges. `df` must be in time order. With `by` the gaps
+    are taken within each group and one row per (group, range) is returned.
+    """
+    gaps = trade_gaps(df, by, time_col)
+    lots = df[lots_col].to_numpy(dtype=np.float64, na_value=np.nan)
+    if by is None:
+        codes, labels = np.zeros(len(df), dtype=np.int64), pd.Index(['All'])
+    else:
+        codes, labels = pd.factorize(df[by], sort=True, use_na_sentinel=False)
+        labels = pd.Index(labels)
+    totals = np.bincount(codes, minlength=len(labels))
+
+    lo = np.array([r[0] for r in ranges], dtype=np.float64)
+    hi = np.array([r[1] for r in ranges], dtype=np.float64)
+    lo_ns = np.rint(lo * _NS_PER_SECOND).astype(np.int64)
+    hi_ns = np.rint(hi * _NS_PER_SECOND).astype(np.int64)
+
+    # dense ranks of gaps and bounds make (group, value) fit one int64 key
+    keep = gaps >= 0
+    values, rank = np.unique(np.concatenate([gaps[keep], lo_ns, hi_ns]), return_inverse=True)
+    width = len(values) + 1
+    n = int(keep.sum())
+    key = codes[keep] * width + rank[:n]
+    order = np.argsort(key, kind='stable')
+    key = key[order]
+    kept_lots = lots[keep][order]
+    has_lots = ~np.isnan(kept_lots)
+    lot_sum = np.r_[0.0, np.cumsum(np.where(has_lots, kept_lots, 0.0))]
+    lot_count = np.r_[0, np.cumsum(has_lots)]
+
+    group = np.repeat(np.arange(len(labels)), len(ranges))
+    lo_key = group * width + np.tile(rank[n:n + len(ranges)], len(labels))
+    hi_key = group * width + np.tile(rank[n + len(ranges):], len(labels))
+    start = np.searchsorted(key, lo_key, side='left')
+    stop = np.maximum(np.searchsorted(key, hi_key, side='right'), start)
+
+    count = stop - start
+    total = totals[group]
+    lots_in_range = lot_count[stop] - lot_count[start]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        average_lots = np.where(lots_in_range > 0, (lot_sum[stop] - lot_sum[start]) / lots_in_range, np.nan)
+        percentage = np.where(total > 0, count / total * 100, np.nan)
+    result = pd.DataFrame({
+        'lo': np.tile(lo, len(labels)),
+        'hi': np.tile(hi, len(labels)),
+        'Total Trades': total,
+        'Regular Trades': count,
+        'Percentage of Regular Trades': percentage,
+        'Average Lots': average_lots,
+    })
+    if by is not None:
+        result.insert(0, by, labels[group])
+    return result
+
+
+def _sorted_quantile(sorted_values, start, count, q):
+    # linear interpolation like pandas, on each group's slice of one sorted array
+    pos = (count - 1) * q
+    below = np.floor(pos).astype(np.int64)
+    above = np.minimum(below + 1, count - 1)
+    last = max(len(sorted_values) - 1, 0)
+    lo = sorted_values[np.clip(start + below, 0, last)] if len(sorted_values) else np.zeros(len(count))
+    hi = sorted_values[np.clip(start + above, 0, last)] if len(sorted_values) else np.zeros(len(count))
+    return np.where(count > 0, lo + (hi - lo) * (pos - below), np.nan)
+
+
+def lot_summary(df, keys=('symbol', 'TradeDay'), lots_col='lots'):
+    """Trades, mean, median and quartiles of lots per group.
+
+    Lots are sorted once by (group, lots) and every statistic is read off
+    that array, so the cost does not grow with the number of groups.
+    """
+    keys = list(keys)
+    codes = df.groupby(keys, sort=True, observed=True).ngroup().to_numpy()
+    summary = df[keys].groupby(codes).first().reset_index(drop=True)
+    groups = len(summary)
+    lots = df[lots_col].to_numpy(dtype=np.float64, na_value=np.nan)
+    valid = ~np.isnan(lots)
+    lots, lot_codes = lots[valid], codes[valid]
+
+    sorted_lots = lots[np.lexsort((lots, lot_codes))]
+    count = np.bincount(lot_codes, minlength=groups)
+    start = np.cumsum(count) - count
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(lot_codes, weights=lots, minlength=groups) / count
+    summary['Trades'] = np.bincount(codes, minlength=groups)
+    summary['Mean Lots'] = mean
+    summary['Median Lots'] = _sorted_quantile(sorted_lots, start, count, 0.5)
+    summary['Lower Quartile'] = _sorted_quantile(sorted_lots, start, count, 0.25)
+    summary['Upper Quartile'] = _sorted_quantile(sorted_lots, start, count, 0.75)
+    return summary
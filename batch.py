@@ -0,0 +1,193 @@
+"""Run every payout check over a batch of trade-history exports.
+
+    python batch.py exports/ --out review/ --workers 8
+    python batch.py 'exports/2024-08-*.csv' --start 2024-08-01 --end 2024-08-31
+    python batch.py exports/ --program programs/funded.json
+
+Each file is one account. summary.parquet and summary.json hold one row per
+account, in file-name order, with its automatic risk scores, payout action
+and drawdown-rule results; breaches.parquet lists every daily-loss and
+trailing-drawdown breach; review/<account>/ holds the detail tables. With
+--program, every account is also checked against that payout program:
+rule_results.parquet has each account's value per rule, rule_violations.parquet
+the offending trades, and the summary a rule_<name> column per rule plus
+program_passed.
+"""
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from drawdown import DrawdownLimits, evaluate_drawdown
+from ingest import BROKER_TIMEZONE, manipulation_data_frame, read_trades
+from reports import account_review, regular_intervals, risk_scores, simultaneous_positions
+from rules import evaluate_program, load_program
+
+
+EXPORT_SUFFIXES = ('.csv', '.xlsx', '.xls')
+# drawdown summary columns copied into the batch summary
+DRAWDOWN_COLUMNS = ['final_equity', 'max_drawdown', 'worst_daily_loss', 'daily_loss_breaches',
+                    'first_daily_loss_breach', 'trailing_drawdown_breaches', 'first_trailing_drawdown_breach',
+                    'profit_target_reached', 'rules_passed']
+# the trade columns the drawdown and program rules read
+RULE_COLUMNS = ['ticket', 'TradeDay', 'open-time', 'close-time', 'symbol', 'lots', 'duration', 'pnl_liq']
+
+
+def check_accounts(files):
+    """ValueError when two files would be the same account.
+
+    The file stem names the account, its detail directory and its rows in
+    the drawdown and rule results.
+    """
+    seen = {}
+    for path in map(Path, files):
+        seen.setdefault(path.stem, []).append(str(path))
+    clashes = {stem: paths for stem, paths in seen.items() if len(paths) > 1}
+    if clashes:
+        raise ValueError('files with the same account name: '
+                         + '; '.join(f'{stem}: {", ".join(paths)}' for stem, paths in clashes.items()))
+
+
+def account_files(sources):
+    """Export files named by directories and glob patterns, sorted and de-duplicated.
+
+    Raises ValueError when two of them share a file stem (check_accounts).
+    """
+    files = set()
+    for source in sources:
+        path = Path(source)
+        if path.is_dir():
+            files.update(p for p in path.iterdir() if p.suffix.lower() in EXPORT_SUFFIXES)
+        else:
+            files.update(Path(p) for p in glob.glob(source))
+    files = sorted(files)
+    check_accounts(files)
+    return files
+
+
+def analyze_account(df, malformed=None):
+    """Summary metrics and detail tables of one enriched account, as on the app's pages."""
+    review = account_review(df, malformed=malformed)
+    details = {
+        'overlap_groups': simultaneous_positions(df).groups,
+        'quick_trades': review.quick_trades[['ticket', 'symbol', 'pnl_liq', 'volume', 'lots', 'duration',
+                                             'open-price', 'close-price', 'TradeDay']].reset_index(drop=True),
+        'regular_intervals': regular_intervals(df).table,
+        'trades_without_sl': review.no_sl.by_day,
+        'daily_pnl': review.consistency.daily.reset_index(),
+        'martingale_clusters': review.martingale.clusters,
+        'loss_reversal_pairs': review.martingale.reversals,
+    }
+    return review.summary, details
+
+
+def _write_details(details, directory):
+    directory.mkdir(parents=True, exist_ok=True)
+    for name, table in details.items():
+        table.to_parquet(directory / f'{name}.parquet', index=False)
+
+
+def run_account(path, out_dir, start=None, end=None):
+    """Load, enrich and analyze one export; failures become an `error` in its summary row.
+
+    Returns the summary row and the account's trades reduced to what the
+    drawdown and program rules need (None on failure).
+    """
+    account = Path(path).stem
+    began = time.perf_counter()
+    try:
+        df, malformed = manipulation_data_frame(read_trades(path, start, end))
+        summary, details = analyze_account(df, malformed)
+        _write_details(details, Path(out_dir) / account)
+        trades = pd.DataFrame({'account': account, **{column: df[column] for column in RULE_COLUMNS}})
+        error = None
+    except Exception as e:
+        summary, trades, error = {}, None, f'{type(e).__name__}: {e}'
+    return {'account': account, 'file': str(path), **summary, 'error': error,
+            'seconds': time.perf_counter() - began}, trades
+
+
+def run_batch(files, out_dir, workers=None, start=None, end=None, limits=None, program=None):
+    """Summary frame with one row per file, in the order of `files`.
+
+    `limits` are the DrawdownLimits of every account, or a frame of them
+    indexed by account (file stem). `program` is a rules.PayoutProgram
+    checked against every account. Raises ValueError when two files share
+    a stem.
+    """
+    check_accounts(files)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    n = len(files)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        rows, trades = zip(*pool.map(run_account, files, [out_dir] * n, [start] * n, [end] * n)) if n else ((), ())
+    summary = pd.DataFrame(list(rows))
+    # every account scored in one pass over the summary columns
+    summary = summary.join(risk_scores(summary))
+    # and every account's equity curve checked in one vectorized call
+    trades = [frame for frame in trades if frame is not None]
+    if trades:
+        trades = pd.concat(trades, ignore_index=True)
+        drawdown = evaluate_drawdown(trades, limits)
+        summary = summary.join(drawdown.summary[DRAWDOWN_COLUMNS], on='account')
+        drawdown.breaches.to_parquet(out_dir / 'breaches.parquet', index=False)
+        if program is not None:
+            report = evaluate_program(trades, program)
+            summary = summary.join(report.summary.add_prefix('rule_').rename(columns={'rule_passed': 'program_passed'}),
+                                   on='account')
+            report.results.to_parquet(out_dir / 'rule_results.parquet', index=False)
+            report.violations.to_parquet(out_dir / 'rule_violations.parquet', index=False)
+    summary.to_parquet(out_dir / 'summary.parquet', index=False)
+    with open(out_dir / 'summary.json', 'w') as sink:
+        json.dump(json.loads(summary.to_json(orient='records', date_format='iso')), sink, indent=2)
+    return summary
+
+
+def _day_bound(value, end=False):
+    # local midnight of the day, or the last instant of it for --end
+    if value is None:
+        return None
+    bound = pd.Timestamp(value).tz_localize(BROKER_TIMEZONE)
+    return bound + pd.Timedelta(days=1) - pd.Timedelta(1, 'ns') if end else bound
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('sources', nargs='+', help='directories or glob patterns of CSV/XLSX exports')
+    parser.add_argument('--out', default='review', help='output directory (default: review)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--start', help='first trade day, YYYY-MM-DD')
+    parser.add_argument('--end', help='last trade day (inclusive), YYYY-MM-DD')
+    parser.add_argument('--starting-balance', type=float, default=DrawdownLimits.starting_balance)
+    parser.add_argument('--max-daily-loss', type=float, default=DrawdownLimits.max_daily_loss,
+                        help='loss from the day\'s opening equity that breaches (default: %(default)s)')
+    parser.add_argument('--max-drawdown', type=float, default=DrawdownLimits.max_trailing_drawdown,
+                        help='distance below the equity high-water mark that breaches (default: %(default)s)')
+    parser.add_argument('--profit-target', type=float, default=DrawdownLimits.profit_target)
+    parser.add_argument('--program', help='payout program definition (JSON or YAML) to check every account against')
+    args = parser.parse_args()
+
+    try:
+        files = account_files(args.sources)
+    except ValueError as e:
+        parser.error(str(e))
+    if not files:
+        parser.error('no CSV/XLSX files found')
+    try:
+        program = load_program(args.program) if args.program else None
+    except (OSError, ValueError) as e:
+        parser.error(f'--program: {e}')
+    began = time.perf_counter()
+    limits = DrawdownLimits(args.starting_balance, args.max_daily_loss, args.max_drawdown, args.profit_target)
+    summary = run_batch(files, args.out, args.workers, _day_bound(args.start), _day_bound(args.end, end=True),
+                        limits, program)
+    elapsed = time.perf_counter() - began
+    failed = summary['error'].notna().sum()
+    print(f'{len(summary)} accounts ({failed} failed) in {elapsed:.1f}s: '
+          f'{len(summary) / elapsed * 60:.1f} accounts/min with {args.workers} workers')
+    print(f'summary written to {Path(args.out) / "summary.parquet"}')
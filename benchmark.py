@@ -0,0 +1,145 @@
+"""Scaling benchmarks for every analysis stage, on synthetic broker exports.
+
+    python benchmark.py --sizes 1000 100000 1000000 --json bench.json
+    python benchmark.py --sizes 10000000 --json bench_10m.json --compare bench.json
+
+Each size gets a CSV from synthetic.py (kept under --data-dir and reused).
+Every stage is timed on its own (best of --repeat) and then run once more
+under tracemalloc for its peak Python/NumPy allocation; Arrow buffers are
+added from pyarrow's pool. A flat ns/row column means the stage scales
+linearly with the number of trades.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import pyarrow as pa
+
+from charts import trade_timeline
+from cube import build_cube
+from ingest import manipulation_data_frame, read_trades
+from reports import (consistency_metrics, gambling_behavior, general_statistics, martingale, overview,
+                     regular_intervals, simultaneous_positions, stop_loss_summary, trade_duration, trade_frequency)
+from synthetic import generate_trades, write_trades
+
+
+# page computations, in the order of the app's menu; each takes the enriched frame
+# (and builds its own cube, which the app shares between pages)
+PAGE_STAGES = {
+    'cube': build_cube,
+    'overview': overview,
+    'general_statistics': general_statistics,
+    'trade_frequency': trade_frequency,
+    'trade_duration': trade_duration,
+    'simultaneous_positions': simultaneous_positions,
+    'regular_intervals': regular_intervals,
+    'gambling_behavior': gambling_behavior,
+    'stop_loss': stop_loss_summary,
+    'martingale': martingale,
+    'consistency': consistency_metrics,
+}
+
+FIGURE_STAGES = {
+    'timeline_figure': trade_timeline,
+    'cumulative_pnl_figure': lambda df: px.line(df.assign(cumulative_pnl=df['pnl_liq'].cumsum()),
+                                                x='trade-date', y='cumulative_pnl'),
+    'duration_histogram_figure': lambda df: px.histogram(df, x='duration', marginal='box'),
+}
+
+
+def synthetic_export(n, data_dir, seed=0):
+    """Path of a synthetic export with `n` trades, generated on first use."""
+    path = Path(data_dir) / f'trades_{n}_seed{seed}.csv'
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_trades(generate_trades(n, symbols=40, seed=seed), path)
+    return path
+
+
+def _best_of(func, arg, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _peak_bytes(func, arg):
+    pool = pa.default_memory_pool()
+    arrow_before = pool.bytes_allocated()
+    tracemalloc.start()
+    try:
+        result = func(arg)
+        arrow = pool.bytes_allocated() - arrow_before
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak + max(arrow, 0)
+
+
+def _stage(rows, name, n, func, arg, repeat):
+    seconds = _best_of(func, arg, repeat)
+    rows.append({'stage': name, 'rows': n, 'seconds': seconds, 'ns_per_row': seconds / n * 1e9,
+                 'peak_mb': _peak_bytes(func, arg) / 2**20})
+
+
+def bench_stages(sizes=(1_000, 100_000, 1_000_000), repeat=3, data_dir='.cache/synthetic'):
+    rows = []
+    for n in sizes:
+        path = synthetic_export(n, data_dir)
+        _stage(rows, 'load', n, read_trades, path, repeat)
+        # manipulation_data_frame rewrites its input, so each run gets a fresh copy
+        raw = read_trades(path)
+        _stage(rows, 'manipulation_data_frame', n, lambda r: manipulation_data_frame(r.copy()), raw, repeat)
+        df, _ = manipulation_data_frame(raw)
+        for name, func in {**PAGE_STAGES, **FIGURE_STAGES}.items():
+            _stage(rows, name, n, func, df, repeat)
+    return pd.DataFrame(rows)
+
+
+def _environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'numpy': np.__version__,
+            'pandas': pd.__version__, 'pyarrow': pa.__version__, 'machine': platform.machine()}
+
+
+def compare(results, baseline):
+    """Time and memory ratios of `results` against a previous run's frame (>1 means slower/bigger)."""
+    merged = results.merge(baseline, on=['stage', 'rows'], suffixes=('', '_baseline'))
+    merged['time_ratio'] = merged['seconds'] / merged['seconds_baseline']
+    merged['memory_ratio'] = merged['peak_mb'] / merged['peak_mb_baseline']
+    return merged[['stage', 'rows', 'seconds', 'seconds_baseline', 'time_ratio', 'peak_mb', 'memory_ratio']]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--data-dir', default='.cache/synthetic')
+    parser.add_argument('--json', help='write the results (and environment) to this file')
+    parser.add_argument('--compare', help='results JSON of a previous run to compare against')
+    args = parser.parse_args()
+
+    results = bench_stages(args.sizes, args.repeat, args.data_dir)
+    print(results.to_string(index=False, float_format='{:.4g}'.format))
+    if args.json:
+        with open(args.json, 'w') as sink:
+            json.dump({'environment': _environment(), 'results': results.to_dict(orient='records')}, sink, indent=2)
+    if args.compare:
+        with open(args.compare) as source:
+            baseline = pd.DataFrame(json.load(source)['results'])
+        print()
+        print(compare(results, baseline).to_string(index=False, float_format='{:.3g}'.format))
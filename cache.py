@@ -0,0 +1,211 @@
+import dataclasses
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+
+CACHE_DIR = Path(os.environ.get('PAYOUTS_CACHE_DIR', '.cache'))
+CACHE_MAX_BYTES = int(os.environ.get('PAYOUTS_CACHE_MAX_BYTES', 2 * 1024**3))
+RESULTS_MAX_BYTES = int(os.environ.get('PAYOUTS_RESULTS_MAX_BYTES', 512 * 1024**2))
+# Bump whenever manipulation_data_frame changes the frame it produces
+FRAME_VERSION = 5
+
+# reports cached next to a frame (malformed timestamps, ...) live in its schema metadata
+_REPORT_PREFIX = b'payouts.report.'
+
+
+def content_hash(data):
+    digest = hashlib.blake2b(digest_size=16)
+    view = memoryview(data)
+    for start in range(0, len(view), 1 << 24):
+        digest.update(view[start:start + (1 << 24)])
+    return digest.hexdigest()
+
+
+def _frames_dir(cache_dir):
+    path = Path(cache_dir) / 'frames'
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _report_bytes(report):
+    # a small frame as an Arrow IPC stream; the pandas metadata keeps its index and dtypes
+    table = pa.Table.from_pandas(report)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _arrow_table(df):
+    # float NaN stays a value instead of becoming a null, so those columns read back without a copy
+    table = pa.Table.from_pandas(df)
+    for name, dtype in df.dtypes.items():
+        i = table.schema.get_field_index(name)
+        if isinstance(dtype, np.dtype) and dtype.kind == 'f' and i >= 0 and table.column(i).null_count:
+            table = table.set_column(i, table.schema.field(i), pa.array(df[name].to_numpy(), from_pandas=False))
+    return table
+
+
+def write_frame(df, path, block_rows=None, reports=None):
+    """Write `df` as an Arrow IPC file, atomically, with the `reports` frames (by name) alongside.
+
+    With `block_rows` the file is split into record batches of that many
+    rows, which readers can then fetch one at a time. Without, it holds a
+    single batch, which read_frame can map without copying.
+    """
+    table = _arrow_table(df)
+    if block_rows is None:
+        table = table.combine_chunks()
+    if reports:
+        metadata = dict(table.schema.metadata or {})
+        for name, report in reports.items():
+            metadata[_REPORT_PREFIX + name.encode()] = _report_bytes(report)
+        table = table.replace_schema_metadata(metadata)
+    # write next to the target and rename, so readers never see a partial file
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=block_rows)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _read_table(path):
+    with pa.memory_map(str(path)) as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def _to_frame(table):
+    # numeric and text columns without nulls keep pointing into the memory map (read-only);
+    # the Arrow buffers are released column by column as they are converted
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def read_frame(path):
+    """Frame written by write_frame, read through a memory map.
+
+    Columns that need no conversion are not copied, so the frame's arrays
+    are read-only views of the file; assigning whole columns still works.
+    """
+    return _to_frame(_read_table(path))
+
+
+def _read_reports(table):
+    # the reports written alongside a frame, by name
+    return {key[len(_REPORT_PREFIX):].decode(): pa.ipc.open_stream(value).read_all().to_pandas()
+            for key, value in (table.schema.metadata or {}).items() if key.startswith(_REPORT_PREFIX)}
+
+
+def evict(cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, keep=()):
+    """Delete least recently used frames until the cache fits in `max_bytes`."""
+    files = sorted(_frames_dir(cache_dir).glob('*.arrow'), key=lambda p: p.stat().st_mtime)
+    total = sum(p.stat().st_size for p in files)
+    for path in files:
+        if total <= max_bytes:
+            break
+        if path in keep:
+            continue
+        total -= path.stat().st_size
+        path.unlink(missing_ok=True)
+
+
+def cached_frame(data, build, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, variant='', digest=None):
+    """Enriched frame and its reports for the uploaded `data` bytes, built with `build()` on a miss.
+
+    `build` returns the frame and a dict of report frames by name; both are
+    returned, from the cache or freshly built. Frames are stored as Arrow IPC
+    files named after the hash of the raw bytes (plus `variant`, for
+    differently built frames of the same upload) and reloaded through a
+    memory map. Hits refresh the file's mtime, which is what `evict` orders
+    by. Pass `digest` when `content_hash(data)` is already known.
+    """
+    digest = digest or content_hash(data)
+    suffix = f'-{variant}' if variant else ''
+    path = _frames_dir(cache_dir) / f'{digest}-v{FRAME_VERSION}{suffix}.arrow'
+    if path.exists():
+        try:
+            table = _read_table(path)
+            os.utime(path)
+            reports = _read_reports(table)
+            return _to_frame(table), reports
+        except (OSError, pa.ArrowInvalid):
+            path.unlink(missing_ok=True)
+
+    df, reports = build()
+    write_frame(df, path, reports=reports)
+    evict(cache_dir, max_bytes, keep=(path,))
+    return df, reports
+
+
+def _nbytes(value):
+    # rough in-memory size of a page result
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_nbytes(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_nbytes(item) for item in value.values())
+    if dataclasses.is_dataclass(value):
+        return _nbytes(vars(value))
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """In-memory LRU of page results, bounded by their estimated size.
+
+    Keys are tuples such as (dataset hash, start, end, page, name); values
+    are returned as stored, so callers must not mutate them. Safe to share
+    between Streamlit sessions.
+    """
+
+    def __init__(self, max_bytes=RESULTS_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+
+        value = compute()
+        size = _nbytes(value)
+        if size > self.max_bytes:
+            return value
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = (value, size)
+                self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.nbytes -= evicted
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
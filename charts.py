@@ -0,0 +1,386 @@
+import itertools
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from analytics import OPEN_ENDED, concurrency_steps, interval_bounds
+from ingest import time_ordered
+
+
+# Above this many trades the timeline switches to density bands
+TIMELINE_MAX_ROWS = 5000
+TIMELINE_BINS = 1000
+
+# Upper bound on the data each of the figures below ships to the browser
+CHART_MAX_BYTES = int(os.environ.get('PAYOUTS_CHART_MAX_BYTES', 2_000_000))
+HISTOGRAM_MAX_BINS = 200
+# a few points per horizontal pixel is all a line can show
+LINE_MAX_POINTS = 5000
+# items of a list column shown in a hover label
+HOVER_MAX_ITEMS = 20
+# coarser and coarser buckets for per-day tables that do not fit the budget
+COARSER_PERIODS = ('W', 'M', 'Q', 'Y')
+# serialized size of one value in the figure JSON: ISO timestamps, and numbers or short labels
+_DATETIME_BYTES = 34
+_VALUE_BYTES = 20
+
+_TIMELINE_HOVER = (
+    'Ticket: %{customdata[0]}<br>'
+    'Side: %{customdata[1]}<br>'
+    'Symbol: %{customdata[2]}<br>'
+    'Lots: %{customdata[3]}<br>'
+    'PnL: %{customdata[4]}<br>'
+    'Duration (Hours): %{customdata[5]:.2f}<br>'
+    'Open Time: %{customdata[6]}<br>'
+    'Close Time: %{customdata[7]}<br>'
+    '<extra></extra>'
+)
+
+
+def _wall_clock(values):
+    # exchange-local wall time without the tz, like the rest of the charts
+    values = pd.Series(values)
+    if values.dt.tz is not None:
+        values = values.dt.tz_localize(None)
+    return values.to_numpy(dtype='datetime64[ns]')
+
+
+def trade_timeline(df, max_rows=TIMELINE_MAX_ROWS, bins=TIMELINE_BINS,
+                   open_col='open-time', close_col='close-time'):
+    """Trade durations and overlaps as a single trace.
+
+    Up to `max_rows` trades every trade is a horizontal segment in one WebGL
+    trace. Past that the figure shows the maximum number of open positions
+    per time bucket, so the payload is bounded by `bins` points.
+    """
+    if len(df) > max_rows:
+        return _density_timeline(df, bins, open_col, close_col)
+
+    trades = time_ordered(df, open_col)
+    n = len(trades)
+    opens = _wall_clock(trades[open_col])
+    closes = _wall_clock(trades[close_col])
+    duration_hours = (closes - opens) / np.timedelta64(1, 'h')
+
+    # open, close and a NaN gap per trade
+    x = np.repeat(opens, 3)
+    x[1::3] = closes
+    x[2::3] = closes
+    y = np.repeat(np.arange(n, dtype=np.float64), 3)
+    y[2::3] = np.nan
+
+    customdata = np.column_stack([
+        trades['ticket'].to_numpy(dtype=object),
+        trades['side'].to_numpy(dtype=object),
+        trades['symbol'].to_numpy(dtype=object),
+        trades['lots'].to_numpy(dtype=object),
+        trades['pnl_liq'].to_numpy(dtype=object),
+        duration_hours.astype(object),
+        np.datetime_as_string(opens, unit='s').astype(object),
+        np.datetime_as_string(closes, unit='s').astype(object),
+    ])
+
+    fig = go.Figure(go.Scattergl(
+        x=x,
+        y=y,
+        mode='lines',
+        line=dict(width=4, color='#1e87f7'),
+        customdata=np.repeat(customdata, 3, axis=0),
+        hovertemplate=_TIMELINE_HOVER,
+    ))
+    fig.update_layout(
+        title='Trade Durations and Overlaps',
+        xaxis_title='Time',
+        yaxis_title='Trades',
+        yaxis=dict(showticklabels=False),
+        showlegend=False,
+        height=800
+    )
+    return fig
+
+
+def _density_timeline(df, bins, open_col, close_col):
+    # a NaT open or close (malformed timestamp) would stretch the buckets back to 1677
+    df = df[df[open_col].notna() & df[close_col].notna()]
+    if df.empty:
+        return go.Figure().update_layout(title='Trade Durations and Overlaps (no trades with valid times)')
+    opens, closes = interval_bounds(df, open_col, close_col)
+    times, levels = concurrency_steps(opens, closes)
+    last = times[times != OPEN_ENDED].max()
+    edges = np.linspace(times[0], last, bins + 1).astype(np.int64)
+
+    # level carried into each bucket, raised by any event inside it
+    entering = np.searchsorted(times, edges[:-1], side='right') - 1
+    peak = np.where(entering >= 0, levels[np.maximum(entering, 0)], 0)
+    start = np.searchsorted(times, edges[:-1], side='left')
+    stop = np.searchsorted(times, edges[1:], side='left')
+    busy = start < stop
+    if busy.any():
+        peak[busy] = np.maximum(peak[busy], np.maximum.reduceat(levels, start[busy]))
+
+    tz = df[open_col].dt.tz
+    buckets = pd.to_datetime(edges[:-1], utc=True)
+    buckets = buckets.tz_convert(tz).tz_localize(None) if tz is not None else buckets.tz_localize(None)
+
+    fig = go.Figure(go.Scatter(
+        x=buckets,
+        y=peak,
+        mode='lines',
+        line=dict(shape='hv', color='#1e87f7'),
+        fill='tozeroy',
+        hovertemplate='%{x}<br>Open Positions (max): %{y}<extra></extra>',
+    ))
+    fig.update_layout(
+        title=f'Trade Durations and Overlaps (max open positions per bucket, {len(df)} trades)',
+        xaxis_title='Time',
+        yaxis_title='Open Positions',
+        showlegend=False,
+        height=800
+    )
+    return fig
+
+
+def _row_bytes(df, columns):
+    return sum(_DATETIME_BYTES if pd.api.types.is_datetime64_any_dtype(df[c]) else _VALUE_BYTES
+               for c in dict.fromkeys(c for c in columns if c is not None))
+
+
+def point_budget(df, columns, max_bytes=CHART_MAX_BYTES):
+    """How many rows of `columns` fit in `max_bytes` of figure data."""
+    return max(int(max_bytes // _row_bytes(df, columns)), 100)
+
+
+def _as_float(values):
+    # numeric or datetime column as float64 (wall-clock ns for datetimes), NaN for missing
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        ns = _wall_clock(values)
+        result = ns.view(np.int64).astype(np.float64)
+        result[np.isnat(ns)] = np.nan
+        return result
+    return values.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def lttb_indices(x, y, n_out):
+    """Positions of the `n_out` points Largest-Triangle-Three-Buckets keeps of a series sorted by `x`.
+
+    The first and last points always stay; every bucket in between keeps
+    the point forming the largest triangle with the previous pick and the
+    next bucket's average, so peaks and troughs survive.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    sizes = np.diff(edges)
+    next_x = np.append(np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / sizes, x[-1])
+    next_y = np.append(np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / sizes, y[-1])
+
+    picked = np.empty(n_out, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        cx, cy = next_x[i + 1], next_y[i + 1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(np.nan_to_num(area, nan=-1.0)))
+        picked[i + 1] = a
+    return picked
+
+
+def stratified_sample(df, n, by=None, extremes=(), seed=0):
+    """About `n` rows of `df`, each `by` group keeping its share (at least one row).
+
+    The rows holding the minimum and maximum of each `extremes` column in
+    every group are always kept, so axis ranges and whiskers match the
+    full data. Row order is preserved.
+    """
+    if len(df) <= n:
+        return df
+    groups = np.zeros(len(df), dtype=np.int64)
+    if by is not None:
+        groups = df.groupby(by, observed=True, sort=False).ngroup().to_numpy().copy()
+        groups[groups < 0] = groups.max() + 1  # rows with a missing key form their own group
+    sizes = np.bincount(groups)
+    quota = np.maximum(np.round(n * sizes / len(df)), 1).astype(np.int64)
+
+    # a random rank within each group; the first `quota` of every group stay
+    order = np.lexsort((np.random.default_rng(seed).random(len(df)), groups))
+    rank = np.arange(len(df)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    keep = np.zeros(len(df), dtype=bool)
+    keep[order] = rank < quota[groups[order]]
+
+    for column in extremes:
+        values = _as_float(df[column])
+        valid = np.flatnonzero(~np.isnan(values))
+        by_value = valid[np.lexsort((values[valid], groups[valid]))]
+        if not len(by_value):
+            continue
+        bounds = np.flatnonzero(np.diff(groups[by_value])) + 1
+        keep[by_value[np.r_[0, bounds]]] = True
+        keep[by_value[np.r_[bounds - 1, len(by_value) - 1]]] = True
+    return df.iloc[np.flatnonzero(keep)]
+
+
+def _box_stats(df, y, keys):
+    # Plotly's own box statistics: linear quartiles, whiskers at the furthest points within 1.5 IQR
+    values = df[y].astype(np.float64)
+    by = [df[key] for key in keys] or np.zeros(len(df), dtype=np.int8)
+    grouped = values.groupby(by, observed=True, sort=False)
+    q1 = grouped.transform('quantile', 0.25)
+    q3 = grouped.transform('quantile', 0.75)
+    fence = 1.5 * (q3 - q1)
+    stats = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    stats.columns = ['q1', 'median', 'q3']
+    stats['lowerfence'] = values.where(values >= q1 - fence).groupby(by, observed=True, sort=False).min()
+    stats['upperfence'] = values.where(values <= q3 + fence).groupby(by, observed=True, sort=False).max()
+    return stats.reset_index(drop=not keys)
+
+
+def line_figure(df, x, y, max_bytes=CHART_MAX_BYTES, **kwargs):
+    """px.line of one series (or a list of them), LTTB-downsampled when the rows do not fit `max_bytes`.
+
+    With several series each keeps its own LTTB points from an equal share
+    of the budget, and the rows kept are the union of them.
+    """
+    ys = [y] if isinstance(y, str) else list(y)
+    n = min(point_budget(df, [x, *ys], max_bytes), LINE_MAX_POINTS)
+    if len(df) > n:
+        xs = _as_float(df[x])
+        df = df.iloc[np.flatnonzero(~np.isnan(xs))]
+        xs = xs[~np.isnan(xs)]
+        keep = [lttb_indices(xs, _as_float(df[column]), max(n // len(ys), 3)) for column in ys]
+        df = df.iloc[np.unique(np.concatenate(keep))]
+    return px.line(df, x=x, y=y, **kwargs)
+
+
+def scatter_figure(df, x, y, color=None, max_bytes=CHART_MAX_BYTES, **kwargs):
+    """px.scatter of a stratified sample (per `color`) when the rows do not fit `max_bytes`."""
+    df = stratified_sample(df, point_budget(df, [x, y, color], max_bytes), by=color, extremes=(x, y))
+    return px.scatter(df, x=x, y=y, color=color, **kwargs)
+
+
+def violin_figure(df, y, x=None, color=None, max_bytes=CHART_MAX_BYTES, **kwargs):
+    """px.violin of a stratified sample when the rows do not fit `max_bytes`.
+
+    Each group keeps its extremes, so the violins span the same range.
+    """
+    by = [c for c in dict.fromkeys((x, color)) if c is not None] or None
+    df = stratified_sample(df, point_budget(df, [x, y, color], max_bytes), by=by, extremes=(y,))
+    return px.violin(df, x=x, y=y, color=color, **kwargs)
+
+
+def bar_figure(df, x, y, max_bytes=CHART_MAX_BYTES, **kwargs):
+    """px.bar of one bar segment per row, or of the per-`x` sums when the rows do not fit `max_bytes`."""
+    if len(df) > point_budget(df, [x, y], max_bytes):
+        df = df.groupby(x, observed=True, as_index=False)[y].sum()
+    return px.bar(df, x=x, y=y, **kwargs)
+
+
+def histogram_figure(df, x, nbins=None, marginal=None, max_bytes=CHART_MAX_BYTES, **kwargs):
+    """px.histogram, binned here when the rows do not fit `max_bytes`.
+
+    The bins go to Plotly as (centre, count) pairs summed into the same
+    bins, and a 'box' marginal as precomputed quartiles and whiskers
+    (without outlier points). Other marginals are not supported then.
+    """
+    if len(df) <= point_budget(df, [x], max_bytes):
+        return px.histogram(df, x=x, nbins=nbins, marginal=marginal, **kwargs)
+    values = _as_float(df[x])
+    values = values[~np.isnan(values)]
+    edges = np.histogram_bin_edges(values, bins=nbins or 'auto')
+    if len(edges) > HISTOGRAM_MAX_BINS + 1:
+        edges = np.linspace(edges[0], edges[-1], HISTOGRAM_MAX_BINS + 1)
+    counts, _ = np.histogram(values, edges)
+    binned = pd.DataFrame({x: (edges[:-1] + edges[1:]) / 2, 'count': counts})
+
+    fig = px.histogram(binned, x=x, y='count', histfunc='sum', marginal=marginal, **kwargs)
+    fig.update_traces(xbins=dict(start=edges[0], end=edges[-1], size=edges[1] - edges[0]),
+                      selector=dict(type='histogram'))
+    fig.update_layout(yaxis_title_text='count')
+    if marginal == 'box':
+        stats = _box_stats(pd.DataFrame({x: values}), x, []).iloc[0]
+        fig.update_traces(x=None, y=[0], orientation='h', selector=dict(type='box'),
+                          **{k: [stats[k]] for k in ('q1', 'median', 'q3', 'lowerfence', 'upperfence')})
+    return fig
+
+
+def box_figure(df, y, x=None, color=None, max_bytes=CHART_MAX_BYTES, **kwargs):
+    """px.box, with the quartiles and whiskers computed here when the rows do not fit `max_bytes`.
+
+    Precomputed boxes carry no outlier points.
+    """
+    if len(df) <= point_budget(df, [x, y, color], max_bytes):
+        return px.box(df, x=x, y=y, color=color, **kwargs)
+    keys = [c for c in dict.fromkeys((color, x)) if c is not None]
+    stats = _box_stats(df, y, keys)
+    # one row per box lays the figure out exactly like px would; the statistics replace its data
+    fig = px.box(stats.assign(**{y: stats['median']}), x=x, y=y, color=color, **kwargs)
+    for trace in fig.data:
+        rows = stats if color is None else stats[stats[color].astype(str) == trace.name]
+        fig_stats = {k: rows[k].to_numpy() for k in ('q1', 'median', 'q3', 'lowerfence', 'upperfence')}
+        trace.update(y=None, boxpoints=False, **fig_stats)
+        if x is not None:
+            trace.update(x=rows[x].to_numpy())
+    return fig
+
+
+def ecdf_figure(df, x, max_bytes=CHART_MAX_BYTES, **kwargs):
+    """px.ecdf, or the LTTB-downsampled step curve when the rows do not fit `max_bytes`."""
+    if len(df) <= point_budget(df, [x], max_bytes):
+        return px.ecdf(df, x=x, **kwargs)
+    values = np.sort(_as_float(df[x]))
+    values = values[~np.isnan(values)]
+    probability = np.arange(1, len(values) + 1) / len(values)
+    keep = lttb_indices(values, probability, min(point_budget(df, [x, x], max_bytes), LINE_MAX_POINTS))
+    curve = pd.DataFrame({x: values[keep], 'probability': probability[keep]})
+    return px.line(curve, x=x, y='probability', line_shape='hv', **kwargs)
+
+
+def capped_lists(values, limit=HOVER_MAX_ITEMS):
+    """A list column with each list cut to `limit` items plus a '+N more' marker, for hover labels."""
+    return values.map(lambda items: items if len(items) <= limit
+                      else [*items[:limit], f'+{len(items) - limit} more'])
+
+
+def coarsen_days(df, day_col, keys, sums, lists=(), max_bytes=CHART_MAX_BYTES):
+    """A per-day table re-aggregated into weeks, months... until it fits `max_bytes`.
+
+    `sums` are added up and `lists` concatenated (keeping HOVER_MAX_ITEMS
+    items) per bucket and `keys`; `day_col` becomes the bucket's first day.
+    The table comes back unchanged when it already fits.
+    """
+    row_bytes = _row_bytes(df, [day_col, *keys, *sums]) + len(lists) * HOVER_MAX_ITEMS * _VALUE_BYTES
+    max_rows = max(int(max_bytes // row_bytes), 1)
+    if len(df) <= max_rows:
+        return df
+    for period in COARSER_PERIODS:
+        buckets = df.assign(**{day_col: df[day_col].dt.to_period(period).dt.start_time})
+        grouped = buckets.groupby([day_col, *keys], observed=True, sort=True)
+        if grouped.ngroups <= max_rows:
+            break
+    table = grouped[list(sums)].sum()
+    for column in lists:
+        table[column] = grouped[column].agg(
+            lambda parts: list(itertools.islice(itertools.chain.from_iterable(parts), HOVER_MAX_ITEMS)))
+    return table.reset_index()
+
+
+def coarsen_columns(table, how='mean', max_bytes=CHART_MAX_BYTES):
+    """A heatmap table with runs of adjacent columns merged (`how`: 'mean' or 'sum') until it fits `max_bytes`.
+
+    Merged columns are labelled with the first one of each run.
+    """
+    max_cells = max(int(max_bytes // _VALUE_BYTES), 1)
+    if table.size <= max_cells:
+        return table
+    width = -(-table.size // max_cells)
+    runs = np.arange(table.shape[1]) // width
+    merged = table.T.groupby(runs).agg(how).T
+    merged.columns = table.columns[::width]
+    return merged
@@ -0,0 +1,72 @@
+"""Trade measures pre-aggregated at the finest grain the pages group by.
+
+One cell per (symbol, TradeDay, hour, side, has_sl) holds the number of
+trades and, for every measure, the count of non-missing values, sum,
+min, max and sum of squares. Any coarser grouping (per day, per symbol,
+hour × weekday...) is a roll-up of the cells rather than a new pass over
+the trades; means and standard deviations are derived from the sums.
+Medians and quartiles cannot be rolled up and still need the trades.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+CUBE_DIMENSIONS = ['symbol', 'TradeDay', 'hour', 'side', 'has_sl']
+CUBE_MEASURES = ['pnl', 'pnl_liq', 'lots', 'volume', 'duration']
+# dimensions derived from the stored ones at roll-up time
+_DERIVED = {'day_of_week': lambda cells: cells['TradeDay'].dt.day_name()}
+
+
+@dataclass
+class TradeCube:
+    """The cells of one trades frame; build with `build_cube`."""
+    cells: pd.DataFrame  # CUBE_DIMENSIONS, trades, then <measure>_count/_sum/_min/_max/_sumsq
+
+    def __len__(self):
+        return len(self.cells)
+
+    def rollup(self, by=(), where=None):
+        """Measures per `by` group (dimension names, or 'day_of_week').
+
+        `where` is a boolean mask over `cells` (e.g. `~cube.cells['has_sl']`).
+        Groups with a missing key are dropped, as a plain groupby on the
+        trades would. Without `by` the result has a single row.
+        """
+        cells = self.cells if where is None else self.cells[where]
+        by = list(by)
+        keys = [_DERIVED[name](cells) if name in _DERIVED else cells[name] for name in by]
+        grouped = cells.groupby([key.rename(name) for key, name in zip(keys, by)] if by else np.zeros(len(cells)),
+                                observed=True)
+        additive = [c for c in cells.columns if c == 'trades' or c.endswith(('_count', '_sum', '_sumsq'))]
+        table = grouped[additive].sum()
+        table = table.join(grouped[[c for c in cells.columns if c.endswith('_min')]].min())
+        table = table.join(grouped[[c for c in cells.columns if c.endswith('_max')]].max())
+        for measure in CUBE_MEASURES:
+            count, total = table[f'{measure}_count'], table[f'{measure}_sum']
+            with np.errstate(invalid='ignore', divide='ignore'):
+                table[f'{measure}_mean'] = total / count.where(count > 0)
+                variance = (table[f'{measure}_sumsq'] - total ** 2 / count) / (count - 1)
+            table[f'{measure}_std'] = np.sqrt(variance.clip(lower=0).where(count > 1))
+        return table if by else table.reset_index(drop=True)
+
+
+def build_cube(df) -> TradeCube:
+    """One pass over the trades: group codes once, then every statistic per code."""
+    keys = pd.DataFrame({'symbol': df['symbol'], 'TradeDay': df['TradeDay'], 'hour': df['trade-date'].dt.hour,
+                         'side': df['side'], 'has_sl': df['sl'].notna()})
+    codes = keys.groupby(CUBE_DIMENSIONS, observed=True, dropna=False, sort=True).ngroup().to_numpy()
+    values = pd.DataFrame({m: df[m].to_numpy(dtype=np.float64, na_value=np.nan) for m in CUBE_MEASURES})
+
+    grouped = values.groupby(codes, sort=True)
+    stats = grouped.agg(['count', 'sum', 'min', 'max'])
+    stats.columns = [f'{measure}_{stat}' for measure, stat in stats.columns]
+    squares = (values ** 2).groupby(codes, sort=True).sum()
+    squares.columns = [f'{measure}_sumsq' for measure in squares.columns]
+
+    first = np.unique(codes, return_index=True)[1]
+    cells = keys.iloc[first].reset_index(drop=True)
+    cells['trades'] = np.bincount(codes)
+    cells = pd.concat([cells, stats.reset_index(drop=True), squares.reset_index(drop=True)], axis=1)
+    return TradeCube(cells)
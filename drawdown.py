@@ -0,0 +1,174 @@
+"""Closed-trade equity curves and the prop-firm loss limits checked on them.
+
+Every closed trade moves the account's equity by its pnl_liq at its
+close-time. The high-water mark is the running maximum of that equity
+(never below the starting balance); the trailing drawdown is the distance
+below it. The daily loss is measured from the equity the session day
+opened with, session days being the New York wall-clock days TradeDay
+uses, taken at the close. Trades of many accounts are evaluated in one
+call: they only need an `account` column.
+"""
+from dataclasses import asdict, dataclass, fields
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class DrawdownLimits:
+    """One program's limits in account currency; None disables a rule."""
+    starting_balance: float = 100_000.0
+    max_daily_loss: float | None = 5_000.0
+    max_trailing_drawdown: float | None = 10_000.0
+    profit_target: float | None = 10_000.0
+
+
+@dataclass
+class DrawdownReport:
+    equity: pd.DataFrame  # one row per closed trade, in close order per account
+    daily: pd.DataFrame  # one row per account and session day
+    breaches: pd.DataFrame  # first breach of each rule per account and session day
+    summary: pd.DataFrame  # one row per account
+
+
+def _limit_table(limits, accounts):
+    # DrawdownLimits for every account, or a frame of limits indexed by account (missing ones get the defaults)
+    columns = [field.name for field in fields(DrawdownLimits)]
+    if isinstance(limits, DrawdownLimits):
+        return pd.DataFrame([asdict(limits)] * len(accounts), index=accounts, columns=columns, dtype=np.float64)
+    table = pd.DataFrame(limits).reindex(index=accounts, columns=columns).astype(np.float64)
+    return table.fillna({'starting_balance': DrawdownLimits.starting_balance})
+
+
+def _first_per_group(mask, group):
+    # positions of the first True of each group; rows must be sorted by group
+    hits = np.flatnonzero(mask)
+    if not len(hits):
+        return hits
+    return hits[np.r_[True, group[hits][1:] != group[hits][:-1]]]
+
+
+def _run_starts(*keys):
+    # True where a run of equal keys starts; rows must be sorted by them
+    starts = np.ones(len(keys[0]), dtype=bool)
+    starts[1:] = np.logical_or.reduce([key[1:] != key[:-1] for key in keys])
+    return starts
+
+
+def _run_max(values, starts):
+    # maximum of every run beginning at `starts`
+    return np.maximum.reduceat(values, starts) if len(values) else values[:0]
+
+
+def evaluate_drawdown(trades, limits=None, account_col='account') -> DrawdownReport:
+    """Equity curve, daily and trailing-drawdown breaches and profit target of every account in `trades`.
+
+    `trades` is an enriched frame of one account, or of many with an
+    `account_col` column. `limits` is a DrawdownLimits applied to all of
+    them or a frame of limits indexed by account. Trades still open (no
+    close-time) do not count.
+    """
+    limits = DrawdownLimits() if limits is None else limits
+    closed = trades[trades['close-time'].notna()]
+    if account_col in closed:
+        codes, accounts = pd.factorize(closed[account_col].astype(str), sort=True)
+    else:
+        codes, accounts = np.zeros(len(closed), dtype=np.intp), pd.Index([''][:len(closed)], dtype=str)
+    accounts = pd.Index(accounts, name='account')
+    close_time = closed['close-time']
+    # stable sorts on integer keys, close instant then account code: the frames
+    # come nearly sorted by time and small codes sort by radix
+    order = np.argsort(close_time.array.asi8, kind='stable')
+    order = order[np.argsort(codes.astype(np.min_scalar_type(len(accounts)))[order], kind='stable')]
+    codes = codes[order]
+    close_time = close_time.take(order).reset_index(drop=True)
+    # the New York wall-clock day, like TradeDay, but of the close
+    session_day = close_time.dt.tz_localize(None).dt.normalize()
+    days = session_day.to_numpy()
+    pnl = closed['pnl_liq'].to_numpy(dtype=np.float64, na_value=0.0)[order]
+    table = _limit_table(limits, accounts)
+    limit = {column: table[column].to_numpy()[codes] for column in table.columns}
+
+    new_account = _run_starts(codes)
+    new_day = _run_starts(codes, days)
+    account_start = np.flatnonzero(new_account)
+    day_start = np.flatnonzero(new_day)
+    account_group = np.cumsum(new_account) - 1
+    day_group = np.cumsum(new_day) - 1
+
+    # cumulative sums restarted at every account
+    running = np.cumsum(pnl)
+    equity = limit['starting_balance'] + running - (running - pnl)[account_start][account_group]
+    high_water = np.maximum(pd.Series(equity).groupby(account_group).cummax().to_numpy(), limit['starting_balance'])
+    drawdown = high_water - equity
+    day_open = (equity - pnl)[day_start][day_group]
+    daily_loss = day_open - equity
+
+    frame = pd.DataFrame({
+        'account': accounts.take(codes),
+        'ticket': closed['ticket'].take(order).array,
+        'close-time': close_time.array,
+        'session_day': session_day.array,
+        'pnl_liq': pnl,
+        'equity': equity,
+        'high_water_mark': high_water,
+        'drawdown': drawdown,
+        'drawdown_floor': high_water - limit['max_trailing_drawdown'],
+        'daily_loss': daily_loss,
+    })
+
+    # comparisons with a NaN limit are False: that rule is off
+    checks = {
+        'daily_loss': (daily_loss, limit['max_daily_loss'], daily_loss >= limit['max_daily_loss']),
+        'trailing_drawdown': (drawdown, limit['max_trailing_drawdown'], drawdown >= limit['max_trailing_drawdown']),
+    }
+    breaches = []
+    for rule, (value, rule_limit, breached) in checks.items():
+        first = _first_per_group(breached, day_group)
+        rows = frame.take(first)
+        breaches.append(pd.DataFrame({
+            'account': rows['account'].array, 'rule': rule, 'session_day': rows['session_day'].array,
+            'time': rows['close-time'].array, 'ticket': rows['ticket'].array,
+            'value': value[first], 'limit': rule_limit[first],
+        }))
+    breaches = pd.concat(breaches, ignore_index=True).sort_values(['account', 'time'], kind='stable', ignore_index=True)
+
+    day_end = np.r_[day_start[1:], len(pnl)][:len(day_start)] - 1
+    worst_loss = _run_max(daily_loss, day_start).clip(min=0)
+    max_drawdown = _run_max(drawdown, day_start)
+    daily = pd.DataFrame({
+        'account': accounts.take(codes[day_start]),
+        'session_day': session_day.take(day_start).array,
+        'trades': np.diff(np.r_[day_start, len(pnl)]),
+        'open_equity': day_open[day_start],
+        'close_equity': equity[day_end],
+        'pnl': equity[day_end] - day_open[day_start],
+        'worst_loss': worst_loss,
+        'max_drawdown': max_drawdown,
+        **{f'{rule}_breached': np.isin(np.arange(len(day_start)), day_group[breached])
+           for rule, (_, _, breached) in checks.items()},
+    })
+
+    account_end = np.r_[account_start[1:], len(pnl)][:len(account_start)] - 1
+    day_account = codes[day_start]
+    summary = pd.DataFrame({
+        'closed_trades': np.diff(np.r_[account_start, len(pnl)]),
+        'final_equity': equity[account_end],
+        'net_pnl': equity[account_end] - table['starting_balance'].to_numpy(),
+        'high_water_mark': high_water[account_end],
+        'max_drawdown': _run_max(drawdown, account_start),
+        'worst_daily_loss': _run_max(worst_loss, np.flatnonzero(_run_starts(day_account))),
+    }, index=accounts)
+    for rule in checks:
+        found = breaches[breaches['rule'] == rule].groupby('account', sort=False)['time']
+        summary[f'{rule}_breaches'] = found.size().reindex(accounts, fill_value=0)
+        summary[f'first_{rule}_breach'] = found.first().reindex(accounts)
+    target_hit = (equity - limit['starting_balance']) >= limit['profit_target']
+    reached = _first_per_group(target_hit, codes)
+    summary['profit_target_reached'] = pd.Series(close_time.take(reached).array,
+                                                 index=accounts.take(codes[reached])).reindex(accounts)
+    summary = summary.join(table)
+    no_target = summary['profit_target'].isna()
+    summary['rules_passed'] = ((summary['daily_loss_breaches'] == 0) & (summary['trailing_drawdown_breaches'] == 0)
+                               & (no_target | summary['profit_target_reached'].notna()))
+    return DrawdownReport(frame, daily, breaches, summary)
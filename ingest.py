@@ -0,0 +1,374 @@
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+
+
+BROKER_DATETIME_FORMAT = '%d/%m/%Y %I:%M:%S %p'
+BROKER_DATETIME_COLUMNS = ['trade-date', 'open-time', 'close-time']
+BROKER_TIMEZONE = 'America/New_York'
+
+# 'dd/mm/YYYY hh:MM:SS AM'
+_LAYOUT_WIDTH = 22
+_DIGIT_POSITIONS = [0, 1, 3, 4, 6, 7, 8, 9, 11, 12, 14, 15, 17, 18]
+_SEPARATORS = {2: '/', 5: '/', 10: ' ', 13: ':', 16: ':', 19: ' ', 21: 'M'}
+_DAYS_IN_MONTH = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+_NAT = np.iinfo(np.int64).min
+
+# Known columns of the broker export. Timestamps and durations stay text and
+# go through parse_broker_datetimes / duration_minutes.
+TRADE_SCHEMA = {
+    'ticket': pa.string(),
+    'trade-date': pa.string(),
+    'pnl': pa.float64(),
+    'volume': pa.float64(),
+    'lots': pa.float64(),
+    'sl': pa.float64(),
+    'tp': pa.float64(),
+    'swap': pa.float64(),
+    'commissions': pa.float64(),
+    'duration': pa.string(),
+    'side': pa.string(),
+    'open-time': pa.string(),
+    'open-price': pa.float64(),
+    'close-price': pa.float64(),
+    'close-time': pa.string(),
+    'symbol': pa.string(),
+    'comment': pa.string(),
+}
+CSV_BLOCK_SIZE = 16 << 20
+
+_MAGIC = [
+    (b'PK\x03\x04', 'xlsx'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'xls'),
+]
+
+
+def _contiguous(array):
+    # one Arrow array; columns read in blocks come back chunked
+    return array.combine_chunks() if isinstance(array, pa.ChunkedArray) else array
+
+
+def _fixed_width_codes(text, width):
+    # (n, width) uint8 matrix of the UTF-8 bytes of the values exactly `width` bytes long, and their mask
+    values = _contiguous(pa.array(text, type=pa.large_string(), from_pandas=True))
+    fits = pc.fill_null(pc.equal(pc.binary_length(values), width), False)
+    kept = values.filter(fits)
+    # the kept values are contiguous in the data buffer, `width` bytes each
+    offset = int(np.frombuffer(kept.buffers()[1], dtype=np.int64)[kept.offset]) if len(kept) else 0
+    data = np.frombuffer(kept.buffers()[2], dtype=np.uint8, count=len(kept) * width, offset=offset) if len(kept) \
+        else np.zeros(0, dtype=np.uint8)
+    return data.reshape(len(kept), width), fits.to_numpy(zero_copy_only=False)
+
+
+def _parse_fixed_layout(text):
+    # epoch nanoseconds (UTC) and a validity mask, decoded column-wise from the bytes
+    codes, fits = _fixed_width_codes(text, _LAYOUT_WIDTH)
+    digits = codes[:, _DIGIT_POSITIONS] - np.uint8(ord('0'))  # anything but a digit wraps past 9
+    ok = (digits <= 9).all(axis=1)
+    for position, separator in _SEPARATORS.items():
+        ok &= codes[:, position] == ord(separator)
+    pm = codes[:, 20] == ord('P')
+    ok &= pm | (codes[:, 20] == ord('A'))
+
+    digits = digits.astype(np.int16)
+    day = digits[:, 0] * 10 + digits[:, 1]
+    month = digits[:, 2] * 10 + digits[:, 3]
+    year = digits[:, 4] * 1000 + digits[:, 5] * 100 + digits[:, 6] * 10 + digits[:, 7]
+    hour = digits[:, 8] * 10 + digits[:, 9]
+    minute = digits[:, 10] * 10 + digits[:, 11]
+    second = digits[:, 12] * 10 + digits[:, 13]
+
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    month_days = _DAYS_IN_MONTH[np.clip(month, 1, 12) - 1] + (leap & (month == 2))
+    ok &= (month >= 1) & (month <= 12) & (day >= 1) & (day <= month_days)
+    ok &= (hour >= 1) & (hour <= 12) & (minute < 60) & (second < 60)
+
+    # days since 1970-01-01 for a proleptic Gregorian date
+    y = (year - (month <= 2)).astype(np.int32)
+    era = y // 400
+    year_of_era = y - era * 400
+    day_of_year = (153 * ((month + 9) % 12) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    days = era * 146097 + day_of_era - 719468
+
+    seconds = days.astype(np.int64) * 86_400 + (hour % 12 + 12 * pm).astype(np.int64) * 3600 + minute * 60 + second
+    ns = np.full(len(fits), _NAT, dtype=np.int64)
+    ns[fits] = np.where(ok, seconds * 10**9, _NAT)
+    valid = fits.copy()
+    valid[fits] = ok
+    return ns, valid
+
+
+def _parse_column(values, column, malformed):
+    if pd.api.types.is_datetime64_any_dtype(values):
+        # Excel exports may already hold datetimes; naive ones are UTC like the text layout
+        parsed = pd.DatetimeIndex(values)
+        if parsed.tz is None:
+            parsed = parsed.tz_localize('UTC')
+        return parsed.as_unit('ns').asi8
+
+    text = values.astype('string')
+    ns, ok = _parse_fixed_layout(text)
+    blank = text.isna().to_numpy() | (text.str.strip() == '').to_numpy(dtype=bool, na_value=True)
+    retry = ~ok & ~blank
+    if retry.any():
+        # rows outside the fixed layout (unpadded fields, stray spaces, ...)
+        fallback = pd.to_datetime(text[retry].str.strip(), format=BROKER_DATETIME_FORMAT, errors='coerce')
+        ns[retry] = pd.DatetimeIndex(fallback).as_unit('ns').asi8
+        failed = retry.copy()
+        failed[retry] = fallback.isna().to_numpy()
+        if failed.any():
+            malformed.append(pd.DataFrame({'column': column, 'row': values.index[failed], 'value': text[failed].to_numpy()}))
+    return ns
+
+
+def parse_broker_datetimes(df, columns=BROKER_DATETIME_COLUMNS, tz=BROKER_TIMEZONE):
+    """Parse the broker's day-first 12-hour timestamps.
+
+    Returns a dict of tz-aware Series (converted to `tz`) keyed by column and a
+    frame listing the values that could not be parsed, which are left as NaT.
+    Columns holding the very same strings are parsed and converted only once.
+    """
+    parsed = {}
+    malformed = []
+    seen = []  # columns already parsed
+    for column in columns:
+        values = df[column]
+        source = next((other for other in seen if values.equals(df[other])), None)
+        if source is None:
+            ns = _parse_column(values, column, malformed)
+            parsed[column] = pd.Series(pd.DatetimeIndex(ns.view('M8[ns]')).tz_localize('UTC').tz_convert(tz), index=df.index)
+            seen.append(column)
+        else:
+            parsed[column] = parsed[source]
+            malformed.extend(m.assign(column=column) for m in list(malformed) if (m['column'] == source).all())
+
+    if malformed:
+        malformed = pd.concat(malformed, ignore_index=True)
+    else:
+        malformed = pd.DataFrame(columns=['column', 'row', 'value'])
+    return parsed, malformed
+
+
+def duration_minutes(values):
+    """Broker '[DD:]HH:MM:SS' durations as float minutes; NaN when unparseable.
+
+    Only the leading run of ':'-separated numbers counts, as with the regex
+    the app matched before: with four or more fields the first four are
+    days, hours, minutes and seconds ('1:2:3:4:5' is 1 day, 2 h, 3 min, 4 s),
+    with three they are hours, minutes and seconds.
+    """
+    text = _contiguous(pc.utf8_trim_whitespace(pa.array(values.astype('string'), type=pa.large_string(), from_pandas=True)))
+    n = len(text)
+    starts = np.frombuffer(text.buffers()[1], dtype=np.int64, count=n + 1, offset=text.offset * 8)
+    lengths = np.where(text.is_null().to_numpy(zero_copy_only=False), 0, np.diff(starts))
+    data = np.frombuffer(text.buffers()[2], dtype=np.uint8) if text.buffers()[2] is not None else np.zeros(0, np.uint8)
+    data = data if len(data) else np.zeros(1, dtype=np.uint8)
+    starts = starts[:-1]
+
+    # one uint8 byte of every value per step, closing a field at each ':' and at the end of the run
+    fields = np.zeros((n, 4), dtype=np.int64)
+    count = np.zeros(n, dtype=np.int64)
+    current = np.zeros(n, dtype=np.int64)
+    has_digit = np.zeros(n, dtype=bool)
+    running = np.ones(n, dtype=bool)
+    for position in range(int(lengths.max(initial=0)) + 1):
+        code = np.where(position < lengths, data[np.minimum(starts + position, len(data) - 1)], 0)
+        digit = running & (code >= ord('0')) & (code <= ord('9'))
+        close = running & has_digit & ~digit
+        store = np.flatnonzero(close & (count < 4))
+        fields[store, count[store]] = current[store]
+        count += close
+        running &= digit | (close & (code == ord(':')))
+        current = np.where(digit, current * 10 + (code - np.uint8(ord('0'))), np.where(close, 0, current))
+        has_digit = (has_digit | digit) & ~close
+
+    # right-align so that the optional days field lands in column 0
+    four = count >= 4
+    days = np.where(four, fields[:, 0], 0)
+    hours, minutes, seconds = (np.where(four, fields[:, i + 1], fields[:, i]) for i in range(3))
+    total = days * 1440.0 + hours * 60.0 + minutes + seconds / 60
+    return pd.Series(np.where(count >= 3, total, np.nan), index=values.index)
+
+
+def sniff_format(head):
+    """'xlsx', 'xls' or 'csv' from the first bytes of a file."""
+    for magic, kind in _MAGIC:
+        if head.startswith(magic):
+            return kind
+    return 'csv'
+
+
+def _open_binary(source):
+    # paths are opened here; file-like objects (Streamlit uploads) are rewound
+    if isinstance(source, (str, os.PathLike)):
+        return open(source, 'rb')
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    source.seek(0)
+    return source
+
+
+def _range_mask(values, start, end):
+    # rows whose trade-date falls in [start, end]; unparseable dates are kept
+    # so that they still reach the malformed-timestamp report
+    ns = _parse_column(values, 'trade-date', [])
+    inside = np.ones(len(ns), dtype=bool)
+    if start is not None:
+        inside &= ns >= pd.Timestamp(start).as_unit('ns').value
+    if end is not None:
+        inside &= ns <= pd.Timestamp(end).as_unit('ns').value
+    return inside | (ns == _NAT)
+
+
+def _read_csv(stream, start, end, block_size):
+    reader = pa_csv.open_csv(
+        stream,
+        read_options=pa_csv.ReadOptions(block_size=block_size),
+        convert_options=pa_csv.ConvertOptions(column_types=TRADE_SCHEMA, strings_can_be_null=True),
+    )
+    filtered = start is not None or end is not None
+    batches = []
+    for batch in reader:
+        if filtered:
+            batch = batch.filter(pa.array(_range_mask(batch.column('trade-date').to_pandas(), start, end)))
+        batches.append(batch)
+    return pa.Table.from_batches(batches, schema=reader.schema).to_pandas()
+
+
+def _read_excel(stream, start, end):
+    # Excel cells may already hold datetimes, so only the plain columns are forced
+    dtypes = {column: ('string' if kind == pa.string() else 'float64')
+              for column, kind in TRADE_SCHEMA.items() if column not in BROKER_DATETIME_COLUMNS}
+    df = pd.read_excel(stream, dtype=dtypes)
+    if start is not None or end is not None:
+        df = df[_range_mask(df['trade-date'], start, end)]
+    return df.reset_index(drop=True)
+
+
+def read_trades(source, start=None, end=None, block_size=CSV_BLOCK_SIZE):
+    """Raw broker export as a DataFrame with the known columns typed by `TRADE_SCHEMA`.
+
+    The format is taken from the file's magic bytes rather than its name.
+    CSV is streamed through the pyarrow reader in `block_size` chunks; when
+    `start`/`end` (tz-aware) are given, each chunk is cut down to that
+    trade-date range before the next one is read.
+    """
+    stream = _open_binary(source)
+    try:
+        kind = sniff_format(stream.read(8))
+        stream.seek(0)
+        if kind == 'csv':
+            return _read_csv(stream, start, end, block_size)
+        return _read_excel(stream, start, end)
+    finally:
+        if stream is not source:
+            stream.close()
+
+
+# Low-cardinality text columns stored as categoricals in compact mode
+COMPACT_CATEGORIES = ['symbol', 'side', 'pnl_category', 'day_of_week']
+# Prices and sizes keep ~7 significant digits; money columns that get summed stay float64
+COMPACT_FLOAT32 = ['volume', 'sl', 'tp', 'open-price', 'close-price', 'duration']
+
+
+def _compact_ticket(values):
+    # plain integer tickets become int64; anything else (letters, leading zeros) a categorical
+    text = values.astype('string')
+    if text.notna().all() and text.str.fullmatch(r'0|[1-9]\d{0,17}').all():
+        return text.astype('int64')
+    return text.astype('category')
+
+
+def compact_frame(df):
+    """Enriched trade frame with smaller dtypes; values and column names are unchanged.
+
+    Text columns in `COMPACT_CATEGORIES` become categoricals, tickets become
+    integers when they all are, `COMPACT_FLOAT32` columns become float32 and
+    `lots` a nullable integer when every size is whole.
+    """
+    compact = df.copy()
+    for column in COMPACT_CATEGORIES:
+        if column in compact:
+            compact[column] = compact[column].astype('category')
+    if 'ticket' in compact:
+        compact['ticket'] = _compact_ticket(compact['ticket'])
+    for column in COMPACT_FLOAT32:
+        if column in compact:
+            compact[column] = compact[column].astype(np.float32)
+    if 'lots' in compact:
+        lots = compact['lots']
+        whole = lots.dropna()
+        if (whole == np.round(whole)).all() and whole.abs().max() < 2**31:
+            compact['lots'] = lots.astype('Int32')
+        else:
+            compact['lots'] = lots.astype(np.float32)
+    if 'hour_of_day' in compact:
+        compact['hour_of_day'] = compact['hour_of_day'].astype(np.int8)
+    return compact
+
+
+def memory_report(before, after):
+    """Bytes per column of two versions of the same frame, with a total row."""
+    report = pd.DataFrame({
+        'dtype_before': before.dtypes.astype(str),
+        'bytes_before': before.memory_usage(index=False, deep=True),
+        'dtype_after': after.dtypes.reindex(before.columns).astype(str),
+        'bytes_after': after.memory_usage(index=False, deep=True).reindex(before.columns),
+    })
+    report.loc['total'] = ['', report['bytes_before'].sum(), '', report['bytes_after'].sum()]
+    report['saved'] = 1 - report['bytes_after'] / report['bytes_before']
+    report.index.name = 'column'
+    return report
+
+
+def sort_trades(df, column='trade-date'):
+    """Trades in the canonical order: stable by `column`, NaT last, fresh RangeIndex."""
+    return df.sort_values(column, kind='stable', na_position='last').reset_index(drop=True)
+
+
+def time_ordered(df, column='trade-date'):
+    """`df` ordered by `column`, sorting only if it is not already."""
+    if df[column].is_monotonic_increasing:
+        return df
+    return df.sort_values(column, kind='stable', na_position='last')
+
+
+def date_slice(df, start=None, end=None, column='trade-date'):
+    """Rows with `start <= column <= end` of a frame in canonical order.
+
+    Two binary searches over the column's int64 nanoseconds and a positional
+    slice, so no mask is built and no rows are copied. Rows without a date
+    (sorted last) are never selected.
+    """
+    values = df[column]
+    ns = pd.DatetimeIndex(values).asi8
+    valid = len(ns) - int(values.isna().sum())
+    lo = 0 if start is None else int(np.searchsorted(ns[:valid], pd.Timestamp(start).as_unit('ns').value, side='left'))
+    hi = valid if end is None else int(np.searchsorted(ns[:valid], pd.Timestamp(end).as_unit('ns').value, side='right'))
+    return df.iloc[lo:max(lo, hi)]
+
+
+def manipulation_data_frame(dataframe):
+    """Enriched trades in canonical order and the frame of timestamps that could not be parsed."""
+    df = dataframe
+    # Datas em UTC no arquivo, convertidas para America/New_York
+    parsed, malformed = parse_broker_datetimes(df)
+    for column, values in parsed.items():
+        df[column] = values
+    df['duration'] = duration_minutes(df['duration'])
+    df['hour_of_day'] = df['trade-date'].dt.hour
+    df['day_of_week'] = df['trade-date'].dt.day_name()
+    df['pnl_category'] = np.where(df['pnl'] > 0, 'Gain', 'Loss')
+    df['TradeDay'] = df['trade-date'].dt.tz_localize(None).dt.normalize()
+    df['ticket'] = df['ticket'].astype(str)
+    df['commissions'] = df['commissions'].fillna(0)
+    df['pnl_liq'] = df['pnl'] - df['commissions']
+    
+    # ordem canônica por trade-date; o filtro de datas depende dela
+    return sort_trades(df), malformed
@@ -3,23 +3,35 @@ import seaborn as sns
 import streamlit as st
 import matplotlib.pyplot as plt
 import plotly.express as px
-import re
 from pytz import timezone
 from PIL import Image
 import plotly.graph_objects as go
 import time
+import json
 from streamlit_option_menu import option_menu
+from accounts import AccountStore
+from cache import ResultCache, cached_frame, content_hash
+from charts import (TIMELINE_MAX_ROWS, bar_figure, box_figure, capped_lists, coarsen_columns, coarsen_days, ecdf_figure,
+                    histogram_figure, line_figure, scatter_figure, trade_timeline, violin_figure)
+from cube import build_cube
+from drawdown import DrawdownLimits, evaluate_drawdown
+from rules import compile_program, evaluate_program, load_program, program_files
+from ingest import compact_frame, date_slice, manipulation_data_frame, memory_report, read_trades
+from profiling import PROFILE_LOG, Profiler, row_count
+from reports import (RISK_EVIDENCE, account_review, calculate_risk_score, consistency_metrics, determine_payout_action,
+                     gambling_behavior, general_statistics, martingale, overview, regular_intervals, risk_scores,
+                     simultaneous_positions, stop_loss_summary, trade_duration, trade_frequency)
 
 
 custom_params = {"axes.spines.right": False, "axes.spines.top": False}
 sns.set_theme(style='ticks', rc=custom_params)
 
-@st.cache_data
+# período padrão ao abrir uma conta armazenada: o último ciclo de payout
+REVIEW_WINDOW_DAYS = 14
+
 def load_data(file_data):
-    try:
-        return pd.read_csv(file_data)
-    except:
-        return pd.read_excel(file_data)
+    # formato detectado pelos magic bytes; o frame enriquecido fica em cache.py
+    return read_trades(file_data)
 
 def format_blue(text:str):
     st.markdown(
@@ -41,36 +53,31 @@ def blue(text:str):
         unsafe_allow_html=True
     )
 
-def manipulation_data_frame(dataframe):
-    df = dataframe
-    df['trade-date'] = pd.to_datetime(df['trade-date'], format='%d/%m/%Y %I:%M:%S %p').dt.tz_localize('UTC')
-    df['open-time'] = pd.to_datetime(df['open-time'], format='%d/%m/%Y %I:%M:%S %p').dt.tz_localize('UTC')
-    df['close-time'] = pd.to_datetime(df['close-time'], format='%d/%m/%Y %I:%M:%S %p').dt.tz_localize('UTC')
-    def duration_to_minutes(duration):      
-        match = re.match(r'(?:(\d+):)?(\d+):(\d+):(\d+)', duration)
-        if match:
-            days, hours, minutes, seconds = match.groups()
-            days = int(days) if days else 0
-            hours = int(hours)
-            minutes = int(minutes)
-            seconds = int(seconds)
-            total_minutes = days * 1440 + hours * 60 + minutes + seconds / 60
-            return total_minutes
-        return None
-    df['duration'] = df['duration'].apply(duration_to_minutes)
-    df['trade-date'] = df['trade-date'].dt.tz_convert('America/New_York')
-    df['open-time'] = df['open-time'].dt.tz_convert('America/New_York')
-    df['close-time'] = df['close-time'].dt.tz_convert('America/New_York')
-    df['hour_of_day'] = df['trade-date'].dt.hour
-    df['day_of_week'] = df['trade-date'].dt.day_name()
-    df['pnl_category'] = df['pnl'].apply(lambda x: 'Gain' if x > 0 else 'Loss')
-    df['TradeDay'] = df['trade-date'].apply(lambda x: x.strftime("%d-%m-%Y"))
-    df['TradeDay'] = pd.to_datetime(df['TradeDay'], errors='coerce', format='%d-%m-%Y')
-    df['ticket'] = df['ticket'].astype(str)
-    df['commissions'] = df['commissions'].fillna(0)
-    df['pnl_liq'] = df['pnl'] - df['commissions']
-    
-    return df
+@st.cache_resource
+def page_results():
+    # um único cache de resultados por processo, compartilhado entre sessões
+    return ResultCache()
+
+def compact_with_report(df, profiler):
+    # tipos menores e o relatório de memória da conversão
+    compact_df = profiler.call('compact', compact_frame, df, rows_in=len(df))
+    return compact_df, memory_report(df, compact_df)
+
+def build_frame(file_data, compact=False, profiler=None):
+    profiler = profiler or Profiler()
+    raw = profiler.call('parse', load_data, file_data)
+    with profiler.stage('enrichment', rows_in=len(raw)) as stage:
+        df, malformed = manipulation_data_frame(raw)
+        stage.rows_out = len(df)
+    # relatórios guardados no cache junto com o frame
+    reports = {'malformed_datetimes': malformed}
+    if compact:
+        df, reports['memory_report'] = compact_with_report(df, profiler)
+    return df, reports
+
+@st.cache_resource
+def account_store():
+    return AccountStore()
 
 def main():
     st.set_page_config(page_title="Payouts Analysis",
@@ -94,39 +101,129 @@ def main():
     st.sidebar.image('logo.jpg')
     st.sidebar.markdown("---")
 
+    # tempos de cada etapa desta execução, mostrados no painel "Performance"
+    profiler = Profiler(trace_memory=st.session_state.get('trace_allocations', False))
+
     # Carregamento do arquivo
     data_file_1 = st.sidebar.file_uploader("Open your file here", type=['csv', 'xlsx'])
+    store = account_store()
+    account = None
+    if data_file_1 is None:
+        # contas já ingeridas: só o período selecionado é lido do disco
+        account = st.sidebar.selectbox("Or open a stored account", [None] + store.accounts(),
+                                       format_func=lambda name: name or "—")
+    compact = st.sidebar.checkbox("Compact memory mode", help="Categorical, integer and float32 columns for large accounts.")
     st.sidebar.markdown("---")
 
-    if data_file_1 is not None:
-        try:
-            df = load_data(data_file_1)
-            df = manipulation_data_frame(df)
-        except Exception as e:
-            st.sidebar.error(f"Error loading the file: {e}")
+    if data_file_1 is not None or account:
+        if data_file_1 is not None:
+            try:
+                raw = data_file_1.getvalue()
+                dataset = content_hash(raw)
+                with profiler.stage('load') as stage:
+                    df, reports = cached_frame(raw, lambda: build_frame(data_file_1, compact, profiler),
+                                      variant='compact' if compact else '', digest=dataset)
+                    # sem etapas filhas, o frame veio do cache em disco
+                    stage.cached = profiler.stages[-1] is stage
+                    stage.rows_out = len(df)
+            except Exception as e:
+                st.sidebar.error(f"Error loading the file: {e}")
+                return
+
+            with st.sidebar.expander("Save to the account store"):
+                name = st.text_input("Account", key='store_account')
+                if st.button("Ingest", disabled=not name):
+                    try:
+                        result = store.ingest(name, data_file_1)
+                        st.success(f"{result.new} new trades, {result.duplicates} already stored.")
+                    except ValueError as e:
+                        st.error(str(e))
+            first_trade, last_trade = df['trade-date'].min(), df['trade-date'].max()
+            default_start = first_trade
+        else:
+            reports = {}
+            state = store.state(account)
+            first_trade, last_trade = pd.Timestamp(state.first_trade), pd.Timestamp(state.last_trade)
+            default_start = max(first_trade, last_trade - pd.Timedelta(days=REVIEW_WINDOW_DAYS))
+            symbols = st.sidebar.multiselect("Symbols", store.symbols(account), help="Empty for all symbols.")
+            # a chave muda a cada ingestão, invalidando os resultados das páginas
+            dataset = content_hash(f"{account}:{state.trades}:{sorted(symbols)}".encode())
 
         st.sidebar.markdown("### Select the date range for the analysis")
         st.sidebar.markdown(
             "The analyses will be conducted based on the selected date range. "
             "Only trades within this range will be included."
         )
-        start_date = st.sidebar.date_input("Start Date", value=pd.to_datetime(df['trade-date']).min().date())
-        end_date = st.sidebar.date_input("End Date", value=pd.to_datetime(df['trade-date']).max().date())
+        start_date = st.sidebar.date_input("Start Date", value=default_start.date())
+        end_date = st.sidebar.date_input("End Date", value=last_trade.date())
         
         start_date = pd.to_datetime(start_date).tz_localize('America/New_York')
         end_date = pd.to_datetime(end_date).tz_localize('America/New_York')
         
         if start_date > end_date:
             st.sidebar.error("The start date must be earlier than the end date.")
+            if account:
+                return
+            date_range = (None, None)
+        elif account:
+            with profiler.stage('query') as stage:
+                df = store.query(account, start_date, end_date, symbols)
+                stage.rows_out = len(df)
+            if df.empty:
+                st.warning("No trades in the selected period.")
+                return
+            if compact:
+                df, reports['memory_report'] = compact_with_report(df, profiler)
+            date_range = (start_date, end_date)
         else:
-            df = df.loc[(df['trade-date'] >= start_date) & (df['trade-date'] <= end_date)]
+            df = profiler.call('date filter', date_slice, df, start_date, end_date, rows_in=len(df))
+            date_range = (start_date, end_date)
+
+        malformed = reports.get('malformed_datetimes')
+        if malformed is not None and not malformed.empty:
+            st.sidebar.warning(f"{len(malformed)} timestamps could not be parsed and were left empty.")
+            with st.sidebar.expander("Unparsed timestamps"):
+                st.dataframe(malformed)
+
+        report = reports.get('memory_report')
+        if report is not None:
+            with st.sidebar.expander("Memory report"):
+                st.dataframe(report)
+
+        result_cache = page_results()
+
+        def memo(name, compute, *params, page=True):
+            # resultado de página reaproveitado enquanto dados e período não mudam
+            computed = []
+            def run():
+                computed.append(True)
+                return compute()
+            scope = (selected_page,) if page else ()
+            with profiler.stage(name, rows_in=len(df)) as stage:
+                result = result_cache.get_or_compute((dataset, compact) + date_range + scope + (name,) + params, run)
+                stage.rows_out = row_count(result)
+                stage.cached = not computed
+            return result
+
+        def cube():
+            # agregados por símbolo × dia × hora × lado, compartilhados por todas as páginas do período
+            return memo('cube', lambda: build_cube(df), page=False)
+
+        charts = []
+        def plotly_chart(fig, **kwargs):
+            # serialização e envio do gráfico, com o número de pontos plotados
+            points = sum(row_count(trace.x) or 0 for trace in fig.data if 'x' in trace)
+            charts.append(fig.layout.title.text)
+            name = f"chart {len(charts)}" + (f": {charts[-1]}" if charts[-1] else "")
+            with profiler.stage(name, rows_in=points or None):
+                st.plotly_chart(fig, **kwargs)
         
         with st.sidebar:
             selected_page = option_menu(
                 menu_title="Navigation",
                 options=["Overview", "General Statistics", "Trade Frequency and Execution", 
                         "Trade Duration", "Simultaneos Open Positions","Regular Intervals", "Gambling Behavior", 
-                        "Stop Loss", "Martingale","Consistency","Risk Score","Machine Learning"],
+                        "Stop Loss", "Martingale","Consistency","Drawdown","Payout Rules","Risk Score","Machine Learning"],
                 icons=["house", "bar-chart-line", "clock", "hourglass", "calendar", 
                     "play-circle", "stop-circle", "shuffle", "check-circle"],
                 menu_icon="cast",
@@ -134,6 +231,7 @@ def main():
                 orientation="vertical",
                 key="navigation_menu"
             )
+        profiler.begin(f"page: {selected_page}", rows_in=len(df))
 
         if selected_page == "Overview":
             st.markdown('---')
@@ -148,20 +246,21 @@ def main():
                 """,
                 unsafe_allow_html=True
             )
+            summary = memo('overview', lambda: overview(df, cube()))
+            df = df.assign(cumulative_pnl=summary.cumulative_pnl)
             col1, col2 = st.columns(2)
             with col1:
-                df['cumulative_pnl'] = df['pnl_liq'].cumsum()
-                fig = px.line(df, x='trade-date', y='cumulative_pnl', title='Cumulative Profit/Loss', 
+                fig = line_figure(df, 'trade-date', 'cumulative_pnl', title='Cumulative Profit/Loss', 
                               labels={'trade-date':'Trade Date', 'cumulative_pnl':'Cumulative PnL'}, 
                               color_discrete_sequence=['#1e87f7'])
                 fig.update_layout(width=800, height=500, font=dict(size=16))
-                st.plotly_chart(fig, use_container_width=True)
+                plotly_chart(fig, use_container_width=True)
 
             with col2: 
-                df_pair = (df[['symbol','ticket']].groupby('symbol').count().rename(columns={'ticket':'Percentual'})) / df.shape[0] * 100
+                df_pair = summary.symbol_share
                 fig = go.Figure(data=[go.Pie(labels=df_pair.index, values=df_pair['Percentual'], hoverinfo='label+percent', textinfo='percent', marker=dict(colors=px.colors.sequential.Viridis), hole=.3)])
                 fig.update_layout(title_text='Percentage of Trades by Symbols', showlegend=True, width=800, height=500, font=dict(size=16))
-                st.plotly_chart(fig, use_container_width=True)
+                plotly_chart(fig, use_container_width=True)
 
             st.dataframe(df)
             st.write(f"rows: {df.shape[0]} and columns: {df.shape[1]}")
@@ -179,46 +278,19 @@ def main():
         """,
         unsafe_allow_html=True
     )
-            df1 = df.sort_values(by='open-time').reset_index(drop=True)
-
-            events = pd.DataFrame({
-                'time': pd.concat([df1['open-time'], df1['close-time']]),
-                'event': ['open'] * len(df1) + ['close'] * len(df1)
-            })
-
-            events = events.sort_values('time').reset_index(drop=True)
-            open_trades = 0
-            simultaneous_positions = []
-            for index, row in events.iterrows():
-                if row['event'] == 'open':
-                    open_trades += 1
-                else:
-                    open_trades -= 1
-                simultaneous_positions.append(open_trades)
+            stats = memo('general_statistics', lambda: general_statistics(df))
 
-            df1['simultaneous_positions'] = pd.Series(simultaneous_positions[:len(df1)])
-            
-            simultaneous_trades_df = df1[df1['simultaneous_positions'] > 1]
-            num_simultaneous_trades = len(simultaneous_trades_df)
-            total_trades = len(df1)
-            proportion_simultaneous = num_simultaneous_trades / total_trades
-
-            average_profit = df.loc[df['pnl_liq']>0,'pnl_liq'].mean()
-            average_loss = df.loc[df['pnl_liq']<0,'pnl_liq'].mean()
-            risk_return_ratio = (df.loc[df['pnl_liq']>0,'pnl_liq'].mean()) / abs(df.loc[df['pnl_liq']<0,'pnl_liq'].mean()) if (df.loc[df['pnl_liq']<0,'pnl_liq'].mean()) != 0 else float('inf')
-            win_percentage = ((df[df['pnl_liq'] > 0].shape[0])/df.shape[0]) * 100
-            loss_percentage = (100 - win_percentage)
-
-            st.markdown(f"- Average Trade Duration: {round(df['duration'].mean())} minutes")
-            st.markdown(f"- Risk-Return Ratio: {round(risk_return_ratio,2)}")
-            st.markdown(f"- Total Trades less than 1 minute: {df.loc[df['duration']<1].shape[0]} Trades")
-            st.markdown(f"- Percentage of Trades less than 1 minute: {round(((df.loc[df['duration']<1].shape[0])/df.shape[0])*100,2)}% of the total trades")
-            st.markdown(f"- Total Number of Simultaneous Open Positions: {num_simultaneous_trades}")
-            st.markdown(f"- Proportion simultaneous: {proportion_simultaneous:.2%}")
-            st.markdown(f"- Total trades: {total_trades}")
+            st.markdown(f"- Average Trade Duration: {round(stats.average_duration)} minutes")
+            st.markdown(f"- Risk-Return Ratio: {round(stats.risk_return_ratio,2)}")
+            st.markdown(f"- Total Trades less than 1 minute: {stats.quick_trades} Trades")
+            st.markdown(f"- Percentage of Trades less than 1 minute: {round(stats.quick_trades_percentage,2)}% of the total trades")
+            st.markdown(f"- Total Number of Simultaneous Open Positions: {stats.simultaneous_trades}")
+            st.markdown(f"- Proportion simultaneous: {stats.simultaneous_proportion:.2%}")
+            st.markdown(f"- Maximum Simultaneous Open Positions: {stats.max_simultaneous}")
+            st.markdown(f"- Total trades: {stats.total_trades}")
 
             st.markdown("#### Basic statistical measures, including mean, median, and standard deviation, for key metrics")
-            st.write(df.drop(columns=['ticket','swap','comment','TradeDay']).describe())
+            st.write(stats.describe)
 
         elif selected_page == "Trade Frequency and Execution":
             st.markdown('---')
@@ -236,10 +308,11 @@ def main():
                 analysis provides insights into the efficiency of the strategies employed.
             """)
             
+            frequency = memo('trade_frequency', lambda: trade_frequency(df, cube()))
+            frequency_df = frequency.daily
             col1, col2 = st.columns(2)
             
             with col1:
-                frequency_df = df[['TradeDay','pnl_liq']].groupby('TradeDay').count().rename(columns={"pnl_liq":"Frequency"})
                 st.write(frequency_df)
                 st.markdown("""
                     **Description:** The table above shows the daily trade frequency, 
@@ -248,12 +321,12 @@ def main():
                 """)
             
             with col2:
-                st.markdown(f"- **Mean:** {round(frequency_df.mean().tolist()[0], 2)} trades per day")
-                st.markdown(f"- **Median:** {frequency_df.median().tolist()[0]} trades per day")
-                st.markdown(f"- **Upper Quartile:** {frequency_df.describe().loc['75%'].tolist()[0]} trades per day")
-                st.markdown(f"- **Lower Quartile:** {frequency_df.describe().loc['25%'].tolist()[0]} trades per day")
-                st.markdown(f"- **Minimum:** {frequency_df.min().tolist()[0]} trades per day")
-                st.markdown(f"- **Maximum:** {frequency_df.max().tolist()[0]} trades per day")
+                st.markdown(f"- **Mean:** {round(frequency.stats.mean, 2)} trades per day")
+                st.markdown(f"- **Median:** {frequency.stats.median} trades per day")
+                st.markdown(f"- **Upper Quartile:** {frequency.stats.upper_quartile} trades per day")
+                st.markdown(f"- **Lower Quartile:** {frequency.stats.lower_quartile} trades per day")
+                st.markdown(f"- **Minimum:** {frequency.stats.minimum:g} trades per day")
+                st.markdown(f"- **Maximum:** {frequency.stats.maximum:g} trades per day")
                 st.markdown("""
                     ### Statistical Analysis:
                     - **Mean and Median:** The mean provides an overall view of the number of trades per day, while the median 
@@ -269,39 +342,37 @@ def main():
             st.write("A histogram can be used to show the distribution of trading frequency per day. It reveals the density of different frequency intervals, helping to identify patterns in trading activity.")
             fig = px.histogram(frequency_df, x='Frequency', nbins=20,
                                labels={'Frequency': 'Number of Trades'}, template='simple_white')
-            st.plotly_chart(fig)
+            plotly_chart(fig)
 
             st.subheader("Frequency of Trades Over Time")
             st.write("A line graph showing the number of trades per day over time. This provides a clear view of daily trends and how trade frequency varies over time.")
             fig = px.line(frequency_df, x=frequency_df.index, y='Frequency',
                           labels={'index': 'Day', 'Frequency': 'Number of Trades'}, template='simple_white')
-            st.plotly_chart(fig)
+            plotly_chart(fig)
 
             st.subheader("Distribution of Trade Frequency")
             st.write("A boxplot can be used to visualize the distribution of trade frequency per day, including median, quartiles, and possible outliers. This provides a visual representation of the dispersion of the data.")
             fig = px.box(frequency_df, y='Frequency',
                          labels={'Frequency': 'Number of Trades'}, template='simple_white')
-            st.plotly_chart(fig)
+            plotly_chart(fig)
 
             st.subheader("Heatmap of Trade Frequency by Day and Hour")
             st.write("can be used to show the distribution of trading frequency at different times of the day and days of the week. This can reveal seasonal patterns or times of high activity")
-            heatmap_data = df.pivot_table(index=df['trade-date'].dt.hour, columns=df['trade-date'].dt.day_name(), 
-                                          values='ticket', aggfunc='count')
-            fig = px.imshow(heatmap_data, color_continuous_scale='Viridis')
-            st.plotly_chart(fig)
+            fig = px.imshow(frequency.hour_weekday, color_continuous_scale='Viridis')
+            plotly_chart(fig)
 
             st.write("### Days with Above-Average Frequency")
-            st.write(frequency_df[frequency_df['Frequency'] > round(frequency_df.mean().tolist()[0], 2)])
+            st.write(frequency.above_average)
             st.markdown("""
                 **Description:** The table above highlights the days where the number of trades exceeded the average. 
                 These days can be analyzed further to understand the factors that led to increased trading activity.
             """)
 
             st.subheader("Days with Above Average Trade Frequency")
-            above_average_df = frequency_df[frequency_df['Frequency'] > round(frequency_df.mean().tolist()[0], 2)]
+            above_average_df = frequency.above_average
             fig = px.bar(above_average_df, x=above_average_df.index, y='Frequency',
                          labels={'index': 'Day', 'Frequency': 'Number of Trades'}, template='simple_white')
-            st.plotly_chart(fig)
+            plotly_chart(fig)
             st.markdown('---')
 
         elif selected_page == "Trade Duration":
@@ -317,16 +388,17 @@ def main():
         unsafe_allow_html=True
     )
 
+            durations = memo('trade_duration', lambda: trade_duration(df, cube()))
             col1, col2 = st.columns(2)
             
             with col1:
                 st.write("#### Statistics : ")
-                st.markdown(f"- **Mean Execution Time:** {round(df.duration.mean())} minutes")
-                st.markdown(f"- **Median Execution Time:** {round(df.duration.median())} minutes")
-                st.markdown(f"- **Upper Quartile:** {round(df[['duration']].describe().loc['75%'].tolist()[0],2)} minutes")
-                st.markdown(f"- **Lower Quartile:** {round(df[['duration']].describe().loc['25%'].tolist()[0],2)} minutes")
-                st.markdown(f"- **Maximum Duration:** {round(df.duration.max(),2)} minutes")
-                st.markdown(f"- **Minimum Duration:** {round(df.duration.min(),2)} minutes")
+                st.markdown(f"- **Mean Execution Time:** {round(durations.stats.mean)} minutes")
+                st.markdown(f"- **Median Execution Time:** {round(durations.stats.median)} minutes")
+                st.markdown(f"- **Upper Quartile:** {round(durations.stats.upper_quartile,2)} minutes")
+                st.markdown(f"- **Lower Quartile:** {round(durations.stats.lower_quartile,2)} minutes")
+                st.markdown(f"- **Maximum Duration:** {round(durations.stats.maximum,2)} minutes")
+                st.markdown(f"- **Minimum Duration:** {round(durations.stats.minimum,2)} minutes")
                 st.markdown("""
                     **Description:** The statistics above summarize the trade duration data:
                     - **Mean and Median Execution Time** provide central tendency measures, indicating the typical duration of trades.
@@ -337,8 +409,7 @@ def main():
             with col2:
 
                 st.write("#### Average Trade Duration by Day:")
-                avg_duration_by_day = df[['duration', 'TradeDay']].groupby('TradeDay').mean()
-                st.write(avg_duration_by_day)
+                st.write(durations.by_day)
                 
                 st.markdown("""
                     **Description:** This table shows the average trade duration for each trading day. 
@@ -347,7 +418,7 @@ def main():
                 """)
             st.markdown('---')
             st.write("### Days with Above-Average Trade Duration")
-            st.write(avg_duration_by_day[avg_duration_by_day['duration'] > avg_duration_by_day['duration'].mean()])
+            st.write(durations.above_average_days)
             st.markdown("""
                 **Description:** This table identifies the days where the average trade duration was longer than usual. 
                 These days might indicate times when the market was more challenging, leading to longer decision-making processes, 
@@ -356,9 +427,9 @@ def main():
 
             # Visualization 1: Histogram of Trade Durations
             st.write("### Distribution of Trade Durations")
-            fig1 = px.histogram(df, x='duration', marginal="box", template='simple_white')
+            fig1 = histogram_figure(df, 'duration', marginal="box", template='simple_white')
             fig1.update_layout(xaxis_title='Duration (minutes)', yaxis_title='Frequency')
-            st.plotly_chart(fig1)
+            plotly_chart(fig1)
             st.markdown("""
                 **Description:** This histogram shows the distribution of trade durations. The marginal boxplot highlights the spread and any potential outliers.
                 Understanding this distribution can help identify common trade durations and anomalies.
@@ -366,9 +437,9 @@ def main():
 
             # Visualization 2: Boxplot of Trade Durations
             st.write("### Boxplot of Trade Durations")
-            fig2 = px.box(df, y='duration')
+            fig2 = box_figure(df, 'duration')
             fig2.update_layout(yaxis_title='Duration (minutes)')
-            st.plotly_chart(fig2)
+            plotly_chart(fig2)
             st.markdown("""
                 **Description:** The boxplot provides a visual summary of trade duration distribution, including the median, quartiles, and outliers.
                 It's useful for identifying the range of typical trade durations and any unusually long or short trades.
@@ -376,9 +447,9 @@ def main():
 
             # Visualization 3: Time Series Line Plot of Average Trade Duration by Day
             st.write("### Time Series of Average Trade Duration by Day")
-            fig3 = px.bar(df, x='TradeDay', y='duration')
+            fig3 = bar_figure(df, 'TradeDay', 'duration')
             fig3.update_layout(xaxis_title='Trade Day', yaxis_title='Average Duration (minutes)')
-            st.plotly_chart(fig3)
+            plotly_chart(fig3)
             st.markdown("""
                 **Description:** This time series plot shows how the average trade duration changes over different trading days.
                 It can reveal trends or patterns related to specific days that might require further investigation.
@@ -386,9 +457,9 @@ def main():
 
             # Visualization 4: Scatter Plot of Trade Duration vs. Trade Day
             st.write("### Scatter Plot of Trade Duration vs. Trade Day")
-            fig4 = px.scatter(df, x='TradeDay', y='duration')
+            fig4 = scatter_figure(df, 'TradeDay', 'duration')
             fig4.update_layout(xaxis_title='Trade Day', yaxis_title='Duration (minutes)')
-            st.plotly_chart(fig4)
+            plotly_chart(fig4)
             st.markdown("""
                 **Description:** The scatter plot shows individual trade durations across different trading days.
                 This visualization helps identify specific days with particularly high or low trade durations.
@@ -396,10 +467,9 @@ def main():
 
             # Visualization 5: Heatmap of Trade Duration vs. Symbol
             st.write("### Heatmap of Trade Duration vs. Symbol")
-            pivot_table = df.pivot_table(values='duration', index='symbol', columns='TradeDay', aggfunc='mean').reset_index()
-            fig5 = px.imshow(pivot_table.set_index('symbol'))
+            fig5 = px.imshow(coarsen_columns(durations.symbol_day))
             fig5.update_layout(xaxis_title='Trade Day', yaxis_title='Symbol')
-            st.plotly_chart(fig5)
+            plotly_chart(fig5)
             st.markdown("""
                 **Description:** This heatmap visualizes the average trade duration by symbol across different trading days.
                 It helps identify which symbols tend to have longer or shorter trades on specific days.
@@ -407,10 +477,9 @@ def main():
 
             # Visualization 6: Bar Chart of Average Trade Duration by Symbol
             st.write("### Average Trade Duration by Symbol")
-            avg_duration_by_symbol = df.groupby('symbol')['duration'].mean().sort_values().reset_index()
-            fig6 = px.bar(avg_duration_by_symbol, x='symbol', y='duration')
+            fig6 = px.bar(durations.by_symbol, x='symbol', y='duration')
             fig6.update_layout(xaxis_title='Symbol', yaxis_title='Average Duration (minutes)')
-            st.plotly_chart(fig6)
+            plotly_chart(fig6)
             st.markdown("""
                 **Description:** This bar chart shows the average trade duration for each symbol.
                 It's useful for identifying which symbols typically involve longer or shorter trades.
@@ -418,9 +487,9 @@ def main():
 
             # Visualization 7: Trade Duration vs. Lots Size Scatter Plot
             st.write("### Scatter Plot of Trade Duration vs. Lots Size")
-            fig7 = px.scatter(df, x='lots', y='duration')
+            fig7 = scatter_figure(df, 'lots', 'duration')
             fig7.update_layout(xaxis_title='Lots Size', yaxis_title='Duration (minutes)')
-            st.plotly_chart(fig7)
+            plotly_chart(fig7)
             st.markdown("""
                 **Description:** This scatter plot explores the relationship between trade duration and lot size.
                 It helps identify whether larger or smaller trades tend to take more or less time.
@@ -428,9 +497,9 @@ def main():
 
             # Visualization 8: Cumulative Distribution Function (CDF) of Trade Durations
             st.write("### CDF of Trade Durations")
-            fig8 = px.ecdf(df, x='duration',)
+            fig8 = ecdf_figure(df, 'duration')
             fig8.update_layout(xaxis_title='Duration (minutes)',title='Cumulative Distribution Function of Trade Durations')
-            st.plotly_chart(fig8)
+            plotly_chart(fig8)
             st.markdown("""
                 **Description:** The CDF shows the proportion of trades completed within a certain duration.
                 It's useful for understanding how quickly the majority of trades are executed.
@@ -438,10 +507,9 @@ def main():
 
             # Visualization 9: Time Series of Maximum and Minimum Trade Durations by Day
             st.write("### Maximum and Minimum Trade Durations by Day")
-            max_min_duration_by_day = df.groupby('TradeDay')['duration'].agg(['max', 'min']).reset_index()
-            fig9 = px.line(max_min_duration_by_day, x='TradeDay', y=['max', 'min'], )
+            fig9 = px.line(durations.max_min_by_day, x='TradeDay', y=['max', 'min'], )
             fig9.update_layout(xaxis_title='Trade Day', yaxis_title='Duration (minutes)')
-            st.plotly_chart(fig9)
+            plotly_chart(fig9)
             st.markdown("""
                 **Description:** This line plot shows the maximum and minimum trade durations for each day.
                 It's helpful for identifying days with extreme trade durations that may indicate unusual market conditions.
@@ -449,9 +517,9 @@ def main():
 
             
             st.write("### Violin Plot of Trade Duration by Symbol")
-            fig10 = px.violin(df, y='duration', box=True, points="all",color='symbol',template='simple_white')
+            fig10 = violin_figure(df, 'duration', box=True, points="all",color='symbol',template='simple_white')
             fig10.update_layout(xaxis_title='Symbol', yaxis_title='Duration (minutes)')
-            st.plotly_chart(fig10)
+            plotly_chart(fig10)
             st.markdown("""
                 **Description:** The violin plot shows the distribution of trade durations for each symbol, including the density and range of durations.
                 It's useful for comparing the spread of trade durations across different symbols.
@@ -462,13 +530,13 @@ def main():
             Now, let’s dive into an interesting subset of trades—those that had a duration of less than one minute. Such quick trades can be indicative of high-frequency trading strategies, potentially automated by trading bots. The purpose of this analysis is to identify patterns that may suggest the presence of manipulative behavior or the use of trading bots, which could undermine market fairness.
             Description: Trades that are executed in under a minute might not follow the typical human decision-making process and are often associated with automated trading systems. These trades could be designed to exploit market inefficiencies or to execute large orders in a rapid manner. By analyzing these trades, we can uncover suspicious activity or identify users who might be employing high-frequency trading algorithms.""")
             
-            quick_trades = df[df['duration'] < 1]
+            quick_trades = durations.quick_trades
 
             # Visualization 1: Histogram of Quick Trades by Duration
             st.write("### Histogram of Quick Trades by Duration")
-            fig1 = px.histogram(quick_trades, x='duration', title='Histogram of Quick Trades by Duration', nbins=30, template='simple_white')
+            fig1 = histogram_figure(quick_trades, 'duration', title='Histogram of Quick Trades by Duration', nbins=30, template='simple_white')
             fig1.update_layout(xaxis_title='Duration (seconds)', yaxis_title='Frequency')
-            st.plotly_chart(fig1)
+            plotly_chart(fig1)
 
             # Description for Histogram
             st.markdown("""
@@ -479,9 +547,9 @@ def main():
 
             # Visualization 2: Scatter Plot of Quick Trades - Duration vs. Lots Size
             st.write("### Scatter Plot of Quick Trades - Duration vs. Lots Size")
-            fig2 = px.scatter(quick_trades, x='lots', y='duration', title='Duration vs. Lots Size for Quick Trades',color='symbol')
+            fig2 = scatter_figure(quick_trades, 'lots', 'duration', title='Duration vs. Lots Size for Quick Trades',color='symbol')
             fig2.update_layout(xaxis_title='Lots Size', yaxis_title='Duration (seconds)')
-            st.plotly_chart(fig2)
+            plotly_chart(fig2)
 
             # Description for Scatter Plot
             st.markdown("""
@@ -492,10 +560,9 @@ def main():
 
             # Visualization 3: Bar Chart of Average Trade Duration by Symbol for Quick Trades
             st.write("### Average Trade Duration by Symbol for Quick Trades")
-            avg_duration_quick_trades = quick_trades.groupby('symbol')['duration'].mean().sort_values().reset_index()
-            fig3 = px.bar(avg_duration_quick_trades, x='symbol', y='duration', title='Average Trade Duration by Symbol for Quick Trades')
+            fig3 = px.bar(durations.quick_by_symbol, x='symbol', y='duration', title='Average Trade Duration by Symbol for Quick Trades')
             fig3.update_layout(xaxis_title='Symbol', yaxis_title='Average Duration (seconds)')
-            st.plotly_chart(fig3)
+            plotly_chart(fig3)
 
             # Description for Bar Chart
             st.markdown("""
@@ -506,9 +573,9 @@ def main():
 
             # Visualization 4: Violin Plot of Trade Duration by Symbol for Quick Trades
             st.write("### Violin Plot of Trade Duration by Symbol for Quick Trades")
-            fig4 = px.violin(quick_trades, x='symbol', y='duration', title='Violin Plot of Trade Duration by Symbol for Quick Trades', box=True, points="all")
+            fig4 = violin_figure(quick_trades, 'duration', x='symbol', title='Violin Plot of Trade Duration by Symbol for Quick Trades', box=True, points="all")
             fig4.update_layout(xaxis_title='Symbol', yaxis_title='Duration (seconds)')
-            st.plotly_chart(fig4)
+            plotly_chart(fig4)
 
             # Description for Violin Plot
             st.markdown("""
@@ -519,10 +586,9 @@ def main():
 
             # Visualization 5: Time Series of Number of Quick Trades by Day
             st.write("### Number of Quick Trades by Day")
-            quick_trades_by_day = quick_trades.groupby('TradeDay').size().reset_index(name='count')
-            fig5 = px.line(quick_trades_by_day, x='TradeDay', y='count', title='Number of Quick Trades by Day')
+            fig5 = px.line(durations.quick_by_day, x='TradeDay', y='count', title='Number of Quick Trades by Day')
             fig5.update_layout(xaxis_title='Trade Day', yaxis_title='Number of Trades')
-            st.plotly_chart(fig5)
+            plotly_chart(fig5)
 
             # Description for Time Series
             st.markdown("""
@@ -538,7 +604,7 @@ def main():
             could suggest unfair trading practices in the market.
             """)
             st.write("#### Detais of the trades that had a duration of less than 1 minute")
-            less_1m = df.loc[df['duration']<1,['symbol','pnl_liq','volume','lots','duration','open-price','close-price','TradeDay','ticket']].set_index('TradeDay')
+            less_1m = quick_trades[['symbol','pnl_liq','volume','lots','duration','open-price','close-price','TradeDay','ticket']].set_index('TradeDay')
             st.write(less_1m)
             pd.options.display.float_format = '{:.2f}'.format
             st.write("#### Describe")
@@ -550,130 +616,18 @@ def main():
             st.markdown("---")
             format_blue("Simultaneos open positions")
             
-            df1 = df.sort_values(by='open-time').reset_index(drop=True)
-
-            # Criar um dataframe para armazenar os eventos de abertura e fechamento dos trades
-            events = pd.DataFrame({
-                'time': pd.concat([df1['open-time'], df1['close-time']]),
-                'event': ['open'] * len(df1) + ['close'] * len(df1),
-                'ticket': pd.concat([df1['ticket'], df1['ticket']]),
-                'symbol': pd.concat([df1['symbol'], df1['symbol']]),
-                'pnl_liq': pd.concat([df1['pnl_liq'], df1['pnl_liq']]),
-                'TradeDay': pd.concat([df1['TradeDay'], df1['TradeDay']])
-            })
-
-            # Ordenar os eventos por tempo
-            events = events.sort_values('time').reset_index(drop=True)
-
-            # Variável para rastrear trades abertos simultaneamente
-            open_trades = []
-            simultaneous_details = []
-
-            # Iterar sobre os eventos para calcular os trades simultâneos
-            for _, row in events.iterrows():
-                if row['event'] == 'open':
-                    if row['ticket'] not in open_trades:  # Evita duplicidade
-                        open_trades.append(row['ticket'])  # Adiciona o ticket à lista de abertos
-                        if len(open_trades) > 1:  # Verifica se há mais de um trade simultâneo
-                            simultaneous_details.append({
-                                'time': row['time'],
-                                'open_trades': open_trades.copy(),
-                                'symbol': row['symbol'],
-                                'TradeDay': row['TradeDay']
-                            })
-                elif row['event'] == 'close':
-                    if row['ticket'] in open_trades:
-                        open_trades.remove(row['ticket'])  # Remove o ticket da lista de abertos
-
-            # Criar DataFrame com os trades simultâneos
-            simultaneous_trades_df = pd.DataFrame(simultaneous_details)
-
-            # Função para gerar o relatório consolidado de trades simultâneos
-            def generate_consolidated_report(df, simultaneous_trades):
-                report = []
-                
-                # Agrupar por símbolo e dia
-                grouped = simultaneous_trades.groupby(['symbol', 'TradeDay'])
-                
-                for (symbol, day), group in grouped:
-                    tickets_flagged = set()  # Para armazenar tickets únicos
-                    total_pnl = 0  # Acumulador de PnL
-                    
-                    # Iterar sobre os trades simultâneos no grupo
-                    for _, row in group.iterrows():
-                        for ticket in row['open_trades']:
-                            if ticket not in tickets_flagged:  # Evita duplicidade de tickets
-                                tickets_flagged.add(ticket)
-                                trade_info = df[df['ticket'] == ticket].iloc[0]
-                                total_pnl += trade_info['pnl_liq']  # Somar PnL do ticket
-                    
-                    # Adicionar dados ao relatório
-                    report.append({
-                        'Symbol': symbol,
-                        'TradeDay': day,
-                        'Tickets Flagged': list(tickets_flagged),
-                        'Total PnL': total_pnl
-                    })
-                
-                # Retornar DataFrame do relatório consolidado
-                return pd.DataFrame(report)
-
-            # Gerar relatório consolidado dos trades simultâneos
-            consolidated_report = generate_consolidated_report(df1, simultaneous_trades_df)
+            # Relatório consolidado dos trades simultâneos (por símbolo e dia)
+            simultaneous = memo('simultaneous_positions', lambda: simultaneous_positions(df))
+            consolidated_report = simultaneous.groups
 
             # Exibir relatório
             st.write(consolidated_report)
            #------------------------------------------------------------------------- 
-            # Certifique-se de que as colunas 'open-time' e 'close-time' estão no formato datetime
-            df['open-time'] = pd.to_datetime(df['open-time'])
-            df['close-time'] = pd.to_datetime(df['close-time'])
-
-            # Criar colunas naive para horas de abertura e fechamento (remover timezone)
-            df['open-time-naive'] = df['open-time'].dt.tz_localize(None)
-            df['close-time-naive'] = df['close-time'].dt.tz_localize(None)
-
-            # Calcular a duração do trade em horas
-            df['duration_hours'] = (df['close-time-naive'] - df['open-time-naive']).dt.total_seconds() / 3600
-
-            # Criar o gráfico com Plotly
-            fig = go.Figure()
-
-            # Adicionar cada trade como uma barra horizontal
-            for i, row in df.iterrows():
-                fig.add_trace(go.Bar(
-                    y=[f'Ticket {row["ticket"]}'],  # Cada barra corresponde ao ticket de um trade
-                    x=[row['duration_hours']],  # A duração do trade em horas
-                    base=row['open-time-naive'].timestamp() / 3600,  # Converte o timestamp para horas
-                    orientation='h',  # Barras horizontais
-                    name=f'Trade {i+1}',
-                    marker=dict(color=px.colors.sequential.Viridis[i % len(px.colors.sequential.Viridis)]),  # Usar uma cor da paleta Viridis
-                    hovertemplate=(
-                        f'Ticket: {row["ticket"]}<br>'
-                        f'Side: {row["side"]}<br>'
-                        f'Symbol: {row["symbol"]}<br>'
-                        f'Lots: {row["lots"]}<br>'
-                        f'PnL: {row["pnl_liq"]}<br>'
-                        f'Duration (Hours): {row["duration_hours"]:.2f}<br>'
-                        f'Open Time: {row["open-time-naive"]}<br>'
-                        f'Close Time: {row["close-time-naive"]}<br>'
-                        '<extra></extra>'
-                    )  # Informações adicionais ao passar o mouse sobre cada barra
-                ))
-
-            # Atualizar layout do gráfico
-            fig.update_layout(
-                title='Trade Durations and Overlaps',
-                xaxis_title='Trade Duration (Hours)',  # Eixo X mostrando a duração em horas
-                yaxis_title='Trades',  # Eixo Y com os tickets dos trades
-                yaxis=dict(
-                    showticklabels=False  # Ocultar rótulos do eixo Y
-                ),
-                showlegend=False,  # Não mostrar a legenda
-                height=800
-            )
+            # Gráfico de duração dos trades (um único trace; faixas de densidade para contas grandes)
+            fig = trade_timeline(df)
 
             # Exibir o gráfico no Streamlit
-            st.plotly_chart(fig)
+            plotly_chart(fig)
             #----------------------------------------------
             
             #---------
@@ -682,10 +636,17 @@ def main():
             **How to use this chart:**
             This chart shows the duration of each trade, represented by horizontal bars. The length of each bar indicates how long a trade was open, in hours. Use this to easily identify overlapping trades and analyze the performance of each trade based on its profit/loss (PnL) and other details available in the hover information.
             """)
+            if len(df) > TIMELINE_MAX_ROWS:
+                st.caption(f"More than {TIMELINE_MAX_ROWS} trades: the chart shows the maximum number of open positions per time bucket instead of individual trades.")
             
             st.write('---')
+            # dias agrupados em semanas/meses quando o gráfico não cabe no orçamento
+            pnl_by_day = coarsen_days(consolidated_report, 'TradeDay', ['Symbol'], ['Total PnL'], ['Tickets Flagged'])
+            pnl_by_day = pnl_by_day.assign(**{'Tickets Flagged': capped_lists(pnl_by_day['Tickets Flagged'])})
+            if len(pnl_by_day) < len(consolidated_report):
+                st.caption("Too many symbol-days to plot: the chart groups them by week or longer.")
             fig1 = px.bar(
-                consolidated_report, 
+                pnl_by_day, 
                 x='TradeDay', 
                 y='Total PnL', 
                 color='Symbol',color_continuous_scale='Blues', 
@@ -705,7 +666,7 @@ def main():
                 hovermode="x unified"  # Show all hover info for each x value
             )
 
-            st.plotly_chart(fig1)
+            plotly_chart(fig1)
 
             # Explanation for the chart
             st.write("""
@@ -714,13 +675,7 @@ def main():
             This chart helps you quickly assess which trade days and symbols had the highest or lowest PnL from simultaneous positions.
             """)
 
-            heatmap_data = consolidated_report.pivot_table(
-                index='Symbol', 
-                columns='TradeDay', 
-                values='Tickets Flagged', 
-                aggfunc='count', 
-                fill_value=0
-            )
+            heatmap_data = coarsen_columns(simultaneous.symbol_day_counts, how='sum')
 
             # Criar o heatmap usando plotly
             fig2 = go.Figure(
@@ -740,22 +695,22 @@ def main():
                 title_x=0.5,  # Centralizar o título
             )
 
-            st.plotly_chart(fig2)
+            plotly_chart(fig2)
 
             # Explicação para o heatmap
             st.write("""
             **How to use this chart:**
             This heatmap represents the number of simultaneous open trades grouped by trading symbol and trade day. Each cell's color indicates the number of flagged simultaneous trades, with darker colors representing more simultaneous positions. Use this chart to identify trading patterns where multiple trades occurred simultaneously for specific symbols on particular days.
             """)
-            # Adding the 'time_diff' column to the dataframe
-            df['time_diff'] = df['open-time'].diff().dt.total_seconds()
+            # Intervalo desde a abertura do trade anterior, só para os gráficos
+            df = df.assign(time_diff=simultaneous.open_gaps)
 
             # Visualization 6: Scatter Plot of Time Difference Between Trades vs. PNL
             st.write("### Scatter Plot of Time Difference Between Trades vs. PNL")
-            fig6 = px.scatter(df, x='time_diff', y='pnl_liq', color='symbol', 
+            fig6 = scatter_figure(df, 'time_diff', 'pnl_liq', color='symbol', 
                             title='Time Difference Between Trades vs. PNL',
                             labels={'time_diff': 'Time Difference (seconds)', 'pnl_liq': 'PNL'})
-            st.plotly_chart(fig6)
+            plotly_chart(fig6)
 
             # Description for Time Difference Scatter Plot
             st.markdown("""
@@ -765,9 +720,9 @@ def main():
 
             # Visualization 7: Histogram of Time Difference Between Trades
             st.write("### Histogram of Time Difference Between Trades")
-            fig7 = px.histogram(df, x='time_diff', title='Histogram of Time Difference Between Trades')
+            fig7 = histogram_figure(df, 'time_diff', title='Histogram of Time Difference Between Trades')
             fig7.update_layout(xaxis_title='Time Difference (seconds)', yaxis_title='Frequency', template='plotly_dark')
-            st.plotly_chart(fig7)
+            plotly_chart(fig7)
 
             # Description for Time Difference Histogram
             st.markdown("""
@@ -798,19 +753,20 @@ def main():
                 valuable insights into how aggressive or conservative trading strategies are and how they evolve over time.
             """)
 
+            lots = memo('gambling_behavior', lambda: gambling_behavior(df, cube()))
             col1,col2 = st.columns(2)
             with col1:
                 st.subheader('Lots per Trade')
                 st.write(df[['trade-date','lots']].set_index('trade-date'))
             with col2:
                 st.subheader("Descriptive Statistics of Trade Volumes")
-                st.write(f"- **Mean Volume:** {round(df['lots'].mean(), 2)} lots")
-                st.write(f"- **Median Volume:** {round(df['lots'].median(), 2)} lots")
-                st.write(f"- **Maximum Volume:** {round(df['lots'].max(), 2)} lots")
-                st.write(f"- **Minimum Volume:** {round(df['lots'].min(), 2)} lots")
-                st.markdown(f"- **Lower Quartile:** {df['lots'].describe().to_dict()['25%']}")
-                st.markdown(f"- **Upper Quartile:** {df['lots'].describe().to_dict()['75%']}")
-                st.write(f"- **Standard Deviation:** {round(df['lots'].std(), 2)}")
+                st.write(f"- **Mean Volume:** {round(lots.stats.mean, 2)} lots")
+                st.write(f"- **Median Volume:** {round(lots.stats.median, 2)} lots")
+                st.write(f"- **Maximum Volume:** {round(lots.stats.maximum, 2)} lots")
+                st.write(f"- **Minimum Volume:** {round(lots.stats.minimum, 2)} lots")
+                st.markdown(f"- **Lower Quartile:** {lots.stats.lower_quartile}")
+                st.markdown(f"- **Upper Quartile:** {lots.stats.upper_quartile}")
+                st.write(f"- **Standard Deviation:** {round(lots.stats.std, 2)}")
                 st.write("""
                     **Description:** This analysis provides an overview of the trading volumes (lots), helping identify 
                     common trade sizes and potential outliers.
@@ -819,31 +775,31 @@ def main():
             col1,col2 = st.columns(2)
             with col1:
                 st.subheader("Higher than the mean")
-                st.write(df.loc[df['lots'] >df['lots'].mean(),['trade-date','lots']])
+                st.write(lots.above_mean)
 
             with col2:
                 st.subheader("Distribution of Trade Volumes")
-                fig = px.histogram(df, x='lots', nbins=20, template='simple_white')
+                fig = histogram_figure(df, 'lots', nbins=20, template='simple_white')
                 fig.update_layout(xaxis_title='Volume (lots)', yaxis_title='Frequency')
-                st.plotly_chart(fig)
+                plotly_chart(fig)
                 st.write("""
                     **Description:** The histogram displays how frequently different trade volumes (lots) are used, 
                     helping to spot potential overuse of large volumes, which might indicate risky or aggressive behavior.
                 """)
 
             st.subheader("Trade Volumes vs. Trade Outcomes")
-            fig = px.scatter(df, x='lots', y='pnl_liq', template='simple_white')
+            fig = scatter_figure(df, 'lots', 'pnl_liq', template='simple_white')
             fig.update_layout(xaxis_title='Volume (lots)', yaxis_title='Profit/Loss')
-            st.plotly_chart(fig)
+            plotly_chart(fig)
             st.write("""
                 **Description:** This scatter plot shows the relationship between the volume of trades and the corresponding outcomes (profit/loss), 
                 potentially revealing if larger volume trades tend to be more profitable or riskier.
             """)
 
             st.subheader("Boxplot of Trade Volumes by Day")
-            fig = px.box(df, x='TradeDay', y='lots', template='simple_white')
+            fig = box_figure(df, 'lots', x='TradeDay', template='simple_white')
             fig.update_layout(xaxis_title='Trade Day', yaxis_title='Volume (lots)')
-            st.plotly_chart(fig)
+            plotly_chart(fig)
             st.write("""
                 **Description:** This boxplot shows the distribution of trade volumes for each trading day, 
                 helping to understand if certain days are associated with higher or lower volumes.
@@ -851,25 +807,24 @@ def main():
 
 
             st.subheader("Cumulative Trade Volume Over Time")
-            df['cumulative_volume'] = df['lots'].cumsum()
-            fig = px.line(df, x='trade-date', y='cumulative_volume', template='simple_white')
+            fig = line_figure(df.assign(cumulative_volume=df['lots'].cumsum()), 'trade-date', 'cumulative_volume', template='simple_white')
             fig.update_layout(xaxis_title='Date', yaxis_title='Cumulative Volume (lots)')
-            st.plotly_chart(fig)
+            plotly_chart(fig)
             st.write("""
                 **Description:** This cumulative plot tracks the total trade volume over time, showing how aggressively trading strategies are applied across the dataset.
             """)
 
             st.subheader("Comparison of Volumes in Winning vs. Losing Trades")
-            fig = px.box(df, x='pnl_category', y='lots', template='simple_white')  # win_or_loss could be a column indicating 1 for win and 0 for loss
+            fig = box_figure(df, 'lots', x='pnl_category', template='simple_white')  # win_or_loss could be a column indicating 1 for win and 0 for loss
             fig.update_layout(xaxis_title='Trade Outcome (Win/Loss)', yaxis_title='Volume (lots)')
-            st.plotly_chart(fig)
+            plotly_chart(fig)
             st.write("""
                 **Description:** This boxplot compares the trade volumes in winning vs. losing trades, 
                 revealing if larger volumes are more frequently associated with successful or unsuccessful trades.
             """)
             st.subheader("Boxplot of Trade Volumes by Symbol")
-            fig=px.box(data_frame=df,y='lots',color='symbol')
-            st.plotly_chart(fig)
+            fig=box_figure(df, 'lots', color='symbol')
+            plotly_chart(fig)
             st.write("""
                      **Description:** The boxplot visualizes the distribution
                       of trade volumes (lots) across different trading symbols. 
@@ -881,41 +836,35 @@ def main():
                      trade volumes among various symbols, revealing any significant differences in trading behavior or volume ranges across different symbols. It is particularly useful for identifying which symbols have higher variability in trade volumes and spotting any potential outliers.""")
             st.write("---")
             st.subheader("Detailed Analysis of Trade Volumes by Symbol")
-            lista_symbol = df.symbol.unique().tolist()
-            for sym in lista_symbol:
-                    format_blue(f"{sym.upper()}")
-                    
-                    # Filter data for the current symbol
-                    data_zone = df.loc[df['symbol'] == sym, ['trade-date', 'lots']]
-                    data_zone['date'] = data_zone['trade-date'].dt.date  # Extract date only
-                    
-                    # Display daily data
-                    for day, group in data_zone.groupby('date'):
-                        blue(f"Date: {day}")
-                        st.dataframe(group[['trade-date', 'lots']].set_index('trade-date'))
-                        st.write(f"**Average lots for {day}:** {group['lots'].mean():.2f}")
-                        st.markdown('---')
-                    
-                    # Display summary statistics
-                    format_blue(f"Total Summary for {sym.upper()}:")
-                    st.markdown(f"""
-                    - **Mean Lots:** {data_zone['lots'].mean():.2f}
-                    - **Median Lots:** {data_zone['lots'].median():.2f}
-                    - **Upper Quartile:** {data_zone['lots'].quantile(0.75):.2f}
-                    - **Lower Quartile:** {data_zone['lots'].quantile(0.25):.2f}
-                    """)
-                    st.markdown('---')
-                    st.markdown('---')
+            st.write("""
+                **Description:** Lots per symbol, then per symbol and day. Select a day in the second table 
+                to see its individual trades.
+            """)
+            # uma agregação por símbolo e uma por símbolo × dia; os trades só são carregados ao selecionar
+            st.dataframe(lots.by_symbol, hide_index=True)
+
+            lots_by_day = lots.by_symbol_day
+            selection = st.dataframe(lots_by_day, hide_index=True, on_select='rerun',
+                                     selection_mode='single-row', key='lots_drilldown')
+            if selection.selection.rows:
+                sym, day = lots_by_day.iloc[selection.selection.rows[0]][['symbol', 'TradeDay']]
+                day_start = pd.Timestamp(day).tz_localize(df['trade-date'].dt.tz)
+                day_trades = date_slice(df, day_start, day_start + pd.Timedelta(days=1) - pd.Timedelta(1, 'ns'))
+                day_trades = day_trades.loc[day_trades['symbol'] == sym, ['trade-date', 'ticket', 'side', 'lots', 'pnl_liq']]
+                blue(f"{str(sym).upper()} - {day:%Y-%m-%d}")
+                st.dataframe(day_trades.set_index('trade-date'))
+            else:
+                st.caption("Select a row to see the trades of that symbol and day.")
+            st.markdown('---')
 
             st.subheader("Average Trade Volume per Day of the Week")
-            df['day_of_week'] = pd.to_datetime(df['trade-date']).dt.day_name()
-            avg_volume_per_day = df.groupby('day_of_week')['lots'].mean()
+            avg_volume_per_day = lots.by_weekday
             st.write(avg_volume_per_day)
             st.write("""
                 **Description:** This table shows the average volume of trades for each day of the week, revealing patterns of aggressive or cautious behavior on specific days.
             """)
             fig = px.bar(data_frame=avg_volume_per_day,x=avg_volume_per_day.index,y='lots')
-            st.plotly_chart(fig)
+            plotly_chart(fig)
             st.markdown('---')
         
         elif selected_page == "Regular Intervals":
@@ -948,31 +897,21 @@ def main():
                 - The number of trades executed within the interval.
                 - The percentage of trades that fall within the interval.
             """)
-            # Converte a coluna 'trade-date' para datetime se ainda não estiver
-            df['trade-date'] = pd.to_datetime(df['trade-date'])
-            df['time_diff'] = df['trade-date'].diff().dt.total_seconds()
-
-            intervals_seconds = [0,1, 5, 15, 30, 45, 60, 120, 240, 480, 960, 3600,df['time_diff'].max()]
-
-            results = []
-
-            for interval in intervals_seconds:
-                regular_trades = df[df['time_diff'].between(0, interval)]
-                
-                count_trades = regular_trades.shape[0]
-                total_trades = df.shape[0]
-                regular_percentage = (count_trades / total_trades) * 100
-                average_lots = regular_trades['lots'].mean() if count_trades > 0 else None
-
-                results.append({
-                    'Interval (seconds)': f'0 to {interval}',
-                    'Total Trades': total_trades,
-                    'Regular Trades': count_trades,
-                    'Percentage of Regular Trades': regular_percentage,
-                    'Average Lots': average_lots
-                })
-                
-            results_df = pd.DataFrame(results)
+            mode = st.radio("Interval mode", ["Cumulative thresholds", "Every N seconds ± tolerance"], horizontal=True)
+            intervals_text = st.text_input("Intervals (seconds, comma-separated)", value="0, 1, 5, 15, 30, 45, 60, 120, 240, 480, 960, 3600")
+            try:
+                intervals = [float(value) for value in intervals_text.split(',') if value.strip()]
+                intervals = list(dict.fromkeys(int(value) if value.is_integer() else value for value in intervals))
+            except ValueError:
+                st.error("Intervals must be numbers separated by commas.")
+                intervals = []
+
+            # df já vem ordenado por trade-date; um único sort dos intervalos responde todos os limites
+            tolerance = None
+            if mode != "Cumulative thresholds":
+                tolerance = st.number_input("Tolerance (seconds)", min_value=0.0, value=1.0, step=0.5)
+            regular = memo('regular_intervals', lambda: regular_intervals(df, intervals, tolerance), tuple(intervals), tolerance)
+            results_df = regular.table
 
             st.write("\n### Trades Executed at Regular Intervals")
             st.write(results_df)
@@ -980,13 +919,21 @@ def main():
             fig1 = px.bar(results_df, x='Interval (seconds)', y='Percentage of Regular Trades', template='simple_white',color_continuous_scale='Blues',
                         title='Percentage of Trades Executed at Regular Intervals',
                         labels={'Interval (seconds)': 'Interval (Seconds)', 'Percentage of Regular Trades': 'Percentage (%)'})
-            st.plotly_chart(fig1)
+            plotly_chart(fig1)
 
             fig2 = px.bar(results_df, x='Interval (seconds)', y='Average Lots', template='simple_white',color_continuous_scale='Blues',
                         title='Average Lots for Trades Executed at Regular Intervals',
                         labels={'Interval (seconds)': 'Interval (Seconds)', 'Average Lots': 'Average Lots'})
-            st.plotly_chart(fig2)
-            # Loop para calcular as métricas para cada intervalo
+            plotly_chart(fig2)
+
+            st.subheader("Regular Intervals by Symbol")
+            st.write("Same intervals, measured between consecutive trades of each symbol.")
+            symbol_table = regular.by_symbol
+            if not symbol_table.empty:
+                st.dataframe(symbol_table)
+                fig3 = px.imshow(symbol_table, color_continuous_scale='Blues', aspect='auto',
+                                 labels={'x': 'Interval (Seconds)', 'y': 'Symbol', 'color': 'Percentage (%)'})
+                plotly_chart(fig3)
             
             st.markdown('---')
 
@@ -1011,55 +958,38 @@ def main():
             """)
             
             # Exibindo estatísticas gerais
-            total_trades = df.shape[0]
-            trades_without_sl = df.loc[df['sl'].isna()]
-            num_trades_without_sl = trades_without_sl.shape[0]
-            percentage_without_sl = round((num_trades_without_sl / total_trades) * 100, 2)
-
-            st.write(f"**Total Number of Trades:** {total_trades}")
-            st.write(f"**Trades Without Stop Loss:** {num_trades_without_sl}")
-            st.write(f"**Percentage of Trades Without Stop Loss:** {percentage_without_sl}%")
+            no_sl = memo('stop_loss_summary', lambda: stop_loss_summary(df, cube()))
+            trades_without_sl = no_sl.trades
+
+            st.write(f"**Total Number of Trades:** {no_sl.total_trades}")
+            st.write(f"**Trades Without Stop Loss:** {no_sl.without_sl}")
+            st.write(f"**Percentage of Trades Without Stop Loss:** {round(no_sl.percentage, 2)}%")
             
             # Mostrar tabela de tickets sem Stop Loss
             st.write("### Ticket Details for Trades Without Stop Loss")
-            df_no_sl = df[df['sl'].isna() | (df['sl'] == '')]
-
-            # Agrupa por dia e calcula o PNL acumulado
-            grouped_no_sl = df_no_sl.groupby('TradeDay').agg({
-                'ticket': lambda x: ', '.join(map(str, x)),
-                'pnl': 'sum'
-            }).reset_index()
-
-            # Renomeia as colunas para melhor compreensão
-            grouped_no_sl.columns = ['TradeDay', 'Tickets IDs', 'PNL Acumulado']
-
-            # Ordena o DataFrame por dia
-            grouped_no_sl = grouped_no_sl.sort_values(by='TradeDay').reset_index(drop=True)
-
-            # Exibe o DataFrame resultante
-            st.write(grouped_no_sl)
+            st.write(no_sl.by_day)
 
             # Visualizações
             st.subheader("Trade Distribution by Symbol for Trades Without Stop Loss")
             
             # Gráfico de barras: Distribuição de Trades por Símbolo
-            fig_symbol_dist = px.bar(trades_without_sl, x='symbol', title='Trade Distribution by Symbol (Without Stop Loss)',
+            fig_symbol_dist = bar_figure(trades_without_sl.assign(count=1), 'symbol', 'count', title='Trade Distribution by Symbol (Without Stop Loss)',
                                     labels={'symbol': 'Symbol', 'count': 'Number of Trades'})
-            st.plotly_chart(fig_symbol_dist)
+            plotly_chart(fig_symbol_dist)
             
             st.subheader("Trade Volume Analysis for Trades Without Stop Loss")
             
             # Gráfico de caixa: Volume dos Trades sem Stop Loss
-            fig_volume = px.box(trades_without_sl, y='volume', title='Trade Volume Analysis (Without Stop Loss)',
+            fig_volume = box_figure(trades_without_sl, 'volume', title='Trade Volume Analysis (Without Stop Loss)',
                                 labels={'volume': 'Volume'})
-            st.plotly_chart(fig_volume)
+            plotly_chart(fig_volume)
             
             st.subheader("Trade Duration Analysis for Trades Without Stop Loss")
             
             # Gráfico de caixa: Duração dos Trades sem Stop Loss
-            fig_duration = px.box(trades_without_sl, y='duration', title='Trade Duration Analysis (Without Stop Loss)',
+            fig_duration = box_figure(trades_without_sl, 'duration', title='Trade Duration Analysis (Without Stop Loss)',
                                 labels={'duration': 'Duration (seconds)'})
-            st.plotly_chart(fig_duration)
+            plotly_chart(fig_duration)
             st.markdown('---')
 
         elif selected_page == "Consistency":
@@ -1081,54 +1011,151 @@ def main():
             """)
             
             # Cálculo e visualização das estatísticas
+            metrics = memo('consistency_metrics', lambda: consistency_metrics(df, cube()))
+            consistency = metrics.daily
             col1, col2 = st.columns(2)
             
             with col1:
-                consistency = df[['TradeDay', 'pnl_liq']].groupby('TradeDay').sum()
                 st.write("### Daily Profit and Loss Summary")
                 st.dataframe(consistency)
             
             with col2:
-                total_profits = round(consistency.loc[consistency['pnl_liq'] > 0].sum(axis=0).tolist()[0], 2)
-                cumulative_pnl = consistency.sum(axis=0).tolist()[0]
-                most_profitable_day = consistency['pnl_liq'].max()
-                most_profitable_day_info = consistency[consistency['pnl_liq'] == most_profitable_day]
-                percentage_of_total_profits = round((most_profitable_day / total_profits) * 100, 2)
-                
-                st.write(f"**Total Profits:** ${total_profits}")
-                st.write(f"**Cumulative PnL:** ${cumulative_pnl}")
+                st.write(f"**Total Profits:** ${round(metrics.total_profits, 2)}")
+                st.write(f"**Cumulative PnL:** ${metrics.cumulative_pnl}")
                 st.write(f"**Most Profitable Day:**")
-                st.dataframe(most_profitable_day_info)
-                st.write(f"**Percentage of Total Profits:** {percentage_of_total_profits}%")
+                st.dataframe(metrics.best_day)
+                st.write(f"**Percentage of Total Profits:** {round(metrics.best_day_percentage, 2)}%")
             
             st.subheader("Visualizations of Trading Consistency")
 
             # Gráfico de linha para mostrar a evolução diária do PnL
             fig_daily_pnl = px.line(consistency, x=consistency.index, y='pnl_liq', title='Daily Profit and Loss Over Time',
                                 labels={'TradeDay': 'Date', 'pnl_liq': 'PnL'})
-            st.plotly_chart(fig_daily_pnl)
+            plotly_chart(fig_daily_pnl)
             
             # Gráfico de barras para mostrar a comparação dos lucros diários
             fig_daily_pnl_bar = px.bar(consistency, x=consistency.index, y='pnl_liq', title='Daily PnL Comparison',
                                     labels={'TradeDay': 'Date', 'pnl_liq': 'PnL'})
-            st.plotly_chart(fig_daily_pnl_bar)
+            plotly_chart(fig_daily_pnl_bar)
 
             # Distribuição do PnL por Dia da Semana
-            df['day_of_week'] = df['TradeDay'].dt.day_name()
-            weekly_pnl = df.groupby('day_of_week')['pnl_liq'].sum().reset_index()
+            weekly_pnl = metrics.weekday_pnl
             fig_weekly_pnl = px.bar(weekly_pnl, x='day_of_week', y='pnl_liq', title='Total PnL by Day of the Week',
                                     labels={'day_of_week': 'Day of the Week', 'pnl_liq': 'Total PnL'})
-            st.plotly_chart(fig_weekly_pnl)
+            plotly_chart(fig_weekly_pnl)
 
             # Histograma do PnL Diário
             fig_histogram_pnl = px.histogram(consistency, x='pnl_liq', nbins=30, title='Distribution of Daily PnL',
                                             labels={'pnl_liq': 'Daily PnL'})
-            st.plotly_chart(fig_histogram_pnl)
+            plotly_chart(fig_histogram_pnl)
 
             # Box Plot do PnL Diário
             fig_box_pnl = px.box(consistency, y='pnl_liq', title='Box Plot of Daily PnL',
                                 labels={'pnl_liq': 'Daily PnL'})
-            st.plotly_chart(fig_box_pnl)
+            plotly_chart(fig_box_pnl)
+            st.markdown('---')
+
+        elif selected_page == "Drawdown":
+            st.write("---")
+            st.header("Daily Loss and Trailing Drawdown Rules")
+            st.write("""
+                The account's equity after every closed trade, starting from the program's balance. The
+                high-water mark is the highest equity reached so far; the trailing drawdown is the distance
+                below it. The daily loss is measured from the equity each New York session day opened with.
+                Set a limit to 0 to switch its rule off.
+            """)
+            defaults = DrawdownLimits()
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                starting_balance = st.number_input("Starting balance", min_value=0.0, value=defaults.starting_balance, step=1000.0)
+            with col2:
+                max_daily_loss = st.number_input("Max daily loss", min_value=0.0, value=defaults.max_daily_loss, step=500.0)
+            with col3:
+                max_drawdown = st.number_input("Max trailing drawdown", min_value=0.0, value=defaults.max_trailing_drawdown, step=500.0)
+            with col4:
+                profit_target = st.number_input("Profit target", min_value=0.0, value=defaults.profit_target, step=500.0)
+            # limite zero desliga a regra
+            limits = DrawdownLimits(starting_balance, max_daily_loss or None, max_drawdown or None, profit_target or None)
+            report = memo('drawdown', lambda: evaluate_drawdown(df, limits),
+                          starting_balance, max_daily_loss, max_drawdown, profit_target)
+            summary = report.summary.iloc[0] if len(report.summary) else None
+
+            if summary is None:
+                st.write("No closed trades in the selected period.")
+            else:
+                col1, col2, col3, col4 = st.columns(4)
+                col1.metric("Final equity", f"${summary['final_equity']:,.2f}", f"{summary['net_pnl']:,.2f}")
+                col2.metric("Max trailing drawdown", f"${summary['max_drawdown']:,.2f}")
+                col3.metric("Worst daily loss", f"${summary['worst_daily_loss']:,.2f}")
+                col4.metric("Rules", "Passed" if summary['rules_passed'] else "Failed")
+                if pd.notna(summary['profit_target_reached']):
+                    st.write(f"**Profit target reached:** {summary['profit_target_reached']}")
+
+                # equidade, máximo histórico e piso do drawdown
+                equity = report.equity
+                fig_equity = line_figure(equity, 'close-time', ['equity', 'high_water_mark', 'drawdown_floor'],
+                                         title='Equity, High-Water Mark and Drawdown Floor',
+                                         labels={'close-time': 'Close Time', 'value': 'Equity', 'variable': ''})
+                plotly_chart(fig_equity, use_container_width=True)
+
+                # pior perda de cada dia contra o limite diário
+                daily = report.daily
+                fig_daily = px.bar(daily, x='session_day', y='worst_loss', title='Worst Intraday Loss per Session Day',
+                                   color='daily_loss_breached', labels={'session_day': 'Session Day', 'worst_loss': 'Worst Loss',
+                                                                        'daily_loss_breached': 'Breached'})
+                if limits.max_daily_loss is not None:
+                    fig_daily.add_hline(y=limits.max_daily_loss, line_dash='dash', line_color='red')
+                plotly_chart(fig_daily, use_container_width=True)
+
+                st.subheader("Breaches")
+                st.write("The first trade of each session day that took the account past a limit.")
+                st.dataframe(report.breaches)
+                st.subheader("Session Days")
+                st.dataframe(daily)
+            st.markdown('---')
+
+        elif selected_page == "Payout Rules":
+            st.write("---")
+            st.header("Payout Program Rules")
+            st.write("""
+                Each payout program (challenge, funded, instant...) is a JSON or YAML file of rules and limits:
+                minimum trading days, best-day share of profits, lots per symbol, trade duration, concurrent
+                positions, daily loss and trailing drawdown. Pick one of the programs in the programs folder
+                or upload a JSON definition.
+            """)
+            files = program_files()
+            col1, col2 = st.columns(2)
+            with col1:
+                chosen = st.selectbox("Program", files, format_func=lambda p: p.stem) if files else None
+            with col2:
+                definition = st.file_uploader("Or upload a program (JSON)", type=['json'])
+            try:
+                if definition is not None:
+                    text = definition.getvalue().decode()
+                    program = compile_program({'name': definition.name.rsplit('.', 1)[0], **json.loads(text)})
+                    key = text
+                elif chosen is not None:
+                    program, key = load_program(chosen), (str(chosen), chosen.stat().st_mtime)
+                else:
+                    program = None
+            except (OSError, ValueError) as e:
+                st.error(f"Invalid program: {e}")
+                program = None
+
+            if program is None:
+                st.write("No program to check.")
+            else:
+                # todas as regras avaliadas juntas, com as varreduras compartilhadas
+                report = memo('payout_rules', lambda: evaluate_program(df, program), key)
+                results = report.results.drop(columns='account')
+                failed = int((~results['passed']).sum())
+                col1, col2 = st.columns(2)
+                col1.metric(f"{program.name} rules", f"{len(results) - failed} of {len(results)} passed")
+                col2.metric("Payout", "Eligible" if failed == 0 else "Not eligible")
+                st.dataframe(results)
+                st.subheader("Violations")
+                st.write("The trades that broke a trade rule, and the daily loss and drawdown breaches.")
+                st.dataframe(report.violations.drop(columns='account'))
             st.markdown('---')
 
         elif selected_page == "Machine Learning":
@@ -1137,6 +1164,25 @@ def main():
 
         elif selected_page == "Risk Score":
             st.write('---')
+            # evidências dos detectores -> scores automáticos; os sliders partem deles e servem de ajuste manual
+            review = memo('account_review', lambda: account_review(df, cube(), malformed))
+            automatic = risk_scores(pd.DataFrame([review.summary])).iloc[0]
+
+            def show_automatic_scores():
+                format_blue("Automatic Risk Scores")
+                st.write("""
+                    Each category is scored from the detectors' output: 0 at the lower bound of its evidence
+                    and 10 at the upper bound, averaged over the evidence of the category. The sliders below
+                    start at these scores and can be moved to override them.
+                """)
+                evidence = pd.DataFrame([
+                    {'Category': category.replace('_', ' ').title(), 'Evidence': column,
+                     'Value': review.summary[column], 'Scored from': f'{lo} to {hi}', 'Category Score': automatic[category]}
+                    for category, rules in RISK_EVIDENCE.items() for column, lo, hi in rules
+                ])
+                st.dataframe(evidence, hide_index=True)
+                st.write(f"**Automatic Risk Score**: {automatic['risk_score']:.1f} ({automatic['risk_level']}: {automatic['payout_action']})")
+
             def get_risk_manager_input():
                 format_blue("Risk Assessment Input")
 
@@ -1147,7 +1193,7 @@ def main():
                 st.markdown('- 6-8: Significant inconsistencies')        
                 st.markdown(' - 9-10: Erratic or highly risky')       
                 
-                trading_style = st.slider("Enter score for Trading Style Compliance:", 0, 10)
+                trading_style = st.slider("Enter score for Trading Style Compliance:", 0.0, 10.0, float(automatic['trading_style']), step=0.1)
 
                 # Categoria: Account Management Adherence
                 st.subheader("Account Management Adherence (0-10)")
@@ -1155,7 +1201,7 @@ def main():
                 st.write("- 3-5: Good management, occasional issues\n")
                 st.write("- 6-8: Poor management, frequent issues\n")
                 st.write("- 9-10: Severe mismanagement")
-                account_management = st.slider("Enter score for Account Management Adherence:", 0, 10)
+                account_management = st.slider("Enter score for Account Management Adherence:", 0.0, 10.0, float(automatic['account_management']), step=0.1)
 
                 # Categoria: Prohibited Practices Risk
                 st.subheader("Prohibited Practices Risk (0-10)")
@@ -1163,7 +1209,7 @@ def main():
                 st.write("- 3-5: Suspicious activity, no clear violations\n")
                 st.write("- 6-8: Clear, infrequent violations\n")
                 st.write("- 9-10: Frequent/severe violations")
-                prohibited_practices = st.slider("Enter score for Prohibited Practices Risk:", 0, 10)
+                prohibited_practices = st.slider("Enter score for Prohibited Practices Risk:", 0.0, 10.0, float(automatic['prohibited_practices']), step=0.1)
 
                 # Categoria: Gambling Behavior Indicators
                 st.subheader("Gambling Behavior Indicators (0-10)")
@@ -1171,73 +1217,10 @@ def main():
                 st.write("3-5: Occasional high-risk behavior\n")
                 st.write("6-8: Frequent high-risk behavior\n")
                 st.write("9-10: Consistent gambling-like behavior")
-                gambling_behavior = st.slider("Enter score for Gambling Behavior Indicators:", 0, 10)
+                gambling_behavior = st.slider("Enter score for Gambling Behavior Indicators:", 0.0, 10.0, float(automatic['gambling_behavior']), step=0.1)
 
                 return trading_style, account_management, prohibited_practices, gambling_behavior
 
-            # Função para calcular o score de risco
-            def calculate_risk_score(trading_style, account_management, prohibited_practices, gambling_behavior):
-                # Pesos para cada categoria
-                trading_style_weight = 0.3
-                account_management_weight = 0.2
-                prohibited_practices_weight = 0.3
-                gambling_behavior_weight = 0.2
-
-                # Cálculo do score final com base nos pesos
-                overall_risk_score = (
-                    (trading_style * trading_style_weight) +
-                    (account_management * account_management_weight) +
-                    (prohibited_practices * prohibited_practices_weight) +
-                    (gambling_behavior * gambling_behavior_weight)
-                )
-
-                return overall_risk_score
-
-            # Função para determinar a ação com base no score
-            def determine_payout_action(risk_score):
-                if 0 <= risk_score <= 3:
-                    return {
-                        "Risk Level": "Low",
-                        "Primary Action": "Pay the trader",
-                        "Secondary Action": "None",
-                        "Notes": "Regular monitoring continues"
-                    }
-                elif 3.1 <= risk_score <= 4:
-                    return {
-                        "Risk Level": "Low-Moderate",
-                        "Primary Action": "Pay the trader",
-                        "Secondary Action": "Issue a warning",
-                        "Notes": "Specify areas of concern in the warning"
-                    }
-                elif 4.1 <= risk_score <= 6:
-                    return {
-                        "Risk Level": "Moderate",
-                        "Primary Action": "Pay with a deduction",
-                        "Secondary Action": "Increased monitoring",
-                        "Notes": "Deduction percentage based on severity of issues"
-                    }
-                elif 6.1 <= risk_score <= 7:
-                    return {
-                        "Risk Level": "High-Moderate",
-                        "Primary Action": "Reject payout, allow trading",
-                        "Secondary Action": "Implement restrictions",
-                        "Notes": "Specify conditions for future payouts"
-                    }
-                elif 7.1 <= risk_score <= 10:
-                    return {
-                        "Risk Level": "High",
-                        "Primary Action": "Reject and ban",
-                        "Secondary Action": "Close account",
-                        "Notes": "Document reasons thoroughly"
-                    }
-                else:
-                    return {
-                        "Risk Level": "Invalid score",
-                        "Primary Action": "None",
-                        "Secondary Action": "None",
-                        "Notes": "Risk score is out of range"
-                    }
-
             # Função principal para rodar o processo de avaliação de risco
             def run_risk_assessment():
                 format_blue("Risk Assessment Dashboard")
@@ -1246,8 +1229,8 @@ def main():
                 # Coletar entradas do gestor de risco
                 trading_style_score, account_management_score, prohibited_practices_score, gambling_behavior_score = get_risk_manager_input()
 
-                # Calcular o score geral
-                overall_risk_score = calculate_risk_score(trading_style_score, account_management_score, prohibited_practices_score, gambling_behavior_score)
+                # Calcular o score geral (uma casa decimal, para não cair entre as faixas de ação)
+                overall_risk_score = round(calculate_risk_score(trading_style_score, account_management_score, prohibited_practices_score, gambling_behavior_score), 1)
 
                 # Determinar a ação baseada no score
                 action_matrix = determine_payout_action(overall_risk_score)
@@ -1262,6 +1245,7 @@ def main():
 
             # Executar o processo de avaliação de risco
 
+            show_automatic_scores()
             run_risk_assessment()
 
 
@@ -1286,32 +1270,11 @@ def main():
             """)
             
             
-            possible_martingales = []
+            # Trades simultâneos por símbolo, dia e direção; perda seguida de reversão em até 60s
+            martingale_report = memo('martingale', lambda: martingale(df, window_seconds=60))
+            martingale_df = martingale_report.clusters
 
-            # Por símbolo
-            for symbol in df['symbol'].unique():
-                symbol_data = df[df['symbol'] == symbol]
-                
-                # Por dia
-                for trade_day in symbol_data['TradeDay'].unique():
-                    day_data = symbol_data[symbol_data['TradeDay'] == trade_day]
-                    
-                    # Por direção
-                    for side in day_data['side'].unique():
-                        side_data = day_data[day_data['side'] == side].copy()  # Usando .copy() para evitar problemas de slicing
-                        
-                        # Verifica se há múltiplos trades simultâneos
-                        grouped = side_data.groupby('trade-date').filter(lambda x: len(x) > 1)
-                        
-                        if not grouped.empty:
-                            grouped['time_diff'] = grouped['trade-date'].diff().dt.total_seconds()
-                            grouped['lots_diff'] = grouped['lots'].diff()
-                            
-                            possible_martingales.append(grouped[['ticket', 'trade-date', 'symbol', 'side', 'lots', 'time_diff', 'lots_diff']])
-
-            # Concatenando os resultados encontrados
-            if possible_martingales:
-                martingale_df = pd.concat(possible_martingales).reset_index(drop=True)
+            if not martingale_df.empty:
                 blue(" Possible Martingale Strategies Found:")
                 st.dataframe(martingale_df)
             else:
@@ -1323,32 +1286,14 @@ def main():
 
                 # Gráfico de distribuição de trades por símbolo
                 st.write("#### Number of Potential Trades by Symbol")
-                symbol_counts = martingale_df['symbol'].value_counts().reset_index()
-                symbol_counts.columns = ['Symbol', 'Number of Trades']
-                fig_symbol_dist = px.bar(symbol_counts, x='Symbol', y='Number of Trades',
+                fig_symbol_dist = px.bar(martingale_report.clusters_by_symbol, x='Symbol', y='Number of Trades',
                                         title='Number of Potential Martingale Trades by Symbol',
                                         template='plotly_dark')
-                st.plotly_chart(fig_symbol_dist)
+                plotly_chart(fig_symbol_dist)
             
 
 
             st.write('---')
-            df['prev_trade_time'] = df.groupby('symbol')['trade-date'].shift(1)
-            df['time_diff_seconds'] = (df['trade-date'] - df['prev_trade_time']).dt.total_seconds()
-            simultaneous_trades = df[df['time_diff_seconds'] <= 60]  # Trades no intervalo de até 60 segundos
-
-            # Identifica padrões de martingale: Trades com aumento de volume após perdas
-            def identify_martingale(df):
-                df['prev_pnl'] = df.groupby('symbol')['pnl_liq'].shift(1)
-                df['prev_lots'] = df.groupby('symbol')['lots'].shift(1)
-                df['is_loss'] = df['prev_pnl'] < 0
-                df['lots_increase'] = df['lots'] > df['prev_lots']
-                
-                martingale_candidates = df[df['is_loss'] & df['lots_increase']]
-                
-                return martingale_candidates
-
-            martingale_candidates = identify_martingale(df)
 
             st.subheader("Additional Martingale Analysis")
             st.write("""
@@ -1359,44 +1304,8 @@ The Martingale analysis evaluates trading patterns where a trader increases the
 3. **Side Reversal:** The direction of the trade (buy/sell) changes, indicating a potential attempt to reverse the initial losing position.            
 """)    
             st.write('---')
-            # Função para identificar padrões de Martingale
-            # Função para identificar padrões de Martingale
-            def identificar_martingale(grupo):
-                if grupo.empty:
-                    return pd.DataFrame()  # Retorna um DataFrame vazio se o grupo estiver vazio
-
-                grupo = grupo.sort_values(by='trade-date')
-                resultado = []
-
-                for i in range(1, len(grupo)):
-                    trade_anterior = grupo.iloc[i - 1]
-                    trade_atual = grupo.iloc[i]
-
-                    # Calcula a diferença de tempo entre as trades
-                    tempo_diferenca = (trade_atual['trade-date'] - trade_anterior['trade-date']).total_seconds()
-
-                    # Verifica se há um padrão de Martingale (perda seguida por trade na direção oposta em curto intervalo de tempo)
-                    if trade_anterior['pnl_category'] == 'loss' and trade_atual['side'] != trade_anterior['side'] and tempo_diferenca <= 60:
-                        resultado.append({
-                            'ticket_1': trade_anterior['ticket'],
-                            'ticket_2': trade_atual['ticket'],
-                            'pnl_1': trade_anterior['pnl'],
-                            'pnl_2': trade_atual['pnl'],
-                            'lots_1': trade_anterior['lots'],
-                            'lots_2': trade_atual['lots'],
-                            'pnl_acumulado_dia': grupo['pnl'].sum(),
-                            'symbol': trade_anterior['symbol'],
-                            'data': trade_anterior['trade-date'],
-                            'tempo_diferenca': tempo_diferenca,
-                            'side_1': trade_anterior['side'],
-                            'side_2': trade_atual['side']
-                        })
-
-                # Retorna o DataFrame com os resultados ou um DataFrame vazio, se não houver resultados
-                return pd.DataFrame(resultado)
-
-            # Agrupamento por 'TradeDay' e 'symbol' para identificar padrões de Martingale
-            martingale_trades = df.groupby(['TradeDay', 'symbol'], group_keys=False).apply(identificar_martingale).reset_index(drop=True)
+            # Perda seguida por trade na direção oposta em curto intervalo de tempo (por dia e símbolo)
+            martingale_trades = martingale_report.reversals
 
             # Verificar se o DataFrame 'martingale_trades' contém dados antes de processar
             if not martingale_trades.empty:
@@ -1413,6 +1322,19 @@ The Martingale analysis evaluates trading patterns where a trader increases the
                 # Mensagem caso não haja padrões de Martingale detectados
                 st.write("No Martingale Strategies Detected.")
 
+        profiler.close()
+        st.sidebar.caption(f"Result cache: {result_cache.hits} hits, {result_cache.misses} misses, "
+                           f"{len(result_cache)} entries ({result_cache.nbytes / 2**20:.1f} MB)")
+
+        with st.sidebar.expander("Performance"):
+            timings = profiler.frame()
+            total = timings.loc[[stage.depth == 0 for stage in profiler.stages], 'ms'].sum()
+            st.caption(f"Last rerun: {total:.0f} ms")
+            st.dataframe(timings, hide_index=True)
+            st.checkbox("Trace allocations (slower)", key='trace_allocations',
+                        help="Record allocated and peak memory per stage with tracemalloc from the next rerun.")
+            if st.checkbox(f"Append each rerun to {PROFILE_LOG}", key='log_profile'):
+                profiler.dump(page=selected_page, dataset=dataset, compact=compact)
 
 
                
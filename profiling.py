@@ -0,0 +1,117 @@
+import dataclasses
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+
+PROFILE_LOG = os.environ.get('PAYOUTS_PROFILE_LOG', 'profile.jsonl')
+
+
+@dataclasses.dataclass
+class Stage:
+    """One timed stage of a rerun; memory fields are None unless allocations are traced."""
+    name: str
+    depth: int
+    seconds: float = 0.0
+    rows_in: int | None = None
+    rows_out: int | None = None
+    allocated_bytes: int | None = None
+    peak_bytes: int | None = None
+    cached: bool | None = None
+
+
+def row_count(value):
+    """Rows of a frame, series or array result; None for anything without a length."""
+    try:
+        return len(value)
+    except TypeError:
+        return None
+
+
+class Profiler:
+    """Wall time, rows in/out and (optionally) allocations of the stages of one rerun.
+
+    Stages nest; a parent's time and peak include its children. tracemalloc
+    is process-wide, so with several sessions tracing at once the memory
+    figures of concurrent reruns get mixed.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.stages = []
+        self.trace_memory = trace_memory
+        self._open = []  # (stage, start time, traced bytes at start, peak seen by finished children)
+        self._owns_tracing = False
+
+    def begin(self, name, rows_in=None):
+        stage = Stage(name, len(self._open), rows_in=rows_in)
+        self.stages.append(stage)
+        current = 0
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._owns_tracing = True
+            current, peak = tracemalloc.get_traced_memory()
+            if self._open:
+                # resetting the peak below would hide the parent's so far
+                self._open[-1][3] = max(self._open[-1][3], peak)
+            tracemalloc.reset_peak()
+        self._open.append([stage, time.perf_counter(), current, 0])
+        return stage
+
+    def end(self, rows_out=None):
+        stage, began, start_bytes, child_peak = self._open.pop()
+        stage.seconds = time.perf_counter() - began
+        if rows_out is not None:
+            stage.rows_out = rows_out
+        if self.trace_memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, child_peak)
+            stage.allocated_bytes = current - start_bytes
+            stage.peak_bytes = peak - start_bytes
+            if self._open:
+                self._open[-1][3] = max(self._open[-1][3], peak)
+            elif self._owns_tracing:
+                tracemalloc.stop()
+                self._owns_tracing = False
+        return stage
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        """Time the block; set `rows_out` on the yielded Stage to record the result size."""
+        stage = self.begin(name, rows_in)
+        try:
+            yield stage
+        finally:
+            self.end()
+
+    def call(self, name, func, *args, rows_in=None, **kwargs):
+        """func(*args, **kwargs) as a stage, with the length of its result as rows out."""
+        with self.stage(name, rows_in) as stage:
+            result = func(*args, **kwargs)
+            stage.rows_out = row_count(result)
+        return result
+
+    def close(self):
+        while self._open:
+            self.end()
+
+    def frame(self):
+        """The stages as a table, names indented by depth, in the order they started."""
+        table = pd.DataFrame([dataclasses.asdict(stage) for stage in self.stages],
+                             columns=[field.name for field in dataclasses.fields(Stage)])
+        table['name'] = ['· ' * depth + name for depth, name in zip(table['depth'], table['name'])]
+        table['ms'] = table['seconds'] * 1e3
+        for column in ('allocated_bytes', 'peak_bytes'):
+            table[column.replace('_bytes', '_mb')] = table[column] / 2**20
+        return table[['name', 'ms', 'rows_in', 'rows_out', 'allocated_mb', 'peak_mb', 'cached']]
+
+    def dump(self, path=PROFILE_LOG, **context):
+        """Append the rerun as one JSON line: `context` (page, dataset...) plus its stages."""
+        record = {'timestamp': pd.Timestamp.now(tz='UTC').isoformat(), **context,
+                  'stages': [dataclasses.asdict(stage) for stage in self.stages]}
+        with open(path, 'a') as sink:
+            sink.write(json.dumps(record, default=str) + '\n')
@@ -0,0 +1,417 @@
+"""Page-level reports: everything the app's pages show, without Streamlit.
+
+Each function takes the enriched trades frame (manipulation_data_frame's
+output, possibly date-sliced), never modifies it, and returns a dataclass
+of frames and numbers. The pages only render these; batch.py and the
+benchmarks call the same functions. Per-group sums, counts, means and
+extremes are read from a `cube.TradeCube` of the same frame, built on the
+spot unless the caller passes a shared one.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from analytics import (cadence_ranges, concurrency_profile, interval_distribution, lot_summary, loss_reversal_pairs,
+                       martingale_clusters, overlap_groups, threshold_ranges, trade_gaps)
+from cube import build_cube
+from ingest import time_ordered
+
+
+QUICK_TRADE_MINUTES = 1
+REGULAR_INTERVALS = [0, 1, 5, 15, 30, 45, 60, 120, 240, 480, 960, 3600]
+
+
+@dataclass
+class DistributionStats:
+    mean: float
+    median: float
+    lower_quartile: float
+    upper_quartile: float
+    minimum: float
+    maximum: float
+    std: float
+
+
+def distribution_stats(values) -> DistributionStats:
+    values = pd.Series(values, dtype=np.float64)
+    return DistributionStats(values.mean(), values.median(), values.quantile(0.25), values.quantile(0.75),
+                             values.min(), values.max(), values.std())
+
+
+@dataclass
+class OverviewReport:
+    cumulative_pnl: pd.Series
+    symbol_share: pd.DataFrame
+
+
+def overview(df, cube=None) -> OverviewReport:
+    """Running PnL and the percentage of trades per symbol."""
+    cube = build_cube(df) if cube is None else cube
+    share = cube.rollup(['symbol'])[['trades']].rename(columns={'trades': 'Percentual'})
+    return OverviewReport(df['pnl_liq'].cumsum(), share / len(df) * 100)
+
+
+@dataclass
+class GeneralStats:
+    total_trades: int
+    average_duration: float
+    risk_return_ratio: float
+    win_percentage: float
+    quick_trades: int
+    quick_trades_percentage: float
+    simultaneous_trades: int
+    simultaneous_proportion: float
+    max_simultaneous: int
+    describe: pd.DataFrame
+
+
+def general_statistics(df) -> GeneralStats:
+    total = len(df)
+    profile = concurrency_profile(df)
+    simultaneous = int((profile.counts > 1).sum())
+    gains = df.loc[df['pnl_liq'] > 0, 'pnl_liq']
+    losses = df.loc[df['pnl_liq'] < 0, 'pnl_liq']
+    quick = int((df['duration'] < QUICK_TRADE_MINUTES).sum())
+    return GeneralStats(
+        total_trades=total,
+        average_duration=df['duration'].mean(),
+        risk_return_ratio=gains.mean() / abs(losses.mean()) if len(losses) else np.inf,
+        win_percentage=len(gains) / total * 100 if total else np.nan,
+        quick_trades=quick,
+        quick_trades_percentage=quick / total * 100 if total else np.nan,
+        simultaneous_trades=simultaneous,
+        simultaneous_proportion=simultaneous / total if total else np.nan,
+        max_simultaneous=profile.peak,
+        describe=df.drop(columns=['ticket', 'swap', 'comment', 'TradeDay']).describe(),
+    )
+
+
+@dataclass
+class FrequencyReport:
+    daily: pd.DataFrame  # Frequency per TradeDay
+    stats: DistributionStats
+    above_average: pd.DataFrame
+    hour_weekday: pd.DataFrame  # trades per hour (rows) and day name (columns)
+
+
+def trade_frequency(df, cube=None) -> FrequencyReport:
+    cube = build_cube(df) if cube is None else cube
+    daily = cube.rollup(['TradeDay'])[['pnl_liq_count']].rename(columns={'pnl_liq_count': 'Frequency'})
+    stats = distribution_stats(daily['Frequency'])
+    hour_weekday = cube.rollup(['hour', 'day_of_week'])['trades'].unstack()
+    return FrequencyReport(daily, stats, daily[daily['Frequency'] > stats.mean], hour_weekday)
+
+
+@dataclass
+class DurationReport:
+    stats: DistributionStats
+    by_day: pd.DataFrame  # mean duration per TradeDay
+    above_average_days: pd.DataFrame
+    symbol_day: pd.DataFrame  # mean duration, symbol × TradeDay
+    by_symbol: pd.DataFrame
+    max_min_by_day: pd.DataFrame
+    quick_trades: pd.DataFrame
+    quick_by_symbol: pd.DataFrame
+    quick_by_day: pd.DataFrame
+
+
+def trade_duration(df, cube=None) -> DurationReport:
+    """Duration statistics in minutes, and the trades shorter than QUICK_TRADE_MINUTES."""
+    cube = build_cube(df) if cube is None else cube
+    days = cube.rollup(['TradeDay'])
+    by_day = days[['duration_mean']].rename(columns={'duration_mean': 'duration'})
+    quick = df[df['duration'] < QUICK_TRADE_MINUTES]
+    return DurationReport(
+        stats=distribution_stats(df['duration']),
+        by_day=by_day,
+        above_average_days=by_day[by_day['duration'] > by_day['duration'].mean()],
+        symbol_day=cube.rollup(['symbol', 'TradeDay'])['duration_mean'].unstack().dropna(axis=1, how='all'),
+        by_symbol=cube.rollup(['symbol'])['duration_mean'].rename('duration').sort_values().reset_index(),
+        max_min_by_day=days[['duration_max', 'duration_min']].set_axis(['max', 'min'], axis=1).reset_index(),
+        quick_trades=quick,
+        quick_by_symbol=quick.groupby('symbol', observed=True)['duration'].mean().sort_values().reset_index(),
+        quick_by_day=quick.groupby('TradeDay').size().reset_index(name='count'),
+    )
+
+
+@dataclass
+class SimultaneousReport:
+    groups: pd.DataFrame  # overlap_groups: one row per symbol, day and group of overlapping trades
+    symbol_day_counts: pd.DataFrame
+    open_gaps: pd.Series  # seconds since the previous trade opened, aligned to df
+
+
+def simultaneous_positions(df) -> SimultaneousReport:
+    groups = overlap_groups(time_ordered(df, 'open-time'))
+    counts = groups.pivot_table(index='Symbol', columns='TradeDay', values='Tickets Flagged', aggfunc='count',
+                                fill_value=0, observed=True)
+    return SimultaneousReport(groups, counts, df['open-time'].diff().dt.total_seconds())
+
+
+@dataclass
+class LotsReport:
+    stats: DistributionStats
+    above_mean: pd.DataFrame
+    by_symbol: pd.DataFrame
+    by_symbol_day: pd.DataFrame
+    by_weekday: pd.Series
+
+
+def gambling_behavior(df, cube=None) -> LotsReport:
+    cube = build_cube(df) if cube is None else cube
+    stats = distribution_stats(df['lots'])
+    return LotsReport(
+        stats=stats,
+        above_mean=df.loc[df['lots'] > stats.mean, ['trade-date', 'lots']],
+        by_symbol=lot_summary(df, ['symbol']),
+        by_symbol_day=lot_summary(df, ['symbol', 'TradeDay']),
+        by_weekday=cube.rollup(['day_of_week'])['lots_mean'].rename('lots'),
+    )
+
+
+@dataclass
+class IntervalReport:
+    table: pd.DataFrame  # one row per interval
+    by_symbol: pd.DataFrame  # percentage of regular trades, symbol × interval
+
+
+def regular_intervals(df, intervals=REGULAR_INTERVALS, tolerance=None) -> IntervalReport:
+    """Share of trades opening within each interval of the previous one.
+
+    Without `tolerance`, intervals are cumulative [0, t] thresholds and the
+    largest gap in the data is added as a last one; with it, each interval
+    is a cadence t ± tolerance.
+    """
+    intervals = list(intervals)
+    if tolerance is None:
+        max_gap = trade_gaps(df).max() / 1e9
+        intervals += [max_gap] if max_gap >= 0 and max_gap not in intervals else []
+        ranges = threshold_ranges(intervals)
+        labels = [f'0 to {interval}' for interval in intervals]
+    else:
+        ranges = cadence_ranges(intervals, tolerance)
+        labels = [f'{interval} ± {tolerance:g}' for interval in intervals]
+
+    table = interval_distribution(df, ranges).drop(columns=['lo', 'hi'])
+    table.insert(0, 'Interval (seconds)', labels)
+    by_symbol = interval_distribution(df, ranges, by='symbol')
+    by_symbol = pd.DataFrame(by_symbol['Percentage of Regular Trades'].to_numpy().reshape(-1, len(labels)),
+                             index=pd.Index(by_symbol['symbol'].iloc[::len(labels)], name='symbol'), columns=labels)
+    return IntervalReport(table, by_symbol)
+
+
+@dataclass
+class StopLossReport:
+    total_trades: int
+    without_sl: int
+    percentage: float
+    trades: pd.DataFrame  # the trades without a stop loss
+    by_day: pd.DataFrame  # their tickets and summed pnl per TradeDay
+
+
+def stop_loss_summary(df, cube=None) -> StopLossReport:
+    cube = build_cube(df) if cube is None else cube
+    trades = df[df['sl'].isna()]
+    by_day = pd.DataFrame({
+        'Tickets IDs': trades.groupby('TradeDay')['ticket'].agg(lambda x: ', '.join(map(str, x))),
+        'PNL Acumulado': cube.rollup(['TradeDay'], where=~cube.cells['has_sl'])['pnl_sum'],
+    }).rename_axis('TradeDay').reset_index()
+    return StopLossReport(len(df), len(trades), len(trades) / len(df) * 100 if len(df) else np.nan, trades, by_day)
+
+
+@dataclass
+class ConsistencyReport:
+    daily: pd.DataFrame  # pnl_liq per TradeDay
+    total_profits: float  # sum of the winning days
+    cumulative_pnl: float
+    best_day: pd.DataFrame
+    best_day_percentage: float  # of total_profits
+    weekday_pnl: pd.DataFrame
+
+
+def consistency_metrics(df, cube=None) -> ConsistencyReport:
+    cube = build_cube(df) if cube is None else cube
+    daily = cube.rollup(['TradeDay'])[['pnl_liq_sum']].rename(columns={'pnl_liq_sum': 'pnl_liq'})
+    total_profits = daily.loc[daily['pnl_liq'] > 0, 'pnl_liq'].sum()
+    best = daily['pnl_liq'].max()
+    return ConsistencyReport(
+        daily=daily,
+        total_profits=total_profits,
+        cumulative_pnl=daily['pnl_liq'].sum(),
+        best_day=daily[daily['pnl_liq'] == best],
+        best_day_percentage=best / total_profits * 100 if total_profits else np.nan,
+        weekday_pnl=cube.rollup(['day_of_week'])['pnl_liq_sum'].rename('pnl_liq').reset_index(),
+    )
+
+
+@dataclass
+class MartingaleReport:
+    clusters: pd.DataFrame  # martingale_clusters
+    clusters_by_symbol: pd.DataFrame
+    reversals: pd.DataFrame  # loss_reversal_pairs
+
+
+def martingale(df, window_seconds=60) -> MartingaleReport:
+    clusters = martingale_clusters(df)
+    by_symbol = clusters['symbol'].value_counts().reset_index()
+    by_symbol.columns = ['Symbol', 'Number of Trades']
+    return MartingaleReport(clusters, by_symbol, loss_reversal_pairs(df, window_seconds=window_seconds))
+
+
+def martingale_candidates(df):
+    """Trades with more lots than the previous trade of their symbol, when that one lost."""
+    grouped = df.groupby('symbol', observed=True)
+    prev_pnl = grouped['pnl_liq'].shift(1)
+    prev_lots = grouped['lots'].shift(1)
+    return df[(prev_pnl < 0) & (df['lots'] > prev_lots)]
+
+
+@dataclass
+class AccountReview:
+    summary: dict  # one row of the batch summary: the headline metrics and the risk evidence
+    stats: GeneralStats
+    quick_trades: pd.DataFrame
+    no_sl: StopLossReport
+    consistency: ConsistencyReport
+    martingale: MartingaleReport
+
+
+def account_review(df, cube=None, malformed=None) -> AccountReview:
+    """The metrics a payout review looks at first, plus the reports they come from.
+
+    `malformed` is manipulation_data_frame's report of unparsed timestamps, if any.
+    """
+    cube = build_cube(df) if cube is None else cube
+    stats = general_statistics(df)
+    no_sl = stop_loss_summary(df, cube)
+    consistency = consistency_metrics(df, cube)
+    martingale_report = martingale(df, window_seconds=60)
+    candidates = len(martingale_candidates(df))
+    total = stats.total_trades
+    best_day = consistency.best_day
+    lots = df['lots'].to_numpy(dtype=np.float64, na_value=np.nan)
+    median_lots = np.nanmedian(lots) if total else np.nan
+
+    summary = {
+        'trades': total,
+        'first_trade': df['trade-date'].min(),
+        'last_trade': df['trade-date'].max(),
+        'net_pnl': df['pnl_liq'].sum(),
+        'win_percentage': stats.win_percentage,
+        'risk_return_ratio': stats.risk_return_ratio,
+        'average_duration_minutes': stats.average_duration,
+        'quick_trades': stats.quick_trades,
+        'quick_trades_percentage': stats.quick_trades_percentage,
+        'simultaneous_trades': stats.simultaneous_trades,
+        'simultaneous_percentage': stats.simultaneous_proportion * 100,
+        'max_simultaneous_positions': stats.max_simultaneous,
+        'trades_without_sl': no_sl.without_sl,
+        'trades_without_sl_percentage': no_sl.percentage,
+        'total_profits': consistency.total_profits,
+        'most_profitable_day': best_day.index[0] if len(best_day) else pd.NaT,
+        'most_profitable_day_pnl': best_day['pnl_liq'].iloc[0] if len(best_day) else np.nan,
+        'most_profitable_day_percentage': consistency.best_day_percentage,
+        'martingale_clusters': len(martingale_report.clusters),
+        'loss_reversal_pairs': len(martingale_report.reversals),
+        'martingale_hits_percentage': (len(martingale_report.clusters) + len(martingale_report.reversals)) / total * 100
+        if total else np.nan,
+        'martingale_candidates': candidates,
+        'martingale_candidates_percentage': candidates / total * 100 if total else np.nan,
+        'max_lot_ratio': np.nanmax(lots) / median_lots if total and median_lots > 0 else np.nan,
+        'malformed_timestamps': 0 if malformed is None else len(malformed),
+    }
+    return AccountReview(summary, stats, df[df['duration'] < QUICK_TRADE_MINUTES], no_sl, consistency,
+                         martingale_report)
+
+
+RISK_WEIGHTS = {'trading_style': 0.3, 'account_management': 0.2, 'prohibited_practices': 0.3, 'gambling_behavior': 0.2}
+
+
+def calculate_risk_score(trading_style, account_management, prohibited_practices, gambling_behavior):
+    """Weighted 0-10 risk score from the four 0-10 category scores."""
+    return (trading_style * RISK_WEIGHTS['trading_style']
+            + account_management * RISK_WEIGHTS['account_management']
+            + prohibited_practices * RISK_WEIGHTS['prohibited_practices']
+            + gambling_behavior * RISK_WEIGHTS['gambling_behavior'])
+
+
+# summary columns behind each category, each scored 0 at `lo` and 10 at `hi` (linear, clipped)
+RISK_EVIDENCE = {
+    'trading_style': [('quick_trades_percentage', 5, 30), ('simultaneous_percentage', 10, 60)],
+    'account_management': [('trades_without_sl_percentage', 25, 90), ('most_profitable_day_percentage', 30, 80)],
+    'prohibited_practices': [('martingale_hits_percentage', 0.5, 10)],
+    'gambling_behavior': [('martingale_candidates_percentage', 5, 30), ('max_lot_ratio', 2, 20)],
+}
+
+
+def risk_scores(summary):
+    """Automatic category scores, overall score and payout action for every row of `summary`.
+
+    `summary` has account_review's summary columns, one row per account
+    (batch.py's summary frame, or a single account). A category scores the
+    mean of its evidence; missing evidence counts as 0. Rows without trades
+    (accounts that failed to load) get no score.
+    """
+    scores = pd.DataFrame(index=summary.index)
+    for category, evidence in RISK_EVIDENCE.items():
+        columns = summary.reindex(columns=[column for column, _, _ in evidence]).to_numpy(dtype=np.float64)
+        lo = np.array([lo for _, lo, _ in evidence])
+        hi = np.array([hi for _, _, hi in evidence])
+        scaled = np.nan_to_num(np.clip((columns - lo) / (hi - lo), 0, 1))
+        scores[category] = np.round(scaled.mean(axis=1) * 10, 1)
+    # one decimal, like the manual scores; otherwise a score could fall between 3 and 3.1
+    scores['risk_score'] = np.round(calculate_risk_score(**{category: scores[category] for category in RISK_WEIGHTS}), 1)
+    traded = pd.to_numeric(summary.reindex(columns=['trades'])['trades'], errors='coerce') > 0
+    scores.loc[~traded] = np.nan
+
+    # the action only depends on the rounded score: at most 101 distinct values
+    actions = {score: determine_payout_action(score) for score in scores['risk_score'].dropna().unique()}
+    scores['risk_level'] = scores['risk_score'].map({score: a['Risk Level'] for score, a in actions.items()})
+    scores['payout_action'] = scores['risk_score'].map({score: a['Primary Action'] for score, a in actions.items()})
+    return scores
+
+
+def determine_payout_action(risk_score):
+    if 0 <= risk_score <= 3:
+        return {
+            "Risk Level": "Low",
+            "Primary Action": "Pay the trader",
+            "Secondary Action": "None",
+            "Notes": "Regular monitoring continues"
+        }
+    elif 3.1 <= risk_score <= 4:
+        return {
+            "Risk Level": "Low-Moderate",
+            "Primary Action": "Pay the trader",
+            "Secondary Action": "Issue a warning",
+            "Notes": "Specify areas of concern in the warning"
+        }
+    elif 4.1 <= risk_score <= 6:
+        return {
+            "Risk Level": "Moderate",
+            "Primary Action": "Pay with a deduction",
+            "Secondary Action": "Increased monitoring",
+            "Notes": "Deduction percentage based on severity of issues"
+        }
+    elif 6.1 <= risk_score <= 7:
+        return {
+            "Risk Level": "High-Moderate",
+            "Primary Action": "Reject payout, allow trading",
+            "Secondary Action": "Implement restrictions",
+            "Notes": "Specify conditions for future payouts"
+        }
+    elif 7.1 <= risk_score <= 10:
+        return {
+            "Risk Level": "High",
+            "Primary Action": "Reject and ban",
+            "Secondary Action": "Close account",
+            "Notes": "Document reasons thoroughly"
+        }
+    else:
+        return {
+            "Risk Level": "Invalid score",
+            "Primary Action": "None",
+            "Secondary Action": "None",
+            "Notes": "Risk score is out of range"
+        }
@@ -0,0 +1,266 @@
+"""Payout programs: declarative rule sets checked against enriched trades.
+
+A program is a JSON (or YAML) document naming its rules and their limits:
+
+    {"name": "Funded", "starting_balance": 100000, "rules": [
+        {"kind": "min_trading_days", "min": 5},
+        {"kind": "best_day_share", "max": 30},
+        {"kind": "max_lots_per_symbol", "max": 150, "symbols": {"TSLA.NAS": 100}},
+        {"kind": "min_trade_duration", "min": 60, "max_share": 5},
+        {"kind": "max_concurrent_positions", "max": 10},
+        {"kind": "max_daily_loss", "max": 5000}]}
+
+Account rules compare one value per account with their limit; trade rules
+flag single trades and fail once more than `max_share` percent of the
+account's trades (0 by default: any) are flagged. In the results, a trade
+rule's value is that flagged percentage and its limit is `max_share`; the
+per-trade threshold is the limit of its rows in the violations. A rule may carry a
+`name` to tell apart two rules of the same kind. Every rule reads the
+tables it needs (daily pnl, position peaks, the drawdown evaluation) from
+scans computed once per evaluation, and every trade rule is counted in the
+same grouped pass, so the rules of all accounts cost about one scan each.
+"""
+import json
+import os
+from dataclasses import dataclass, field
+from functools import cached_property
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from analytics import interval_bounds
+from drawdown import DrawdownLimits, evaluate_drawdown
+
+
+PROGRAMS_DIR = Path(os.environ.get('PAYOUTS_PROGRAMS_DIR', 'programs'))
+PROGRAM_SUFFIXES = ('.json', '.yaml', '.yml')
+# kind: (limit key, level, optional parameters and their defaults)
+RULE_KINDS = {
+    'min_trading_days': ('min', 'account', {}),
+    'best_day_share': ('max', 'account', {}),  # best TradeDay's pnl, % of the winning days' total
+    'max_concurrent_positions': ('max', 'account', {}),
+    'max_daily_loss': ('max', 'drawdown', {}),
+    'max_trailing_drawdown': ('max', 'drawdown', {}),
+    'profit_target': ('min', 'drawdown', {}),
+    'max_lots_per_symbol': ('max', 'trade', {'symbols': {}, 'max_share': 0.0}),  # lots of a single trade
+    'min_trade_duration': ('min', 'trade', {'max_share': 0.0}),  # seconds
+}
+# drawdown rule kinds, named after their DrawdownLimits field
+_DRAWDOWN_KINDS = ('max_daily_loss', 'max_trailing_drawdown', 'profit_target')
+
+
+@dataclass
+class Rule:
+    name: str
+    kind: str
+    limit: float
+    params: dict = field(default_factory=dict)
+
+
+@dataclass
+class PayoutProgram:
+    name: str
+    rules: list  # of Rule
+    starting_balance: float = DrawdownLimits.starting_balance
+
+    @property
+    def drawdown_limits(self):
+        limits = {rule.kind: rule.limit for rule in self.rules if rule.kind in _DRAWDOWN_KINDS}
+        return DrawdownLimits(self.starting_balance, **{kind: limits.get(kind) for kind in _DRAWDOWN_KINDS})
+
+
+@dataclass
+class RuleReport:
+    results: pd.DataFrame  # one row per account and rule: value, limit, passed, and flagged trades (trade rules)
+    summary: pd.DataFrame  # one row per account: every rule's passed flag, then `passed`
+    violations: pd.DataFrame  # the trades that broke trade rules, and the drawdown breaches
+
+
+def compile_program(definition) -> PayoutProgram:
+    """PayoutProgram from a parsed definition; ValueError on anything it does not know."""
+    rules, names = [], set()
+    for position, spec in enumerate(definition.get('rules', []), 1):
+        spec = dict(spec)
+        kind = spec.pop('kind', None)
+        if kind not in RULE_KINDS:
+            raise ValueError(f'rule {position}: unknown kind {kind!r}; expected one of {", ".join(RULE_KINDS)}')
+        bound, _, defaults = RULE_KINDS[kind]
+        if bound not in spec:
+            raise ValueError(f'rule {position} ({kind}) needs a {bound!r} limit')
+        name = spec.pop('name', kind)
+        if name in names:
+            raise ValueError(f'rule {position}: duplicate name {name!r}; name the rules of the same kind')
+        if kind in _DRAWDOWN_KINDS and any(rule.kind == kind for rule in rules):
+            raise ValueError(f'rule {position}: a program has one {kind} rule')
+        limit = float(spec.pop(bound))
+        unknown = set(spec) - set(defaults)
+        if unknown:
+            raise ValueError(f'rule {position} ({kind}): unknown parameters {", ".join(sorted(unknown))}')
+        names.add(name)
+        rules.append(Rule(name, kind, limit, {**defaults, **spec}))
+    return PayoutProgram(definition.get('name', ''), rules,
+                         float(definition.get('starting_balance', DrawdownLimits.starting_balance)))
+
+
+def load_program(path) -> PayoutProgram:
+    """Compile the program in a .json, .yaml or .yml file (YAML needs PyYAML)."""
+    path = Path(path)
+    with open(path) as source:
+        if path.suffix.lower() in ('.yaml', '.yml'):
+            import yaml
+            definition = yaml.safe_load(source)
+        else:
+            definition = json.load(source)
+    definition.setdefault('name', path.stem)
+    return compile_program(definition)
+
+
+def program_files(directory=PROGRAMS_DIR):
+    """Program definitions in `directory`, sorted by name."""
+    directory = Path(directory)
+    return sorted(p for p in directory.iterdir() if p.suffix.lower() in PROGRAM_SUFFIXES) if directory.is_dir() else []
+
+
+def _peak_positions(codes, n_accounts, opens, closes):
+    # concurrency_profile's peak for every account at once: times become dense
+    # ranks, offset by account, so one searchsorted never mixes two accounts
+    valid = opens != np.iinfo(np.int64).min  # no open-time: left out, like in concurrency_profile
+    codes, opens, closes = codes[valid], opens[valid], closes[valid]
+    _, ranks = np.unique(np.concatenate([opens, closes]), return_inverse=True)
+    stride = len(ranks) + 1
+    open_keys = codes * stride + ranks[:len(opens)]
+    close_keys = codes * stride + ranks[len(opens):]
+    counts = (np.searchsorted(np.sort(open_keys), open_keys, side='right')
+              - np.searchsorted(np.sort(close_keys), open_keys, side='right'))
+    counts = counts + (closes <= opens)  # zero-length trades still count themselves
+    peaks = np.zeros(n_accounts, dtype=np.int64)
+    np.maximum.at(peaks, codes, counts)
+    return peaks
+
+
+class _Scans:
+    """Tables shared by the rules of one evaluation, each computed on first use."""
+
+    def __init__(self, df, codes, accounts, program):
+        self.df, self.codes, self.accounts, self.program = df, codes, accounts, program
+
+    @cached_property
+    def trades(self):
+        return np.bincount(self.codes, minlength=len(self.accounts))
+
+    @cached_property
+    def daily(self):
+        # pnl_liq per (account code, TradeDay)
+        pnl = pd.Series(self.df['pnl_liq'].to_numpy(dtype=np.float64, na_value=np.nan))
+        return pnl.groupby([self.codes, self.df['TradeDay'].to_numpy()]).sum()
+
+    @cached_property
+    def peaks(self):
+        opens, closes = interval_bounds(self.df, 'open-time', 'close-time')
+        return _peak_positions(self.codes, len(self.accounts), opens, closes)
+
+    @cached_property
+    def drawdown(self):
+        trades = pd.DataFrame({'account': self.accounts.take(self.codes), 'ticket': self.df['ticket'].array,
+                               'close-time': self.df['close-time'].array, 'pnl_liq': self.df['pnl_liq'].array})
+        return evaluate_drawdown(trades, self.program.drawdown_limits)
+
+
+def _account_values(scans, rule):
+    # (value, passed) per account of an account or drawdown rule
+    k = len(scans.accounts)
+    if rule.kind == 'min_trading_days':
+        value = np.bincount(scans.daily.index.get_level_values(0), minlength=k).astype(np.float64)
+    elif rule.kind == 'best_day_share':
+        daily = scans.daily
+        account = daily.index.get_level_values(0)
+        profits = np.bincount(account, weights=daily.clip(lower=0).to_numpy(), minlength=k)
+        best = daily.groupby(level=0).max().reindex(range(k)).to_numpy()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            value = np.where(profits > 0, best / profits * 100, np.nan)
+    elif rule.kind == 'max_concurrent_positions':
+        value = scans.peaks.astype(np.float64)
+    else:
+        summary = scans.drawdown.summary.reindex(scans.accounts)
+        value, breaches = {
+            'max_daily_loss': (summary['worst_daily_loss'], summary['daily_loss_breaches']),
+            'max_trailing_drawdown': (summary['max_drawdown'], summary['trailing_drawdown_breaches']),
+            'profit_target': (summary['net_pnl'], None),
+        }[rule.kind]
+        # the drawdown engine's breach test (>= limit) decides, not a plain comparison
+        passed = summary['profit_target_reached'].notna() if breaches is None else breaches.fillna(0) == 0
+        return value.to_numpy(dtype=np.float64), passed.to_numpy()
+    # nothing to compare (no winning day, say) passes
+    passed = ~(value < rule.limit) if RULE_KINDS[rule.kind][0] == 'min' else ~(value > rule.limit)
+    return value, passed
+
+
+def _trade_flags(scans, rule):
+    # (per-trade value, per-trade limit, flagged) of a trade rule
+    df = scans.df
+    if rule.kind == 'max_lots_per_symbol':
+        value = df['lots'].to_numpy(dtype=np.float64, na_value=np.nan)
+        limit = df['symbol'].map(rule.params['symbols']).to_numpy(dtype=np.float64, na_value=np.nan)
+        limit = np.where(np.isnan(limit), rule.limit, limit)
+        return value, limit, value > limit
+    value = df['duration'].to_numpy(dtype=np.float64, na_value=np.nan) * 60
+    return value, np.full(len(df), rule.limit), value < rule.limit
+
+
+def evaluate_program(trades, program, account_col='account') -> RuleReport:
+    """Every rule of `program` for every account in `trades`.
+
+    `trades` is an enriched frame of one account, or of many with an
+    `account_col` column.
+    """
+    if account_col in trades:
+        codes, accounts = pd.factorize(trades[account_col].astype(str), sort=True)
+    else:
+        codes, accounts = np.zeros(len(trades), dtype=np.intp), pd.Index([''][:len(trades)], dtype=str)
+    accounts = pd.Index(accounts, name='account')
+    scans = _Scans(trades, codes, accounts, program)
+
+    results, violations = {}, []
+    for rule in program.rules:
+        if RULE_KINDS[rule.kind][1] != 'trade':
+            value, passed = _account_values(scans, rule)
+            results[rule.name] = pd.DataFrame({'account': accounts, 'rule': rule.name, 'kind': rule.kind,
+                                               'value': value, 'limit': rule.limit, 'passed': passed})
+    names = {rule.kind: rule.name for rule in program.rules}
+    if 'max_daily_loss' in names or 'max_trailing_drawdown' in names:
+        breaches = scans.drawdown.breaches
+        breaches = breaches.assign(rule=breaches['rule'].map({'daily_loss': names.get('max_daily_loss'),
+                                                              'trailing_drawdown': names.get('max_trailing_drawdown')}))
+        violations.append(breaches[['account', 'rule', 'ticket', 'value', 'limit']])
+
+    # every trade rule flagged first, then counted per account in one grouped pass
+    trade_rules = [rule for rule in program.rules if RULE_KINDS[rule.kind][1] == 'trade']
+    flags = {rule.name: _trade_flags(scans, rule) for rule in trade_rules}
+    if trade_rules:
+        counts = pd.DataFrame({name: flagged for name, (_, _, flagged) in flags.items()}).groupby(codes).sum()
+        counts = counts.reindex(range(len(accounts)), fill_value=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            shares = counts.to_numpy() / scans.trades[:, None] * 100
+        for position, rule in enumerate(trade_rules):
+            share, limit = shares[:, position], rule.params['max_share']
+            results[rule.name] = pd.DataFrame({'account': accounts, 'rule': rule.name, 'kind': rule.kind,
+                                               'value': share, 'limit': float(limit), 'passed': ~(share > limit),
+                                               'flagged': counts[rule.name].to_numpy()})
+            value, limit, flagged = flags[rule.name]
+            hits = np.flatnonzero(flagged)
+            violations.append(pd.DataFrame({'account': accounts.take(codes[hits]), 'rule': rule.name,
+                                            'ticket': trades['ticket'].take(hits).array,
+                                            'value': value[hits], 'limit': limit[hits]}))
+
+    # per account, in definition order
+    results = (pd.concat([results[rule.name] for rule in program.rules], ignore_index=True) if results else
+               pd.DataFrame(columns=['account', 'rule', 'kind', 'value', 'limit', 'passed', 'flagged']))
+    results = results.reindex(columns=['account', 'rule', 'kind', 'value', 'limit', 'passed', 'flagged'])
+    results = results.sort_values('account', kind='stable', ignore_index=True)
+    summary = results.pivot(index='account', columns='rule', values='passed').reindex(
+        index=accounts, columns=[rule.name for rule in program.rules]).astype(bool)
+    summary['passed'] = summary.all(axis=1)
+    violations = (pd.concat(violations, ignore_index=True) if violations else
+                  pd.DataFrame(columns=['account', 'rule', 'ticket', 'value', 'limit']))
+    return RuleReport(results, summary, violations)
@@ -0,0 +1,193 @@
+"""Synthetic broker exports in the schema and timestamp format of tradhistorybasic.csv.
+
+    python synthetic.py 1000000 trades_1m.csv --symbols 40 --overlap 3 --quick-ratio 0.1
+
+Trades open during the 09:30-16:00 New York session, one calendar day per
+`trades_per_day` trades. Timestamps are written in UTC as
+'dd/mm/YYYY hh:MM:SS AM' and durations as 'DD:HH:MM:SS', like the broker.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+from ingest import BROKER_TIMEZONE, TRADE_SCHEMA
+
+
+KNOWN_SYMBOLS = ['AMD.NAS', 'NVDA.NAS', 'TSLA.NAS', 'AMZN.NAS', 'MSFT.NAS', 'META.NAS', 'AAPL.NAS',
+                 'COST.NAS', 'LOW.NYS', 'QQQ.xnms']
+SESSION_SECONDS = int(6.5 * 3600)
+LOT_SIZES = np.array([0.01, 0.1, 0.5, 1, 2, 5, 10, 25, 50, 100])
+
+_NS = 10**9
+
+
+def _digits(values, width):
+    # right-aligned decimal digits of non-negative ints as code points, shape (n, width)
+    powers = 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    return (values[:, None] // powers) % 10 + ord('0')
+
+
+def _as_text(codes):
+    codes = np.ascontiguousarray(codes, dtype=np.uint32)
+    return codes.view(f'U{codes.shape[1]}').ravel()
+
+
+def format_broker_datetimes(ns):
+    """UTC epoch nanoseconds as 'dd/mm/YYYY hh:MM:SS AM' strings."""
+    seconds = ns // _NS
+    days, second_of_day = np.divmod(seconds, 86_400)
+    # civil date from days since 1970-01-01 (inverse of the parser's formula)
+    z = days + 719468
+    era = z // 146097
+    day_of_era = z - era * 146097
+    year_of_era = (day_of_era - day_of_era // 1460 + day_of_era // 36524 - day_of_era // 146096) // 365
+    day_of_year = day_of_era - (365 * year_of_era + year_of_era // 4 - year_of_era // 100)
+    mp = (5 * day_of_year + 2) // 153
+    day = day_of_year - (153 * mp + 2) // 5 + 1
+    month = mp + np.where(mp < 10, 3, -9)
+    year = year_of_era + era * 400 + (month <= 2)
+
+    hour, rest = np.divmod(second_of_day, 3600)
+    minute, second = np.divmod(rest, 60)
+    hour12 = (hour + 11) % 12 + 1
+    codes = np.empty((len(ns), 22), dtype=np.int64)
+    codes[:, 0:2] = _digits(day, 2)
+    codes[:, 2] = ord('/')
+    codes[:, 3:5] = _digits(month, 2)
+    codes[:, 5] = ord('/')
+    codes[:, 6:10] = _digits(year, 4)
+    codes[:, 10] = ord(' ')
+    codes[:, 11:13] = _digits(hour12, 2)
+    codes[:, 13] = ord(':')
+    codes[:, 14:16] = _digits(minute, 2)
+    codes[:, 16] = ord(':')
+    codes[:, 17:19] = _digits(second, 2)
+    codes[:, 19] = ord(' ')
+    codes[:, 20] = np.where(hour >= 12, ord('P'), ord('A'))
+    codes[:, 21] = ord('M')
+    return _as_text(codes)
+
+
+def format_durations(seconds):
+    """Whole seconds as 'DD:HH:MM:SS' strings."""
+    days, rest = np.divmod(seconds, 86_400)
+    hours, rest = np.divmod(rest, 3600)
+    minutes, secs = np.divmod(rest, 60)
+    codes = np.full((len(seconds), 11), ord(':'), dtype=np.int64)
+    for start, values in zip((0, 3, 6, 9), (np.minimum(days, 99), hours, minutes, secs)):
+        codes[:, start:start + 2] = _digits(values, 2)
+    return _as_text(codes)
+
+
+def _symbols(n):
+    extra = [f'SYM{i:03d}.NAS' for i in range(max(n - len(KNOWN_SYMBOLS), 0))]
+    return np.array((KNOWN_SYMBOLS + extra)[:n])
+
+
+def generate_trades(n, symbols=10, trades_per_day=200, overlap=2.0, quick_ratio=0.07,
+                    martingale_ratio=0.02, no_sl_ratio=0.75, start='2024-01-02', seed=0):
+    """Raw export of `n` trades as a frame of strings and floats, like read_trades returns.
+
+    `overlap` is the average number of positions open during the session,
+    which sets the mean trade duration. `quick_ratio` of the trades close in
+    under a minute. `martingale_ratio` of the trades seed a Martingale-like
+    sequence: a same-second cluster of 2-4 trades on one symbol and side
+    with doubling lots, whose first trade loses, followed within a minute
+    by a trade in the opposite direction.
+    """
+    rng = np.random.default_rng(seed)
+    seeds = int(n * martingale_ratio / 5)
+    cluster = rng.integers(2, 5, seeds)
+    base = max(n - int(cluster.sum()), 0)  # each seed adds cluster - 1 copies and one reversal
+
+    # base trades spread over the sessions of consecutive calendar days
+    session_open = pd.Timestamp(start).tz_localize(BROKER_TIMEZONE) + pd.Timedelta(hours=9, minutes=30)
+    day = np.arange(base) // trades_per_day
+    opens = (session_open.value + day * 86_400 * _NS
+             + rng.integers(0, SESSION_SECONDS, base) * _NS)
+    mean_duration = max(overlap * SESSION_SECONDS / trades_per_day, 61)
+    durations = np.maximum(rng.exponential(mean_duration, base).astype(np.int64), 60)
+    quick = rng.random(base) < quick_ratio
+    durations[quick] = rng.integers(1, 60, quick.sum())
+    symbol_codes = rng.integers(0, symbols, base)
+    side = rng.integers(0, 2, base)
+    lots = rng.choice(LOT_SIZES, base)
+    loses = np.zeros(base, dtype=bool)
+
+    if seeds:
+        # Martingale clusters: copies of a seed trade at the same second with doubling lots
+        seed_rows = rng.choice(base, seeds, replace=False) if base else np.zeros(0, dtype=np.int64)
+        loses[seed_rows] = True
+        member = np.repeat(seed_rows, cluster - 1)
+        step = np.arange(len(member)) - np.repeat(np.cumsum(cluster - 1) - (cluster - 1), cluster - 1) + 1
+        reversal_gap = rng.integers(1, 60, seeds) * _NS
+        opens = np.concatenate([opens, opens[member], opens[seed_rows] + reversal_gap])
+        durations = np.concatenate([durations, durations[member], rng.integers(1, 600, seeds)])
+        symbol_codes = np.concatenate([symbol_codes, symbol_codes[member], symbol_codes[seed_rows]])
+        side = np.concatenate([side, side[member], 1 - side[seed_rows]])
+        lots = np.concatenate([lots, lots[member] * 2.0 ** step, lots[seed_rows] * 2])
+        loses = np.concatenate([loses, np.ones(len(member), dtype=bool), np.zeros(seeds, dtype=bool)])
+
+    order = np.argsort(opens, kind='stable')
+    opens, durations, symbol_codes, side, lots, loses = (
+        a[order] for a in (opens, durations, symbol_codes, side, lots, loses))
+    m = len(opens)
+    closes = opens + durations * _NS
+
+    base_price = rng.uniform(20, 900, symbols)
+    open_price = np.round(base_price[symbol_codes] * rng.lognormal(0, 0.05, m), 2)
+    move = rng.normal(0, 0.001, m) * np.sqrt(durations)
+    direction = np.where(side == 0, 1, -1)
+    move = np.where(loses, -np.abs(move) * direction - 0.0005 * direction, move)
+    close_price = np.round(open_price * (1 + move), 2)
+    pnl = np.round((close_price - open_price) * lots * direction, 2)
+    has_sl = rng.random(m) >= no_sl_ratio
+    sl = np.where(has_sl, np.round(open_price * (1 - 0.01 * direction), 2), np.nan)
+    commissions = np.where(rng.random(m) < 0.3, np.round(lots * 0.05, 2), np.nan)
+
+    open_text = format_broker_datetimes(opens)
+    return pd.DataFrame({
+        'ticket': (np.arange(m) + 900_000).astype(str),
+        'trade-date': open_text,
+        'pnl': pnl,
+        'volume': lots * open_price,
+        'lots': lots,
+        'sl': sl,
+        'tp': np.nan,
+        'swap': np.nan,
+        'commissions': commissions,
+        'duration': format_durations(durations),
+        'side': np.where(side == 0, 'BUY', 'SELL'),
+        'open-time': open_text,
+        'open-price': open_price,
+        'close-price': close_price,
+        'close-time': format_broker_datetimes(closes),
+        'symbol': _symbols(symbols)[symbol_codes],
+        'comment': None,
+    })
+
+
+def write_trades(df, path):
+    """Write a raw export as the broker does: every value quoted, blanks for missing ones."""
+    table = pa.Table.from_pandas(df, schema=pa.schema(TRADE_SCHEMA.items()), preserve_index=False)
+    pa_csv.write_csv(table, path, pa_csv.WriteOptions(quoting_style='all_valid'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('rows', type=int)
+    parser.add_argument('path')
+    parser.add_argument('--symbols', type=int, default=10)
+    parser.add_argument('--trades-per-day', type=int, default=200)
+    parser.add_argument('--overlap', type=float, default=2.0, help='average open positions during the session')
+    parser.add_argument('--quick-ratio', type=float, default=0.07, help='share of trades under one minute')
+    parser.add_argument('--martingale-ratio', type=float, default=0.02, help='share of trades in Martingale sequences')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    trades = generate_trades(args.rows, args.symbols, args.trades_per_day, args.overlap, args.quick_ratio,
+                             args.martingale_ratio, seed=args.seed)
+    write_trades(trades, args.path)
+    print(f'{len(trades)} trades written to {args.path}')
@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# the app's modules sit at the repository root, not in a package
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
@@ -0,0 +1,85 @@
+import pandas as pd
+import pytest
+
+from accounts import AccountStore
+from synthetic import generate_trades, write_trades
+
+
+def _deltas(tmp_path, raw, parts=3):
+    # consecutive slices of one export, oldest first, as separate files
+    paths = []
+    size = -(-len(raw) // parts)
+    for i in range(parts):
+        path = tmp_path / f'delta-{i}.csv'
+        write_trades(raw.iloc[i * size:(i + 1) * size], path)
+        paths.append(path)
+    return paths
+
+
+@pytest.fixture
+def raw():
+    return generate_trades(3000, trades_per_day=300, seed=1)
+
+
+def test_incremental_matches_full_rebuild(tmp_path, raw):
+    incremental, full = AccountStore(tmp_path / 'incremental'), AccountStore(tmp_path / 'full')
+    for path in _deltas(tmp_path, raw):
+        result = incremental.ingest('acct', path)
+    assert not result.rebuilt
+    whole = tmp_path / 'whole.csv'
+    write_trades(raw, whole)
+    full.ingest('acct', whole)
+
+    a, b = incremental.aggregates('acct'), full.aggregates('acct')
+    for field in ('trades', 'first_trade', 'last_trade', 'last_close', 'last_ticket', 'total_lots',
+                  'simultaneous_trades', 'max_simultaneous'):
+        assert getattr(a.state, field) == pytest.approx(getattr(b.state, field)), field
+    for name in ('daily', 'martingale_clusters', 'loss_reversal_pairs', 'martingale_candidates'):
+        pd.testing.assert_frame_equal(getattr(a, name).reset_index(drop=name != 'daily'),
+                                      getattr(b, name).reset_index(drop=name != 'daily'), check_dtype=False, obj=name)
+
+
+def test_resent_delta_is_deduplicated_when_the_highest_ticket_is_old(tmp_path, raw):
+    raw = raw.copy()
+    raw.loc[0, 'ticket'] = '99999999'  # the highest ticket, on the first (soon closed) trade
+    store = AccountStore(tmp_path / 'store')
+    paths = _deltas(tmp_path, raw)
+    for path in paths:
+        store.ingest('acct', path)
+    assert store.state('acct').last_ticket == '99999999'
+
+    result = store.ingest('acct', paths[0])
+    assert (result.new, result.duplicates) == (0, 1000)
+    trades = store.trades('acct')
+    assert len(trades) == 3000
+    assert trades['ticket'].is_unique
+
+
+def test_resent_delta_is_deduplicated_when_a_ticket_is_not_a_number(tmp_path, raw):
+    raw = raw.copy()
+    raw.loc[0, 'ticket'] = '99999999'
+    raw.loc[5, 'ticket'] = 'ABC123'  # no numeric watermark: every ticket is looked up
+    store = AccountStore(tmp_path / 'store')
+    paths = _deltas(tmp_path, raw)
+    for path in paths:
+        store.ingest('acct', path)
+    assert store.state('acct').last_ticket is None
+
+    result = store.ingest('acct', paths[0])
+    assert (result.new, result.duplicates) == (0, 1000)
+    trades = store.trades('acct')
+    assert len(trades) == 3000
+    assert trades['ticket'].is_unique
+
+
+def test_new_tickets_below_the_watermark_are_kept(tmp_path, raw):
+    raw = raw.copy()
+    raw['ticket'] = [str(t) for t in range(2_000_000, 2_000_000 - len(raw), -1)]  # tickets fall over time
+    store = AccountStore(tmp_path / 'store')
+    paths = _deltas(tmp_path, raw)
+    results = [store.ingest('acct', path) for path in paths]
+    assert [r.new for r in results] == [1000, 1000, 1000]
+
+    assert store.ingest('acct', paths[1]).new == 0
+    assert store.trades('acct')['ticket'].is_unique
+    assert store.state('acct').trades == 3000
@@ -0,0 +1,39 @@
+import pandas as pd
+
+from analytics import concurrency_profile, overlap_groups
+
+
+def _frame(rows):
+    # (open, close) pairs in New York time; None is a missing timestamp
+    times = {col: pd.to_datetime(list(values)).tz_localize('America/New_York')
+             for col, values in zip(['open-time', 'close-time'], zip(*rows))}
+    return pd.DataFrame(times, index=[f't{i}' for i in range(len(rows))])
+
+
+def test_concurrency_profile_leaves_out_trades_without_open_time():
+    df = _frame([('2024-08-01 10:00', '2024-08-01 11:00'),
+                 ('2024-08-01 10:30', '2024-08-01 12:00'),
+                 (None, '2024-08-01 10:45')])
+    profile = concurrency_profile(df)
+    assert profile.counts.tolist() == [1, 2, 0]
+    assert profile.counts.index.tolist() == ['t0', 't1', 't2']
+    assert profile.peak == 2
+    expected = pd.to_timedelta(['0min', '90min', '30min'])
+    assert profile.time_at_level.tolist() == expected.tolist()
+
+
+def test_overlap_groups_skip_trades_without_trade_day():
+    df = _frame([('2024-08-01 10:00', '2024-08-01 11:00'),
+                 ('2024-08-01 10:30', '2024-08-01 12:00'),
+                 ('2024-08-01 10:40', '2024-08-01 10:50'),
+                 (None, '2024-08-01 10:45')])
+    df['ticket'] = ['1', '2', '3', '4']
+    df['symbol'] = 'EURUSD'
+    df['pnl_liq'] = [10.0, 20.0, 40.0, 80.0]
+    df['TradeDay'] = df['open-time'].dt.tz_localize(None).dt.normalize()
+    df.loc['t2', 'TradeDay'] = pd.NaT
+    report = overlap_groups(df)
+    assert len(report) == 1
+    assert report.loc[0, 'TradeDay'] == pd.Timestamp('2024-08-01')
+    assert report.loc[0, 'Tickets Flagged'] == ['1', '2']
+    assert report.loc[0, 'Total PnL'] == 30.0
@@ -0,0 +1,17 @@
+import pytest
+
+from batch import account_files, run_batch
+
+
+def test_files_sharing_a_stem_are_rejected(tmp_path):
+    for name in ('a/acct.csv', 'b/acct.csv', 'c/acct.csv', 'c/acct.xlsx', 'c/other.csv'):
+        (tmp_path / name).parent.mkdir(exist_ok=True)
+        (tmp_path / name).touch()
+    assert [p.name for p in account_files([str(tmp_path / 'a'), str(tmp_path / 'c' / 'other.csv')])] == \
+        ['acct.csv', 'other.csv']
+    with pytest.raises(ValueError, match='acct'):
+        account_files([str(tmp_path / 'a'), str(tmp_path / 'b')])
+    with pytest.raises(ValueError, match='acct'):
+        account_files([str(tmp_path / 'c')])
+    with pytest.raises(ValueError, match='acct'):
+        run_batch([tmp_path / 'a' / 'acct.csv', tmp_path / 'b' / 'acct.csv'], tmp_path / 'out')
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from cache import cached_frame, read_frame, write_frame
+from conftest import ROOT
+from ingest import compact_frame, manipulation_data_frame, memory_report, read_trades
+
+
+def test_reports_are_cached_alongside_the_frame(tmp_path):
+    df = pd.DataFrame({'ticket': ['1', '2'], 'pnl': [1.5, -2.0]})
+    malformed = pd.DataFrame({'column': ['trade-date'], 'row': [7], 'value': ['31/02/2024 10:00:00 AM']})
+    builds = []
+
+    def build():
+        builds.append(True)
+        return df, {'malformed_datetimes': malformed}
+
+    first = cached_frame(b'export', build, cache_dir=tmp_path)
+    df_hit, reports = cached_frame(b'export', build, cache_dir=tmp_path)
+    assert len(builds) == 1
+    assert first[1].keys() == reports.keys()
+    pd.testing.assert_frame_equal(df_hit, df)
+    pd.testing.assert_frame_equal(reports['malformed_datetimes'], malformed)
+
+
+def test_memory_report_keeps_its_index_through_the_cache(tmp_path):
+    df, _ = manipulation_data_frame(read_trades(ROOT / 'tradhistorybasic.csv'))
+    compact = compact_frame(df)
+    report = memory_report(df, compact)
+    cached_frame(b'export', lambda: (compact, {'memory_report': report}), cache_dir=tmp_path, variant='compact')
+    _, reports = cached_frame(b'export', None, cache_dir=tmp_path, variant='compact')
+    assert reports['memory_report'].index.name == 'column'
+    pd.testing.assert_frame_equal(reports['memory_report'], report)
+
+
+def test_read_frame_maps_columns_without_copying(tmp_path):
+    rows = 10_000
+    df = pd.DataFrame({'pnl': np.linspace(-5, 5, rows), 'sl': np.where(np.arange(rows) % 3, 1.0, np.nan),
+                       'lots': np.arange(rows)})
+    write_frame(df, tmp_path / 'frame.arrow')
+    before = pa.total_allocated_bytes()
+    read = read_frame(tmp_path / 'frame.arrow')
+    # NaN is written as a float value, not a null, so 'sl' needs no conversion either
+    assert pa.total_allocated_bytes() - before < rows  # not even one column's 8 bytes a row
+    pd.testing.assert_frame_equal(read, df)
+    read['sl'] = read['sl'].fillna(0)  # whole columns can still be replaced
@@ -0,0 +1,17 @@
+import pandas as pd
+
+from charts import trade_timeline
+from ingest import manipulation_data_frame
+from synthetic import generate_trades
+
+
+def test_density_timeline_ignores_trades_without_valid_times():
+    df, _ = manipulation_data_frame(generate_trades(6000, trades_per_day=300))
+    df.loc[df.index[10], 'open-time'] = pd.NaT
+    df.loc[df.index[20], 'close-time'] = pd.NaT
+    fig = trade_timeline(df, max_rows=1000, bins=200)
+    buckets = pd.to_datetime(fig.data[0].x)
+    valid = df.dropna(subset=['open-time', 'close-time'])
+    assert buckets.min() == valid['open-time'].min().tz_localize(None)
+    assert buckets.max() < valid['close-time'].max().tz_localize(None)
+    assert len(buckets) == 200
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from drawdown import DrawdownLimits, evaluate_drawdown
+
+
+@pytest.fixture
+def trades():
+    # 12 accounts trading over three weeks, shuffled, with a few trades still open
+    rng = np.random.default_rng(3)
+    n = 12 * 150
+    close = pd.Series(pd.Timestamp('2024-08-01', tz='America/New_York')
+                      + pd.to_timedelta(np.sort(rng.integers(0, 86_400 * 21, n)), unit='s'))
+    close[rng.random(n) < 0.02] = pd.NaT
+    df = pd.DataFrame({'account': np.repeat([f'A{i:02d}' for i in range(12)], 150), 'ticket': np.arange(n).astype(str),
+                       'close-time': close, 'pnl_liq': rng.normal(0, 800, n)})
+    return df.sample(frac=1, random_state=0)
+
+
+def _naive(trades, limits):
+    # one account at a time, one trade at a time
+    rows = {}
+    for account, group in trades[trades['close-time'].notna()].groupby('account'):
+        equity = high = limits.starting_balance
+        day = day_open = target = None
+        daily, trailing, max_drawdown = set(), set(), 0.0
+        for trade in group.sort_values('close-time', kind='stable').itertuples():
+            session = trade[3].tz_localize(None).normalize()
+            if session != day:
+                day, day_open = session, equity
+            equity += trade.pnl_liq
+            high = max(high, equity)
+            max_drawdown = max(max_drawdown, high - equity)
+            if day_open - equity >= limits.max_daily_loss:
+                daily.add(session)
+            if high - equity >= limits.max_trailing_drawdown:
+                trailing.add(session)
+            if target is None and equity - limits.starting_balance >= limits.profit_target:
+                target = trade[3]
+        rows[account] = (equity, max_drawdown, len(daily), len(trailing), target)
+    return rows
+
+
+def test_matches_a_per_account_loop(trades):
+    limits = DrawdownLimits(starting_balance=50_000, max_daily_loss=3_000, max_trailing_drawdown=6_000,
+                            profit_target=4_000)
+    summary = evaluate_drawdown(trades, limits).summary
+    expected = _naive(trades, limits)
+    assert list(summary.index) == sorted(expected)
+    for account, (equity, max_drawdown, daily, trailing, target) in expected.items():
+        row = summary.loc[account]
+        assert row['final_equity'] == pytest.approx(equity)
+        assert row['max_drawdown'] == pytest.approx(max_drawdown)
+        assert (row['daily_loss_breaches'], row['trailing_drawdown_breaches']) == (daily, trailing)
+        assert row['profit_target_reached'] == target if target is not None else pd.isna(row['profit_target_reached'])
+
+
+def test_one_account_without_an_account_column(trades):
+    one = trades[trades['account'] == 'A03']
+    report = evaluate_drawdown(one.drop(columns='account'))
+    pd.testing.assert_series_equal(report.summary.iloc[0], evaluate_drawdown(one).summary.loc['A03'],
+                                   check_names=False)
+    assert report.breaches['account'].eq('').all()
+
+
+def test_disabled_limits_never_breach(trades):
+    report = evaluate_drawdown(trades, DrawdownLimits(max_daily_loss=None, max_trailing_drawdown=None,
+                                                      profit_target=None))
+    assert report.breaches.empty
+    assert report.summary['rules_passed'].all()
@@ -0,0 +1,75 @@
+import re
+
+import pandas as pd
+import pytest
+
+from conftest import ROOT
+from ingest import duration_minutes, manipulation_data_frame, parse_broker_datetimes, read_trades
+
+
+def _baseline(raw):
+    # the original per-row derivations of manipulation_data_frame, kept as the reference
+    df = raw.copy()
+    df['trade-date'] = (pd.to_datetime(df['trade-date'], format='%d/%m/%Y %I:%M:%S %p')
+                        .dt.tz_localize('UTC').dt.tz_convert('America/New_York'))
+
+    def duration_to_minutes(duration):
+        match = re.match(r'(?:(\d+):)?(\d+):(\d+):(\d+)', duration)
+        if match:
+            days, hours, minutes, seconds = match.groups()
+            days = int(days) if days else 0
+            return days * 1440 + int(hours) * 60 + int(minutes) + int(seconds) / 60
+        return None
+
+    df['duration'] = df['duration'].apply(duration_to_minutes)
+    df['pnl_category'] = df['pnl'].apply(lambda x: 'Gain' if x > 0 else 'Loss')
+    df['TradeDay'] = df['trade-date'].apply(lambda x: x.strftime('%d-%m-%Y'))
+    df['TradeDay'] = pd.to_datetime(df['TradeDay'], errors='coerce', format='%d-%m-%Y')
+    df['ticket'] = df['ticket'].astype(str)
+    return df.set_index('ticket')
+
+
+@pytest.mark.parametrize('column', ['duration', 'pnl_category', 'TradeDay'])
+def test_derived_columns_match_the_per_row_implementation(column):
+    path = ROOT / 'tradhistorybasic.csv'
+    expected = _baseline(pd.read_csv(path))[column]
+    actual = manipulation_data_frame(read_trades(path))[0].set_index('ticket')[column].reindex(expected.index)
+    if column == 'TradeDay':
+        expected, actual = expected.astype('datetime64[ns]'), actual.astype('datetime64[ns]')
+    pd.testing.assert_series_equal(actual, expected, check_dtype=column != 'pnl_category', check_names=False)
+
+
+def test_malformed_timestamps_are_returned_next_to_the_frame():
+    raw = read_trades(ROOT / 'tradhistorybasic.csv')
+    raw.loc[3, 'trade-date'] = '31/02/2024 10:00:00 AM'
+    df, malformed = manipulation_data_frame(raw)
+    assert malformed[['column', 'row', 'value']].values.tolist() == [['trade-date', 3, '31/02/2024 10:00:00 AM']]
+    assert df.attrs == {}
+    assert len(pd.concat([df.iloc[:10], df.iloc[10:20]])) == 20
+
+
+def test_broker_timestamps_match_to_datetime():
+    values = ['29/02/2024 12:00:00 PM', '01/03/2024 12:30:05 AM', '29/02/2023 01:00:00 PM', '1/3/2024 1:02:03 PM',
+              'é1/03/2024 01:00:00 PM', '01/03/2024 13:00:00 PM', '', None, '31/12/1969 11:59:59 PM']
+    df = pd.DataFrame({'trade-date': pd.Series(values, dtype='str')})
+    parsed, malformed = parse_broker_datetimes(df, columns=['trade-date'], tz='UTC')
+    expected = pd.to_datetime(df['trade-date'], format='%d/%m/%Y %I:%M:%S %p', errors='coerce').dt.tz_localize('UTC')
+    pd.testing.assert_series_equal(parsed['trade-date'], expected.dt.as_unit('ns'), check_names=False)
+    assert malformed['row'].tolist() == [2, 4, 5]
+
+
+@pytest.mark.parametrize('text, minutes', [
+    ('00:01:30', 1.5), ('2:03:04:05', 2 * 1440 + 184 + 5 / 60), ('1:2:3:4:5', 1440 + 123 + 4 / 60),
+    (' 1:2:3 ', 62.05), ('1:2:3:', 62.05), ('1:2:3x', 62.05), ('12:30', None), (':1:2:3', None), ('1::2:3', None),
+    ('', None), (None, None),
+])
+def test_duration_keeps_the_regex_semantics(text, minutes):
+    actual = duration_minutes(pd.Series([text], dtype='str')).iloc[0]
+    assert actual == pytest.approx(minutes) if minutes is not None else pd.isna(actual)
+
+
+def test_csv_read_in_blocks_gives_the_same_frame():
+    path = ROOT / 'tradhistorybasic.csv'
+    whole, _ = manipulation_data_frame(read_trades(path))
+    blocks, _ = manipulation_data_frame(read_trades(path, block_size=4096))
+    pd.testing.assert_frame_equal(blocks, whole)
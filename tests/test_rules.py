@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rules import compile_program, evaluate_program
+
+
+@pytest.mark.parametrize('rules, message', [
+    ([{'kind': 'max_weekend_trades', 'max': 1}], 'unknown kind'),
+    ([{'kind': 'best_day_share', 'min': 30}], "needs a 'max' limit"),
+    ([{'kind': 'best_day_share', 'max': 30, 'symbols': {}}], 'unknown parameters symbols'),
+    ([{'kind': 'min_trading_days', 'min': 3}, {'kind': 'min_trading_days', 'min': 5}], 'duplicate name'),
+    ([{'kind': 'max_daily_loss', 'max': 1000}, {'kind': 'max_daily_loss', 'max': 500, 'name': 'tight'}],
+     'one max_daily_loss rule'),
+])
+def test_invalid_definitions_are_rejected(rules, message):
+    with pytest.raises(ValueError, match=message):
+        compile_program({'rules': rules})
+
+
+def test_compile_fills_defaults_and_names():
+    program = compile_program({'name': 'Funded', 'starting_balance': 50000, 'rules': [
+        {'kind': 'min_trade_duration', 'min': 60},
+        {'kind': 'min_trade_duration', 'min': 5, 'name': 'no_scalping', 'max_share': 2}]})
+    assert [(r.name, r.limit, r.params) for r in program.rules] == [
+        ('min_trade_duration', 60.0, {'max_share': 0.0}), ('no_scalping', 5.0, {'max_share': 2})]
+    assert program.drawdown_limits.starting_balance == 50000
+    assert program.drawdown_limits.max_daily_loss is None
+
+
+def test_trade_rule_rows_report_the_flagged_share():
+    opens = pd.date_range('2024-08-01 10:00', periods=4, freq='h', tz='America/New_York')
+    trades = pd.DataFrame({
+        'account': ['a', 'a', 'a', 'a'], 'ticket': ['1', '2', '3', '4'],
+        'open-time': opens, 'close-time': opens + pd.Timedelta(minutes=30), 'trade-date': opens,
+        'TradeDay': opens.tz_localize(None).normalize(), 'symbol': ['X', 'X', 'Y', 'Y'],
+        'lots': [1.0, 3.0, 1.0, 1.0], 'duration': [30.0] * 4, 'pnl_liq': [10.0, -5.0, 2.0, 1.0]})
+    program = compile_program({'rules': [
+        {'kind': 'max_lots_per_symbol', 'max': 2, 'max_share': 30},
+        {'kind': 'max_lots_per_symbol', 'max': 2, 'symbols': {'Y': 0.5}, 'name': 'strict_y', 'max_share': 30}]})
+    report = evaluate_program(trades, program)
+    rows = report.results.set_index('rule')
+    assert rows.loc['max_lots_per_symbol', ['value', 'limit', 'passed', 'flagged']].tolist() == [25.0, 30.0, True, 1]
+    assert rows.loc['strict_y', ['value', 'limit', 'passed', 'flagged']].tolist() == [75.0, 30.0, False, 3]
+    strict = report.violations[report.violations['rule'] == 'strict_y']
+    assert strict['ticket'].tolist() == ['2', '3', '4']
+    np.testing.assert_array_equal(strict['limit'], [2.0, 0.5, 0.5])
+    assert not report.summary.loc['a', 'passed']